@@ -0,0 +1,90 @@
+"""Time to first playable audio and Python memory of the two delivery paths.
+
+A stand-in for text-to-speech sends the MP3 of a long answer in 4 kB chunks,
+the first after TTFB_MS and the rest at REALTIME_FACTOR times real time at
+48 kbit/s, about what tts-1 does. Two paths are compared:
+
+  embedded:  the current path. The whole MP3 is read, base64-encoded into
+             the HTML of `util.autoplay_hidden_audio`, and playable once the
+             page has it.
+  streamed:  `audio_stream.SpeechStream` served by `audio_stream.AudioServer`,
+             playable once the browser, here an httpx client, has the first
+             chunk.
+
+Memory is the peak traced by tracemalloc while delivering. For "embedded"
+it leaves out the copy Streamlit makes to send the HTML; for "streamed" it
+includes the httpx client standing in for the browser, and the audio joined
+once for the chat history.
+
+Run with:
+  python -m benchmark.bench_audio_delivery
+"""
+import base64
+import threading
+import time
+import tracemalloc
+
+import httpx
+
+from ecco6.audio_stream import AudioServer, SpeechStream, stream_chunks
+
+ANSWER_SECONDS = 20
+TTFB_MS = 300
+REALTIME_FACTOR = 4
+CHUNK_SIZE = 4096
+BYTES_PER_SECOND = 48000 // 8
+
+
+def synthesize():
+  time.sleep(TTFB_MS / 1000)
+  remaining = ANSWER_SECONDS * BYTES_PER_SECOND
+  while remaining > 0:
+    chunk = bytes(min(CHUNK_SIZE, remaining))
+    remaining -= len(chunk)
+    time.sleep(len(chunk) / BYTES_PER_SECOND / REALTIME_FACTOR)
+    yield chunk
+
+
+def embedded():
+  start = time.perf_counter()
+  audio = b"".join(synthesize())
+  html = f'<audio controls autoplay hidden><source src="data:audio/mp3;base64,{base64.b64encode(audio).decode()}"></audio>'
+  playable = time.perf_counter() - start
+  return playable, len(audio), len(html)
+
+
+def streamed(server: AudioServer, browser: httpx.Client):
+  start = time.perf_counter()
+  stream = SpeechStream()
+  threading.Thread(target=stream_chunks, args=(synthesize(), stream)).start()
+  with browser.stream("GET", server.publish(stream)) as response:
+    chunks = response.iter_bytes()
+    next(chunks)
+    playable = time.perf_counter() - start
+    for _ in chunks:
+      pass
+  return playable, len(stream.audio())
+
+
+def measure(deliver):
+  tracemalloc.start()
+  result = deliver()
+  _, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return result[0], result[1], peak
+
+
+def main():
+  server = AudioServer()
+  browser = httpx.Client()
+  print(f"{ANSWER_SECONDS} s answer, {ANSWER_SECONDS * BYTES_PER_SECOND / 1000:.0f} kB of MP3:")
+  for name, deliver in (("embedded", embedded), ("streamed", lambda: streamed(server, browser))):
+    playable, size, peak = measure(deliver)
+    print(f"  {name:<9} playable after {playable * 1000:6.0f} ms, "
+          f"peak Python memory {peak / 1000:5.0f} kB ({peak / size:.1f}x the audio)")
+  browser.close()
+  server.close()
+
+
+if __name__ == "__main__":
+  main()
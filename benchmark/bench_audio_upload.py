@@ -0,0 +1,55 @@
+"""Upload size and time of recordings in each speech-to-text upload format.
+
+Recordings are 48 kHz stereo, as browsers record, of a tone under noise,
+which compresses about as badly as speech. "recorder mp3" is the old path:
+`user_audio.export()` writes pydub's default MP3, uploaded as "foo.wav".
+The others are `util.encode_speech`. Upload time is the encoding time plus
+the transfer at UPLINK_MBPS, a typical mobile uplink; Whisper's own
+processing time does not depend much on the format.
+
+Run with (the compressed formats need ffmpeg):
+  python -m benchmark.bench_audio_upload
+"""
+import shutil
+import time
+
+from pydub.generators import Sine, WhiteNoise
+
+from ecco6 import util
+
+UPLINK_MBPS = 2.0
+SECONDS = (3, 5, 10)
+FORMATS = ("wav", "flac", "ogg")
+
+
+def recording(seconds):
+  ms = seconds * 1000
+  voice = Sine(220, sample_rate=48000).to_audio_segment(duration=ms, volume=-14)
+  noise = WhiteNoise(sample_rate=48000).to_audio_segment(duration=ms, volume=-30)
+  return voice.overlay(noise).set_channels(2)
+
+
+def measure(encode, audio):
+  start = time.perf_counter()
+  size = len(encode(audio).getbuffer())
+  encode_seconds = time.perf_counter() - start
+  return size, encode_seconds + size * 8 / (UPLINK_MBPS * 1e6)
+
+
+def main():
+  formats = FORMATS if shutil.which("ffmpeg") else ("wav",)
+  encoders = {"recorder mp3": lambda audio: util.create_memory_file(audio.export().read(), "foo.wav")}
+  for audio_format in formats:
+    encoders[f"16 kHz {audio_format}"] = lambda audio, f=audio_format: util.encode_speech(audio, f)
+  print(f"Upload size and encode + upload time at {UPLINK_MBPS:g} Mbit/s:")
+  print(f"{'':<14}" + "".join(f"{f'{s} s':>22}" for s in SECONDS))
+  for name, encode in encoders.items():
+    cells = []
+    for seconds in SECONDS:
+      size, upload_seconds = measure(encode, recording(seconds))
+      cells.append(f"{size / 1000:8.0f} kB {upload_seconds * 1000:6.0f} ms")
+    print(f"{name:<14}" + "".join(f"{cell:>22}" for cell in cells))
+
+
+if __name__ == "__main__":
+  main()
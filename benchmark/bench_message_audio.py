@@ -0,0 +1,65 @@
+"""Resident memory of a session after TURNS turns, with and without a cap on
+the audio kept in memory.
+
+Each turn stores a RECORDING_SECONDS recording as the MP3 `export()` writes,
+and a spoken answer of ANSWER_SECONDS as tts-1's MP3, as `util.append_message`
+does. The audio is random bytes, so that none of it is shared. Each variant
+runs in a new interpreter and reports its RSS growth over the turns.
+
+  unbounded: the old messages, the audio bytes in each message.
+  capped:    `audio_store.AudioStore` with the default 4 MB in memory, the
+             rest spooled to a temporary file.
+
+Run with (Linux, RSS is read from /proc):
+  python -m benchmark.bench_message_audio
+"""
+import os
+import subprocess
+import sys
+
+TURNS = 100
+RECORDING_SECONDS = 5
+ANSWER_SECONDS = 10
+RECORDING_BYTES = RECORDING_SECONDS * 128000 // 8
+ANSWER_BYTES = ANSWER_SECONDS * 48000 // 8
+
+
+def rss_bytes() -> int:
+  with open("/proc/self/statm") as f:
+    return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def run(variant: str):
+  from ecco6.audio_store import AudioStore
+
+  store = AudioStore()
+  messages = []
+  start = rss_bytes()
+  for turn in range(TURNS):
+    for role, size in (("user", RECORDING_BYTES), ("assistant", ANSWER_BYTES)):
+      audio = os.urandom(size)
+      messages.append({
+        "role": role, "content": f"{role} {turn}",
+        "audio": audio if variant == "unbounded" else store.put(audio),
+      })
+  # The first message is played again, reading it back if it was spooled.
+  first = messages[0]["audio"]
+  assert len(first if variant == "unbounded" else first.read()) == RECORDING_BYTES
+  print((rss_bytes() - start) / 2**20)
+
+
+def main():
+  if len(sys.argv) > 1:
+    run(sys.argv[1])
+    return
+  audio_mb = TURNS * (RECORDING_BYTES + ANSWER_BYTES) / 2**20
+  print(f"RSS growth of a session over {TURNS} turns, {audio_mb:.1f} MB of audio:")
+  for variant in ("unbounded", "capped"):
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmark.bench_message_audio", variant],
+        capture_output=True, text=True, check=True).stdout
+    print(f"  {variant:<10} {float(output):6.1f} MB")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,59 @@
+"""Benchmarks `NearbyStopIndex.query` on random locations around Stockholm.
+
+Results are checked against a brute-force haversine scan over every stop.
+The SL nearbystopsv2 API is not benchmarked, since that needs the network.
+Run with:
+  python -m benchmark.bench_nearby_stops
+"""
+import random
+import time
+
+import numpy as np
+
+from ecco6.tool import nearby_stops, stop_db
+
+QUERIES = 10_000
+CHECKED_QUERIES = 200
+# Greater Stockholm.
+LAT_RANGE = (59.20, 59.45)
+LON_RANGE = (17.75, 18.30)
+
+
+def brute_force(database, lats, lons, latitude, longitude, max_results, radius):
+  lat, lon = np.radians(latitude), np.radians(longitude)
+  a = (np.sin((lats - lat) / 2) ** 2
+       + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2)
+  distances = 2 * nearby_stops.EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+  within = np.flatnonzero(distances <= radius)
+  closest = within[np.argsort(distances[within], kind="stable")[:max_results]]
+  return [str(database.ids[row]) for row in closest]
+
+
+def main():
+  database = stop_db.get_stop_database()
+  start = time.perf_counter()
+  index = nearby_stops.get_nearby_stop_index()
+  print(f"index build: {(time.perf_counter() - start) * 1000:.1f} ms (once per process)")
+
+  rng = random.Random(0)
+  queries = [(rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE), rng.choice((1, 3, 10)),
+              rng.choice((300, 1000, 3000))) for _ in range(QUERIES)]
+
+  lats = np.radians(np.asarray(database.micro_lats, dtype=np.float64) / 1_000_000)
+  lons = np.radians(np.asarray(database.micro_lons, dtype=np.float64) / 1_000_000)
+  start = time.perf_counter()
+  for query in queries[:CHECKED_QUERIES]:
+    expected = brute_force(database, lats, lons, *query)
+    assert [stop['location'] for stop in index.query(*query)] == expected
+  brute_force_time = (time.perf_counter() - start) / CHECKED_QUERIES
+
+  start = time.perf_counter()
+  for query in queries:
+    index.query(*query)
+  index_time = (time.perf_counter() - start) / QUERIES
+  print(f"brute force: {brute_force_time * 1e6:8.1f} us/query")
+  print(f"grid index:  {index_time * 1e6:8.1f} us/query over {QUERIES} queries")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,48 @@
+"""Compares creating an OpenAI client on every rerun with the shared one of
+`ecco6.client.OpenAIClient.get_openai`.
+
+Each "rerun" creates the client and makes one text-to-speech request to a
+local stub server. A new client builds its own SSL context and connection
+pool, and opens a new connection for its first request; the shared one
+reuses a pooled keep-alive connection. Against the real API a new connection
+also costs a TLS handshake, which this benchmark does not include.
+
+Run with:
+  python -m benchmark.bench_openai_client
+"""
+import os
+import time
+
+from openai import OpenAI
+
+from benchmark.offline.stub_server import StubResponse, StubServer, route
+
+RERUNS = 50
+
+
+def speak(client: OpenAI):
+  client.audio.speech.create(model="tts-1", voice="nova", input="Hello").read()
+
+
+def time_reruns(get_client) -> float:
+  start = time.perf_counter()
+  for _ in range(RERUNS):
+    speak(get_client())
+  return (time.perf_counter() - start) / RERUNS
+
+
+def main():
+  speech = route("openai", "POST", r"/v1/audio/speech",
+                 lambda request: StubResponse(bytes(4096), content_type="audio/mpeg"))
+  with StubServer([speech]) as server:
+    os.environ["OPENAI_BASE_URL"] = f"{server.url}/v1"
+    from ecco6.client.OpenAIClient import get_openai
+
+    per_rerun = time_reruns(lambda: OpenAI(api_key="sk-bench"))
+    shared = time_reruns(lambda: get_openai("sk-bench"))
+  print(f"New client per rerun: {per_rerun * 1000:6.2f} ms per rerun")
+  print(f"Shared client:        {shared * 1000:6.2f} ms per rerun")
+
+
+if __name__ == "__main__":
+  main()
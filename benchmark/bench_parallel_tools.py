@@ -0,0 +1,51 @@
+"""Compares running the tool calls of one agent step one after another, as
+AgentExecutor does, with `ecco6.executor.ParallelAgentExecutor`.
+
+The model is a fake one asking for a "morning briefing" in a single step,
+and the tools sleep for typical network latencies of their real services.
+
+Run with:
+  python -m benchmark.bench_parallel_tools
+"""
+import time
+
+from langchain.agents import AgentExecutor
+from langchain.tools import StructuredTool
+
+from benchmark.fake_agent import make_executor
+from ecco6.executor import ParallelAgentExecutor
+
+# Tool name and seconds it sleeps.
+TOOL_LATENCIES = {
+  "get_weather": 0.45,
+  "get_events_by_date": 0.30,
+  "get_unread_messages": 0.60,
+  "get_top_headlines": 0.35,
+}
+
+
+def stub_tool(name, seconds):
+  def run() -> str:
+    """Sleeps like a network call."""
+    time.sleep(seconds)
+    return name
+  return StructuredTool.from_function(func=run, name=name, description=name)
+
+
+def run_briefing(executor_class):
+  tools = [stub_tool(name, seconds) for name, seconds in TOOL_LATENCIES.items()]
+  executor = make_executor(
+      tools, [{"name": name} for name in TOOL_LATENCIES], "Here is your briefing.", executor_class)
+  start = time.perf_counter()
+  executor.invoke({"input": "Morning briefing"})
+  return time.perf_counter() - start
+
+
+def main():
+  print(f"{len(TOOL_LATENCIES)} tools sleeping {sum(TOOL_LATENCIES.values()):.2f} s in total")
+  print(f"AgentExecutor:         {run_briefing(AgentExecutor) * 1000:6.0f} ms")
+  print(f"ParallelAgentExecutor: {run_briefing(ParallelAgentExecutor) * 1000:6.0f} ms")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,62 @@
+"""Compares time-to-first-audio of speaking the whole answer once it is
+complete with the sentence-level pipeline of `ecco6.speech`.
+
+The model and text-to-speech are simulated with sleeps: the model streams
+TOKENS_PER_SECOND tokens after FIRST_TOKEN_SECONDS, and synthesizing takes
+TTS_BASE_SECONDS plus TTS_SECONDS_PER_CHAR per character.
+
+Run with:
+  python -m benchmark.bench_speech_pipeline
+"""
+import asyncio
+import re
+import time
+
+from ecco6 import speech
+
+ANSWER = (
+  "In Stockholm, the weather is currently partly cloudy. The temperature is 14°C, "
+  "but it feels like 12°C. The wind speed is 4 m/s coming from the south-west, with "
+  "gusts up to 7 m/s. There is no precipitation, and the humidity level is 71%. "
+  "You might want to bring a light jacket if you are heading out this evening.")
+FIRST_TOKEN_SECONDS = 0.6
+TOKENS_PER_SECOND = 40
+TTS_BASE_SECONDS = 0.35
+TTS_SECONDS_PER_CHAR = 0.004
+
+
+async def tokens():
+  await asyncio.sleep(FIRST_TOKEN_SECONDS)
+  for token in re.findall(r"\S+\s*", ANSWER):
+    yield token
+    await asyncio.sleep(1 / TOKENS_PER_SECOND)
+
+
+async def synthesize(text):
+  await asyncio.sleep(TTS_BASE_SECONDS + TTS_SECONDS_PER_CHAR * len(text))
+  return text.encode()
+
+
+async def whole_answer():
+  start = time.perf_counter()
+  answer = "".join([token async for token in tokens()])
+  await synthesize(answer)
+  return time.perf_counter() - start
+
+
+async def pipelined():
+  start = time.perf_counter()
+  first_audio = None
+  async for _ in speech.synthesize_in_order(speech.split_sentences(tokens()), synthesize):
+    if first_audio is None:
+      first_audio = time.perf_counter() - start
+  return first_audio
+
+
+def main():
+  print(f"whole answer: first audio after {asyncio.run(whole_answer()) * 1000:6.0f} ms")
+  print(f"pipelined:    first audio after {asyncio.run(pipelined()) * 1000:6.0f} ms")
+
+
+if __name__ == "__main__":
+  main()
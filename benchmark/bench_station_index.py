@@ -0,0 +1,68 @@
+"""Compares station lookups through `StationIndex` and `StopDatabase` with
+the old CSV scan.
+
+Run with:
+  python -m benchmark.bench_station_index
+"""
+import csv
+import difflib
+import timeit
+
+from ecco6.tool import station_index, stop_db, stops
+
+QUERIES = [
+    "Stockholm Central",
+    "uppsala central",
+    "T-Centralen",
+    "stockholm centrl",
+    "kista",
+]
+
+
+def legacy_get_station_coordinates(station_name):
+  """The lookup `sl.get_station_coordinates` did before the station index."""
+  reader = csv.DictReader(stops.STOP_CSV_STR.splitlines())
+  station_names = [row['stop_name'].lower() for row in reader]
+
+  closest_matches = difflib.get_close_matches(station_name.lower(), station_names, n=1, cutoff=0.6)
+  if closest_matches:
+    closest_station_name = closest_matches[0]
+    reader = csv.DictReader(stops.STOP_CSV_STR.splitlines())
+    for row in reader:
+      if row['stop_name'].lower() == closest_station_name:
+        return float(row['stop_lat']), float(row['stop_lon'])
+  return None, None
+
+
+def indexed_get_station_coordinates(index, station_name):
+  row = index.find(station_name)
+  if row is None:
+    closest_matches = difflib.get_close_matches(
+        station_index.normalize_name(station_name), index.normalized_names(), n=1, cutoff=0.6)
+    if closest_matches:
+      row = index.find(closest_matches[0])
+  if row is None:
+    return None, None
+  return index.coordinates(row)
+
+
+def main():
+  build_time = timeit.timeit(lambda: station_index.StationIndex(stops.STOP_CSV_STR), number=1)
+  load_time = timeit.timeit(lambda: stop_db.load(), number=1)
+  print(f"in-memory index build: {build_time * 1000:.1f} ms, stop database load: {load_time * 1000:.1f} ms")
+  indexes = {
+      "index": station_index.StationIndex(stops.STOP_CSV_STR),
+      "mmap": stop_db.load(),
+  }
+  for query in QUERIES:
+    expected = legacy_get_station_coordinates(query)
+    timings = [f"legacy {min(timeit.repeat(lambda: legacy_get_station_coordinates(query), number=1, repeat=3)) * 1000:9.2f} ms"]
+    for label, index in indexes.items():
+      assert indexed_get_station_coordinates(index, query) == expected
+      elapsed = min(timeit.repeat(lambda: indexed_get_station_coordinates(index, query), number=1, repeat=3))
+      timings.append(f"{label} {elapsed * 1000:9.3f} ms")
+    print(f"{query!r:24} " + "   ".join(timings))
+
+
+if __name__ == "__main__":
+  main()
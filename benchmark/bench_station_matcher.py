@@ -0,0 +1,41 @@
+"""Compares `StationMatcher.best_match` with `difflib.get_close_matches`.
+
+Run with:
+  python -m benchmark.bench_station_matcher
+"""
+import difflib
+import timeit
+
+from ecco6.tool import station_matcher, stop_db
+
+QUERIES = [
+    "stockholm centralen",
+    "uppsala c",
+    "t centralen",
+    "kista centrum",
+    "tekniska hogskolan",
+    "xyz",
+]
+
+
+def main():
+  names = stop_db.get_stop_database().normalized_names()
+  build_time = timeit.timeit(station_matcher.get_station_matcher, number=1)
+  matcher = station_matcher.get_station_matcher()
+  print(f"matcher build: {build_time * 1000:.1f} ms (once per process)")
+  for query in QUERIES:
+    expected = difflib.get_close_matches(query, names, n=1, cutoff=0.6)
+    assert matcher.best_match(query) == (expected[0] if expected else None)
+    legacy = min(timeit.repeat(
+        lambda: difflib.get_close_matches(query, names, n=1, cutoff=0.6), number=1, repeat=3))
+    matched = min(timeit.repeat(lambda: matcher.best_match(query), number=1, repeat=3))
+    print(f"{query!r:24} difflib {legacy * 1000:8.2f} ms   matcher {matched * 1000:8.2f} ms")
+  assert matcher.best_matches(QUERIES) == [matcher.best_match(query) for query in QUERIES]
+  one_by_one = min(timeit.repeat(
+      lambda: [matcher.best_match(query) for query in QUERIES], number=1, repeat=3))
+  batched = min(timeit.repeat(lambda: matcher.best_matches(QUERIES), number=1, repeat=3))
+  print(f"all {len(QUERIES)} queries: one by one {one_by_one * 1000:.2f} ms   batched {batched * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+  main()
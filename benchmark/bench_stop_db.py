@@ -0,0 +1,49 @@
+"""Measures import time and RSS of the stop table, before and after the
+memory-mapped stop database.
+
+Each variant runs in a fresh interpreter so that nothing is shared. Run with:
+  python -m benchmark.bench_stop_db
+"""
+import subprocess
+import sys
+
+from ecco6.tool import stop_db
+
+VARIANTS = {
+    "stops.py + StationIndex": (
+        "from ecco6.tool import station_index, stops\n"
+        "index = station_index.StationIndex(stops.STOP_CSV_STR)\n"),
+    "stop_db (mmap)": (
+        "from ecco6.tool import stop_db\n"
+        "index = stop_db.load()\n"),
+}
+
+MEASURE = """\
+import time
+def rss_kb():
+  with open("/proc/self/status") as f:
+    for line in f:
+      if line.startswith("VmRSS:"):
+        return int(line.split()[1])
+rss_before = rss_kb()
+start = time.perf_counter()
+{setup}row = index.find("Stockholm Central")
+index.coordinates(row)
+elapsed = time.perf_counter() - start
+print(f"{{elapsed * 1000:.1f}} {{rss_kb() - rss_before}}")
+"""
+
+
+def main():
+  # Make sure neither variant pays for building the database file.
+  stop_db.load()
+  for label, setup in VARIANTS.items():
+    output = subprocess.run(
+        [sys.executable, "-c", MEASURE.format(setup=setup)],
+        capture_output=True, text=True, check=True).stdout
+    elapsed_ms, rss_kb = output.split()
+    print(f"{label:24} load + first lookup {elapsed_ms:>7} ms   RSS +{int(rss_kb) / 1024:6.1f} MiB")
+
+
+if __name__ == "__main__":
+  main()
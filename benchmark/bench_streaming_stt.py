@@ -0,0 +1,82 @@
+"""Measures the time from the end of speech to the transcript.
+
+A 9.6 s utterance of four phrases is "recorded" in real time, 100 ms at a
+time. The stand-in for Whisper takes 300 ms plus 60 ms per second of audio,
+about what the API takes for short clips. Three paths are compared:
+
+  whole clip:    the current path, one request once the recording ends.
+  chunked clip:  `stt.transcribe_recording` once the recording ends, the
+                 chunks transcribed concurrently. This is what the homepage
+                 does, as audiorecorder returns the recording when it stops.
+  streaming:     `stt.StreamingTranscriber` fed while recording, so only the
+                 last chunk is left when the speech ends.
+
+Run with:
+  python -m benchmark.bench_streaming_stt
+"""
+import time
+
+from pydub import AudioSegment
+from pydub.generators import Sine
+
+from ecco6 import stt
+
+FRAME_MS = 100
+PHRASES_MS = (2600, 2200, 1800, 1400)
+PAUSE_MS = 350
+
+
+def utterance() -> AudioSegment:
+  audio = AudioSegment.silent(duration=200)
+  for ms in PHRASES_MS:
+    audio += Sine(300).to_audio_segment(duration=ms, volume=-12) + AudioSegment.silent(duration=PAUSE_MS)
+  return audio
+
+
+def whisper(chunk: AudioSegment) -> str:
+  stt.wav_file(chunk)
+  time.sleep(0.3 + 0.06 * len(chunk) / 1000)
+  return "phrase"
+
+
+def record(audio: AudioSegment, on_frame=None):
+  """Plays back `audio` in real time, calling on_frame with each frame."""
+  start = time.perf_counter()
+  for i, offset in enumerate(range(0, len(audio), FRAME_MS)):
+    if on_frame is not None:
+      on_frame(audio[offset:offset + FRAME_MS])
+    time.sleep(max(0, start + (i + 1) * FRAME_MS / 1000 - time.perf_counter()))
+
+
+def whole_clip(audio: AudioSegment) -> float:
+  record(audio)
+  end = time.perf_counter()
+  whisper(audio)
+  return time.perf_counter() - end
+
+
+def chunked_clip(audio: AudioSegment) -> float:
+  record(audio)
+  end = time.perf_counter()
+  stt.transcribe_recording(audio, whisper)
+  return time.perf_counter() - end
+
+
+def streaming(audio: AudioSegment) -> float:
+  transcriber = stt.StreamingTranscriber(whisper)
+  record(audio, transcriber.feed)
+  end = time.perf_counter()
+  transcriber.finish()
+  return time.perf_counter() - end
+
+
+def main():
+  audio = utterance()
+  print(f"{len(audio) / 1000:.1f} s utterance, end of speech to transcript:")
+  for name, path in (("whole clip", whole_clip), ("chunked clip", chunked_clip),
+                     ("streaming", streaming)):
+    print(f"  {name:<13} {path(audio) * 1000:6.0f} ms")
+
+
+if __name__ == "__main__":
+  main()
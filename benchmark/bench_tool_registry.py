@@ -0,0 +1,37 @@
+"""Compares building every agent tool per agent, as `Ecco6Agent` used to, with
+taking the prebuilt tools from `ecco6.tool.registry`.
+
+The tool modules read `st.secrets`, so run it where .streamlit/secrets.toml
+exists:
+  python -m benchmark.bench_tool_registry
+"""
+import timeit
+
+from langchain.tools import StructuredTool
+
+from ecco6.tool import registry
+
+
+def rebuild_tools(tools):
+  """Builds the tools and their args schemas again, like _create_tools did."""
+  return [
+      StructuredTool.from_function(
+          func=tool.func, coroutine=tool.coroutine, name=tool.name,
+          description=tool.description,
+          # Tools without a schema get theirs inferred from the function.
+          args_schema=tool.args_schema if tool.args_schema.__fields__ else None)
+      for tool in tools
+  ]
+
+
+def main():
+  context = registry.ToolContext(rpi_url="http://localhost", latitude=59.33, longitude=18.06)
+  tools = registry.get_tools(context)
+  rebuild = min(timeit.repeat(lambda: rebuild_tools(tools), number=20, repeat=3)) / 20
+  lookup = min(timeit.repeat(lambda: registry.get_tools(context), number=1000, repeat=3)) / 1000
+  print(f"{len(tools)} tools: rebuilt per agent {rebuild * 1e3:8.2f} ms   "
+        f"from the registry {lookup * 1e6:8.1f} us")
+
+
+if __name__ == "__main__":
+  main()
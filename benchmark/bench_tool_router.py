@@ -0,0 +1,64 @@
+"""Measures how many prompt tokens the tool schemas cost with and without the
+keyword tool router, and what routing costs per request.
+
+Tokens are counted with tiktoken over the JSON tool definitions sent to the
+chat completions API, which is close to, but not exactly, what OpenAI bills
+for them. Without the tiktoken encoding files (they are downloaded on first
+use) it falls back to estimating four characters per token. The tool modules read `st.secrets`, so run it where
+.streamlit/secrets.toml exists:
+  python -m benchmark.bench_tool_router
+"""
+import json
+import timeit
+
+import tiktoken
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from ecco6.agent import ToolRouter
+from ecco6.tool import registry
+
+UTTERANCES = (
+  "What's the weather like in Stockholm tomorrow?",
+  "What's on my calendar today?",
+  "Do I have any unread emails?",
+  "Turn on the light and set the brightness to high.",
+  "How do I get from Kista to T-Centralen?",
+  "Set an alarm for seven tomorrow morning.",
+  "Add buy milk to my shopping list.",
+  "Tell me a joke.",
+)
+
+
+def get_token_counter():
+  try:
+    encoding = tiktoken.encoding_for_model("gpt-4-turbo")
+  except Exception as e:
+    print(f"No tiktoken encoding ({type(e).__name__}), estimating 4 characters per token.")
+    return lambda text: len(text) // 4
+  return lambda text: len(encoding.encode(text))
+
+
+def schema_tokens(tools, count_tokens) -> int:
+  return count_tokens(json.dumps([convert_to_openai_tool(tool) for tool in tools]))
+
+
+def main():
+  count_tokens = get_token_counter()
+  context = registry.ToolContext(rpi_url="http://localhost", latitude=59.33, longitude=18.06)
+  router = ToolRouter()
+  all_tokens = schema_tokens(registry.get_tools(context), count_tokens)
+  print(f"{'utterance':52} {'tools':>5} {'tokens':>7} {'saved':>6}")
+  for utterance in UTTERANCES:
+    groups = router.route_text(utterance)
+    tools = registry.get_tools(context, groups)
+    tokens = schema_tokens(tools, count_tokens)
+    print(f"{utterance:52} {len(tools):5} {tokens:7} {all_tokens - tokens:6}")
+  route = min(timeit.repeat(
+      lambda: [router.route_text(utterance) for utterance in UTTERANCES],
+      number=1000, repeat=3)) / 1000 / len(UTTERANCES)
+  print(f"Without routing every request sends {all_tokens} tokens of tool schemas.")
+  print(f"Routing takes {route * 1e6:.1f} us per utterance.")
+
+
+if __name__ == "__main__":
+  main()
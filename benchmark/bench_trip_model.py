@@ -0,0 +1,84 @@
+"""Compares the old string concatenation over raw trip dicts with parsing
+into `sl_trip.Trip` and rendering with `sl_trip.render_suggestions`.
+
+Run with:
+  python -m benchmark.bench_trip_model
+"""
+import json
+import timeit
+
+from ecco6.tool import sl_trip
+
+PRODUCTS = [
+    {"catOut": "METRO", "name": "Tunnelbana 17"},
+    {"catOut": "TRAIN", "name": "PENDELTÅG 40"},
+    {"catOut": "TRAIN", "name": "REGIONAL 10"},
+    {"catOut": "BUS", "name": "BUSS 4"},
+    {"catOut": "TRAM", "name": "SPÅRVÄG 7"},
+]
+
+
+def make_trip_payload(trips: int = 12, legs: int = 8, stops_per_leg: int = 25) -> bytes:
+  """A response shaped like a long-distance one: many trips, each with many
+  legs that list every intermediate stop."""
+  def stop(name, minute):
+    return {"name": name, "id": "A=1@O=" + name, "extId": "740000001",
+            "lon": 18.058155, "lat": 59.33014, "time": f"10:{minute % 60:02d}:00",
+            "date": "2024-05-01", "track": "2"}
+
+  payload = {"Trip": []}
+  for t in range(trips):
+    leg_list = []
+    for l in range(legs):
+      leg = {
+          "Origin": stop(f"Stop {t}-{l}-origin", l * 5),
+          "Destination": stop(f"Stop {t}-{l}-destination", l * 5 + 4),
+          "Stops": {"Stop": [stop(f"Stop {t}-{l}-{s}", l * 5) for s in range(stops_per_leg)]},
+          "Notes": {"Note": [{"key": "text.realtime", "value": "Realtime data"}] * 5},
+          "type": "JNY",
+      }
+      if l % 2:
+        leg["type"] = "WALK"
+      else:
+        leg["Product"] = PRODUCTS[(t + l) % len(PRODUCTS)]
+      leg_list.append(leg)
+    payload["Trip"].append({"LegList": {"Leg": leg_list}, "duration": "PT1H"})
+  return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+def legacy_format(trips, max_legs):
+  """The loop of get_travel_suggestions before the trip model, extended to
+  every product so that both sides do the same work."""
+  found_lines = 0
+  travel_suggestions = ""
+  for trip in trips:
+    for leg in trip["LegList"]["Leg"]:
+      if "Product" in leg:
+        product = leg["Product"]
+        travel_suggestions += f"{product['catOut']} Line: {product['name']}\n"
+        travel_suggestions += f"Departure: {leg['Origin']['name']}\n"
+        travel_suggestions += f"Destination: {leg['Destination']['name']}\n"
+        travel_suggestions += f"Departure Time: {leg['Origin']['time']}\n"
+        travel_suggestions += f"Arrival Time: {leg['Destination']['time']}\n\n"
+        found_lines += 1
+        if found_lines == max_legs:
+          return travel_suggestions
+  return travel_suggestions
+
+
+def main():
+  trips = json.loads(make_trip_payload(trips=40, legs=16))["Trip"]
+  parsed = list(sl_trip.parse_trips(trips))
+  total_legs = sum(len(trip.legs) for trip in parsed)
+  for max_legs in (2, total_legs):
+    legacy = min(timeit.repeat(lambda: legacy_format(trips, max_legs), number=100, repeat=3)) / 100
+    model = min(timeit.repeat(
+        lambda: sl_trip.render_suggestions(sl_trip.parse_trips(trips), max_legs), number=100, repeat=3)) / 100
+    render = min(timeit.repeat(
+        lambda: sl_trip.render_suggestions(parsed, max_legs), number=100, repeat=3)) / 100
+    print(f"{max_legs:4} legs: concatenation {legacy * 1e6:8.1f} us   "
+          f"parse + render {model * 1e6:8.1f} us   render cached trips {render * 1e6:8.1f} us")
+
+
+if __name__ == "__main__":
+  main()
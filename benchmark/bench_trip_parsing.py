@@ -0,0 +1,54 @@
+"""Compares parsing a whole trip response with `json.loads` with streaming
+`ijson` parsing that stops once the suggestions are found.
+
+The response is the recorded one of the offline harness,
+benchmark/offline/fixtures/sl_trip.json, as SL sends it and with its trips
+repeated to see where streaming starts to pay off. Both sides go through
+`sl_trip.parse_trips` and `sl_trip.render_suggestions`, as the tool does.
+Run with:
+  python -m benchmark.bench_trip_parsing
+"""
+import io
+import json
+import timeit
+import tracemalloc
+
+import ijson
+
+from benchmark.offline.services import load_fixture
+from ecco6.tool.sl_trip import parse_trips, render_suggestions
+
+# How many times the recorded trips are repeated.
+REPEATS = (1, 10, 50)
+
+
+def parse_full(body: bytes) -> str:
+  return render_suggestions(parse_trips(json.loads(body).get("Trip", [])))
+
+
+def parse_streaming(body: bytes) -> str:
+  return render_suggestions(parse_trips(ijson.items(io.BytesIO(body), "Trip.item", use_float=True)))
+
+
+def peak_memory(function, body) -> int:
+  tracemalloc.start()
+  function(body)
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  return peak
+
+
+def main():
+  recorded = load_fixture("sl_trip")["Trip"]
+  for repeats in REPEATS:
+    body = json.dumps({"Trip": recorded * repeats}).encode("utf-8")
+    assert parse_full(body) == parse_streaming(body)
+    label = "recorded response" if repeats == 1 else f"recorded trips x{repeats}"
+    print(f"{label}: {len(recorded) * repeats} trips, {len(body) / 1024:.1f} KiB body")
+    for name, function in (("json.loads", parse_full), ("ijson stream", parse_streaming)):
+      elapsed = min(timeit.repeat(lambda: function(body), number=20, repeat=3)) / 20
+      print(f"  {name:13} {elapsed * 1e6:8.1f} us   peak {peak_memory(function, body) / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+  main()
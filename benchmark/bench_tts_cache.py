@@ -0,0 +1,54 @@
+"""Time to the audio of a tool confirmation, synthesized or from the cache.
+
+Text-to-speech requests go to a local stub server that answers after the
+realistic OpenAI latency of the offline harness. "miss" synthesizes the
+phrase, "memory hit" and "disk hit" find it in `ecco6.tts_cache.TTSCache`,
+the latter in a new cache over the same directory, as after a restart,
+with no memory tier.
+
+Run with:
+  python -m benchmark.bench_tts_cache
+"""
+import os
+import tempfile
+import time
+
+from benchmark.offline.services import REALISTIC_LATENCY
+from benchmark.offline.stub_server import StubResponse, StubServer, route
+from ecco6.tts_cache import TTSCache
+
+PHRASE = "Alarm set successfully."
+REPEATS = 5
+
+
+def mean_ms(speak) -> float:
+  start = time.perf_counter()
+  for _ in range(REPEATS):
+    speak()
+  return (time.perf_counter() - start) / REPEATS * 1000
+
+
+def main():
+  speech = route("openai.audio", "POST", r"/v1/audio/speech",
+                 lambda request: StubResponse(bytes(24000), content_type="audio/mpeg"))
+  with StubServer([speech], {"openai.audio": REALISTIC_LATENCY["openai.audio"]}) as server, \
+      tempfile.TemporaryDirectory() as directory:
+    os.environ["OPENAI_BASE_URL"] = f"{server.url}/v1"
+    from ecco6.client.OpenAIClient import OpenAIClient
+
+    uncached = OpenAIClient("sk-bench")
+    cached = OpenAIClient("sk-bench", tts_cache=TTSCache(directory))
+    cached.text_to_speech(PHRASE)
+    restarted = TTSCache(directory, memory_bytes=0)
+    results = {
+      "miss": mean_ms(lambda: uncached.text_to_speech(PHRASE)),
+      "memory hit": mean_ms(lambda: cached.text_to_speech(PHRASE)),
+      "disk hit": mean_ms(lambda: restarted.get("tts-1", "nova", PHRASE)),
+    }
+  print(f"Time to the audio of {PHRASE!r}:")
+  for name, ms in results.items():
+    print(f"  {name:<11} {ms:8.3f} ms")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,47 @@
+"""An agent whose model is a fake one, for running tool calls without OpenAI.
+
+The model asks for the given tool calls in a single step and then answers,
+so the executor under test runs exactly those calls.
+"""
+from typing import Any, Mapping, Sequence, Type
+
+from langchain.agents import AgentExecutor, create_tool_calling_agent
+from langchain.tools import BaseTool
+from langchain_core.language_models.fake_chat_models import \
+    FakeMessagesListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+from ecco6.executor import ParallelAgentExecutor
+
+
+class FakeToolCallingModel(FakeMessagesListChatModel):
+  def bind_tools(self, tools, **kwargs):
+    return self
+
+
+def make_executor(
+    tools: Sequence[BaseTool], calls: Sequence[Mapping[str, Any]], answer: str = "Done.",
+    executor_class: Type[AgentExecutor] = ParallelAgentExecutor, **kwargs) -> AgentExecutor:
+  """Returns an executor whose model asks for `calls` in one step.
+
+  Args:
+    tools: The tools offered.
+    calls: The name and the arguments of each tool call, e.g.
+      {"name": "get_weather", "args": {"city_name": "Kista"}}.
+    answer: What the model answers once the calls are done.
+    executor_class: The executor to build.
+    kwargs: Passed on to `executor_class`.
+  """
+  model = FakeToolCallingModel(responses=[
+    AIMessage(content="", tool_calls=[
+      {"name": call["name"], "args": call.get("args", {}), "id": f"call_{i}"}
+      for i, call in enumerate(calls)]),
+    AIMessage(content=answer),
+  ])
+  prompt = ChatPromptTemplate.from_messages([
+    ("user", "{input}"),
+    MessagesPlaceholder(variable_name="agent_scratchpad"),
+  ])
+  agent = create_tool_calling_agent(model, tools, prompt)
+  return executor_class(agent=agent, tools=tools, **kwargs)
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from benchmark.offline.services import REALISTIC_LATENCY, OfflineServices
+
+# Latency of the stubbed services: unset for none, "realistic" for
+# services.REALISTIC_LATENCY, or a number of milliseconds for every service.
+LATENCY = os.environ.get("ECCO6_STUB_LATENCY", "")
+# Rounds each benchmark runs.
+ROUNDS = int(os.environ.get("ECCO6_BENCHMARK_ROUNDS", "5"))
+
+
+def _latency():
+  if not LATENCY or LATENCY == "realistic":
+    return LATENCY or None
+  return dict.fromkeys(REALISTIC_LATENCY, float(LATENCY) / 1000)
+
+
+@pytest.fixture(scope="session")
+def offline():
+  try:
+    services = OfflineServices(_latency())
+    services.start()
+  except RuntimeError as e:
+    pytest.skip(str(e))
+  yield services
+  services.stop()
+
+
+@pytest.fixture
+def run(benchmark):
+  """Benchmarks a call for ROUNDS rounds and returns its last result."""
+
+  def run(func, *args, setup=None, **kwargs):
+    def prepare():
+      if setup is not None:
+        setup()
+      return args, kwargs
+    return benchmark.pedantic(func, setup=prepare, rounds=ROUNDS, iterations=1)
+
+  return run
@@ -0,0 +1,303 @@
+"""Replays every external service of the assistant from recorded fixtures.
+
+`OfflineServices` starts a `StubServer` answering like OpenAI, the SL
+Journey Planner, Meteosource, Google News, Google Maps, the Google APIs,
+the Firebase Realtime Database, Home Assistant and the Raspberry Pi, and
+points the ecco6 modules at it through their endpoint secrets and the
+environment variables the OpenAI and Firebase SDKs read. The tools and
+`Ecco6Agent` then run unchanged, with no network and no API keys.
+
+The tool modules read their endpoints when they are imported, so the
+services must be started before anything imports them.
+"""
+import itertools
+import json
+import os
+import pathlib
+import re
+import sys
+import tempfile
+from typing import Any, Dict, List, Mapping, Optional
+
+import firebase_admin
+import streamlit as st
+from google.oauth2.credentials import Credentials
+from streamlit import config
+
+from benchmark.offline.stub_server import (StubRequest, StubResponse,
+                                           StubServer, route)
+
+FIXTURES_DIR = pathlib.Path(__file__).parent / "fixtures"
+
+# Seconds a response of each service takes when `latency="realistic"`,
+# about the medians seen from Stockholm.
+REALISTIC_LATENCY = {
+  "openai.chat": 0.9,
+  "openai.audio": 0.6,
+  "sl": 0.25,
+  "meteosource": 0.3,
+  "news": 0.35,
+  "maps": 0.15,
+  "google": 0.2,
+  "firebase": 0.1,
+  "light": 0.05,
+  "rpi": 0.02,
+}
+
+# Modules reading a stubbed endpoint when imported.
+_ENDPOINT_MODULES = ("ecco6.tool.sl", "ecco6.tool.weather", "ecco6.tool.news",
+                     "ecco6.tool.location", "ecco6.tool.google")
+
+# A stand-in for synthesized speech: an MPEG frame header and silence.
+SPEECH_AUDIO = b"\xff\xf3\x44\xc4" + bytes(4092)
+
+EMAIL = "offline@ecco6.test"
+LATITUDE, LONGITUDE = 59.3308, 18.0592
+
+
+def load_fixture(name: str) -> Any:
+  with open(FIXTURES_DIR / f"{name}.json", encoding="utf-8") as f:
+    return json.load(f)
+
+
+def _json(data: Any, status: int = 200) -> StubResponse:
+  return StubResponse(json.dumps(data).encode("utf-8"), status=status)
+
+
+def _fixture(name: str):
+  body = json.dumps(load_fixture(name)).encode("utf-8")
+  return lambda request: StubResponse(body)
+
+
+def _text(content: Any) -> str:
+  if isinstance(content, list):
+    return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+  return content or ""
+
+
+class ChatModel:
+  """Answers chat completion requests like a tool calling model.
+
+  The first call of a turn asks for the tool of the first scenario whose
+  keywords are in the user's message, if the tool is offered. Once tool
+  results are in, or if no scenario matches, it answers with the fixture's
+  answer.
+  """
+
+  def __init__(self, scenarios: List[Mapping[str, Any]], answer: str):
+    self.scenarios = scenarios
+    self.answer = answer
+    self._ids = itertools.count()
+
+  def _reply(self, body: Mapping[str, Any]) -> Dict[str, Any]:
+    messages = body.get("messages", [])
+    offered = {tool["function"]["name"] for tool in body.get("tools", [])}
+    if messages and messages[-1].get("role") != "tool":
+      text = _text(next(
+          (m.get("content") for m in reversed(messages) if m.get("role") == "user"), "")).lower()
+      for scenario in self.scenarios:
+        if scenario["tool"] in offered and any(k in text for k in scenario["keywords"]):
+          return {"tool_calls": [{
+            "id": f"call_{next(self._ids)}", "type": "function",
+            "function": {"name": scenario["tool"], "arguments": json.dumps(scenario["arguments"])},
+          }]}
+    return {"content": self.answer}
+
+  def __call__(self, request: StubRequest) -> StubResponse:
+    body = json.loads(request.body)
+    reply = self._reply(body)
+    finish_reason = "tool_calls" if "tool_calls" in reply else "stop"
+    common = {"id": f"chatcmpl-{next(self._ids)}", "created": 0, "model": body.get("model", "")}
+    if not body.get("stream"):
+      message = {"role": "assistant", "content": reply.get("content"), **reply}
+      return _json({
+        **common, "object": "chat.completion",
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+      })
+
+    def chunk(delta, finish=None):
+      data = {**common, "object": "chat.completion.chunk",
+              "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+      return f"data: {json.dumps(data)}\n\n"
+
+    events = [chunk({"role": "assistant", "content": ""})]
+    if "tool_calls" in reply:
+      events.append(chunk({"tool_calls": [{"index": 0, **call} for call in reply["tool_calls"]]}))
+    else:
+      events.extend(chunk({"content": token}) for token in re.findall(r"\S+\s*", reply["content"]))
+    events.append(chunk({}, finish_reason))
+    events.append("data: [DONE]\n\n")
+    return StubResponse("".join(events).encode("utf-8"), content_type="text/event-stream")
+
+
+def _firebase_alarms(request: StubRequest) -> StubResponse:
+  if request.method == "GET":
+    return _json(load_fixture("firebase_alarms"))
+  if request.method == "POST":
+    return _json({"name": "-Nalarm3"})
+  if request.method == "DELETE":
+    return _json(None)
+  return StubResponse(request.body or b"null")
+
+
+def build_routes() -> list:
+  chat = ChatModel(**load_fixture("openai_chat"))
+  return [
+    route("openai.chat", "POST", r"/openai/v1/chat/completions", chat),
+    route("openai.audio", "POST", r"/openai/v1/audio/transcriptions", _fixture("openai_transcription")),
+    route("openai.audio", "POST", r"/openai/v1/audio/speech",
+          lambda request: StubResponse(SPEECH_AUDIO, content_type="audio/mpeg")),
+    route("sl", "GET", r"/sl/TravelplannerV3_1/trip\.json", _fixture("sl_trip")),
+    route("sl", "GET", r"/sl/nearbystopsv2\.json", _fixture("sl_nearby_stops")),
+    route("meteosource", "GET", r"/meteosource/find_places", _fixture("meteosource_find_places")),
+    route("meteosource", "GET", r"/meteosource/current", _fixture("meteosource_current")),
+    route("meteosource", "GET", r"/meteosource/daily", _fixture("meteosource_daily")),
+    route("news", "GET", r"/news/world", _fixture("google_news_world")),
+    route("maps", "GET", r"/maps/maps/api/geocode/json", _fixture("maps_geocode")),
+    route("google", "GET", r"/google/calendar/v3/calendars/[^/]+/events", _fixture("google_calendar_events")),
+    route("google", "POST", r"/google/calendar/v3/calendars/[^/]+/events",
+          lambda request: StubResponse(request.body)),
+    route("google", "GET", r"/google/gmail/v1/.*users/[^/]+/messages", _fixture("gmail_messages")),
+    route("google", "GET", r"/google/gmail/v1/.*users/[^/]+/messages/[^/]+", _fixture("gmail_message")),
+    route("google", "POST", r"/google/gmail/v1/.*users/[^/]+/messages/send",
+          lambda request: _json({"id": "sent", "labelIds": ["SENT"]})),
+    route("google", "GET", r"/google/tasks/v1/.*users/@me/lists", _fixture("google_task_lists")),
+    route("google", "GET", r"/google/tasks/v1/.*lists/[^/]+/tasks", _fixture("google_tasks")),
+    route("google", "POST", r"/google/tasks/v1/.*lists/[^/]+/tasks",
+          lambda request: StubResponse(request.body)),
+    route("firebase", "GET", r"/users/[^/]+/alarms\.json", _firebase_alarms),
+    route("firebase", "POST", r"/users/[^/]+/alarms\.json", _firebase_alarms),
+    route("firebase", "PATCH", r"/users/[^/]+/alarms/[^/]+\.json", _firebase_alarms),
+    route("firebase", "DELETE", r"/users/[^/]+/alarms/[^/]+\.json", _firebase_alarms),
+    route("light", "POST", r"/light/api/services/script/\w+", lambda request: _json([])),
+    route("rpi", "POST", r"/rpi/timer", lambda request: _json({"status": "ok"})),
+  ]
+
+
+class OfflineServices:
+  """Serves the fixtures and points the ecco6 modules at them.
+
+  Use as a context manager, before any ecco6.tool module is imported:
+
+    with OfflineServices() as services:
+      agent = services.agent()
+
+  Args:
+    latency: Seconds each service takes to answer, by service name as in
+      `REALISTIC_LATENCY`, or "realistic" for `REALISTIC_LATENCY`. No
+      latency by default.
+  """
+
+  def __init__(self, latency: Optional[Any] = None):
+    if latency == "realistic":
+      latency = REALISTIC_LATENCY
+    self.server = StubServer(build_routes(), latency)
+    self._saved_environ: Dict[str, Optional[str]] = {}
+    self._saved_secrets_files = None
+    self._secrets_dir: Optional[tempfile.TemporaryDirectory] = None
+    self._firebase_app = None
+
+  def _secrets(self) -> str:
+    url = self.server.url
+    return "\n".join([
+      'OPENAI_API_KEY = "sk-offline"',
+      'SL_RESEPLANERARE_API_KEY = "offline"',
+      'SL_NEARBYSTOPS_API_KEY = "offline"',
+      'WEATHER_API_KEY = "offline"',
+      'GOOGLE_API_KEY = "AIzaoffline"',
+      f'SL_API_URL = "{url}/sl"',
+      f'METEOSOURCE_URL = "{url}/meteosource"',
+      f'GOOGLE_NEWS_URL = "{url}/news"',
+      f'GOOGLE_MAPS_URL = "{url}/maps"',
+      f'GOOGLE_API_ENDPOINT = "{url}/google"',
+      "[LIGHT]",
+      f'URL = "{url}/light"',
+      'API_KEY = "offline"',
+      "",
+    ])
+
+  def _set_environ(self, name: str, value: str):
+    self._saved_environ.setdefault(name, os.environ.get(name))
+    os.environ[name] = value
+
+  def start(self) -> "OfflineServices":
+    imported = [module for module in _ENDPOINT_MODULES if module in sys.modules]
+    if imported:
+      raise RuntimeError(
+          f"{', '.join(imported)} already imported with the real endpoints; "
+          "start OfflineServices before importing the tools.")
+    self.server.start()
+
+    self._secrets_dir = tempfile.TemporaryDirectory(prefix="ecco6-offline-")
+    secrets_file = os.path.join(self._secrets_dir.name, "secrets.toml")
+    with open(secrets_file, "w", encoding="utf-8") as f:
+      f.write(self._secrets())
+    self._saved_secrets_files = config.get_option("secrets.files")
+    config.set_option("secrets.files", [secrets_file])
+    st.secrets._reset()
+
+    self._set_environ("OPENAI_BASE_URL", f"{self.server.url}/openai/v1")
+    self._set_environ("OPENAI_API_BASE", f"{self.server.url}/openai/v1")
+    self._set_environ("OPENAI_API_KEY", "sk-offline")
+    self._set_environ("FIREBASE_DATABASE_EMULATOR_HOST", self.server.address)
+    if not firebase_admin._apps:
+      self._firebase_app = firebase_admin.initialize_app(
+          options={"databaseURL": "https://ecco6.firebaseio.com"})
+
+    st.session_state.email = EMAIL
+    st.session_state.latitude = LATITUDE
+    st.session_state.longitude = LONGITUDE
+    return self
+
+  def stop(self):
+    if self._firebase_app is not None:
+      firebase_admin.delete_app(self._firebase_app)
+      self._firebase_app = None
+    for name, value in self._saved_environ.items():
+      if value is None:
+        os.environ.pop(name, None)
+      else:
+        os.environ[name] = value
+    self._saved_environ.clear()
+    if self._secrets_dir is not None:
+      config.set_option("secrets.files", self._saved_secrets_files)
+      st.secrets._reset()
+      self._secrets_dir.cleanup()
+      self._secrets_dir = None
+    self.server.stop()
+
+  def __enter__(self) -> "OfflineServices":
+    return self.start()
+
+  def __exit__(self, *exc_info):
+    self.stop()
+
+  @property
+  def url(self) -> str:
+    return self.server.url
+
+  def google_credentials(self) -> Credentials:
+    return Credentials(token="offline")
+
+  def tool_context(self):
+    """Returns the ToolContext of a signed-in user at Stockholm City."""
+    from ecco6.tool import registry
+    return registry.ToolContext(
+        google_credentials=self.google_credentials(),
+        email=EMAIL,
+        rpi_url=f"{self.server.url}/rpi/timer",
+        latitude=LATITUDE,
+        longitude=LONGITUDE,
+    )
+
+  def agent(self, **kwargs):
+    """Returns an Ecco6Agent talking to the stubbed OpenAI API."""
+    from ecco6.agent import Ecco6Agent
+    return Ecco6Agent(
+        "sk-offline", self.google_credentials(), f"{self.server.url}/rpi/timer", **kwargs)
+
+  def openai_client(self, **kwargs):
+    """Returns an OpenAIClient talking to the stubbed OpenAI API."""
+    from ecco6.client.OpenAIClient import OpenAIClient
+    return OpenAIClient("sk-offline", **kwargs)
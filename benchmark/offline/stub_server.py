@@ -0,0 +1,152 @@
+"""A local HTTP server standing in for the external services.
+
+Routes match the method and the path, without the query string, against a
+regular expression. Each route belongs to a service, e.g. "openai" or "sl",
+and every response of a service is delayed by that service's latency, so a
+benchmark can replay realistic network conditions or none at all.
+"""
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Mapping, Optional, Pattern, Sequence
+from urllib.parse import parse_qs, urlsplit
+
+
+@dataclass
+class StubRequest:
+  method: str
+  path: str
+  query: Dict[str, List[str]]
+  headers: Mapping[str, str]
+  body: bytes
+  match: "re.Match"
+
+
+@dataclass
+class StubResponse:
+  body: bytes = b""
+  content_type: str = "application/json"
+  status: int = 200
+
+
+@dataclass(frozen=True)
+class Route:
+  service: str
+  method: str
+  pattern: Pattern
+  handler: Callable[[StubRequest], StubResponse]
+
+
+def route(service: str, method: str, pattern: str, handler: Callable[[StubRequest], StubResponse]) -> Route:
+  return Route(service, method, re.compile(pattern), handler)
+
+
+@dataclass
+class _Counters:
+  requests: Dict[str, int] = field(default_factory=dict)
+  unmatched: List[str] = field(default_factory=list)
+  lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class StubServer:
+  """Serves `routes` on 127.0.0.1 on a free port, in a background thread.
+
+  Args:
+    routes: The routes, tried in order.
+    latency: Seconds each response of a service is delayed by, by service.
+      Services not in it answer at once.
+  """
+
+  def __init__(self, routes: Sequence[Route], latency: Optional[Mapping[str, float]] = None):
+    self.routes = list(routes)
+    self.latency = dict(latency or {})
+    self._counters = _Counters()
+    self._server: Optional[ThreadingHTTPServer] = None
+    self._thread: Optional[threading.Thread] = None
+
+  @property
+  def address(self) -> str:
+    host, port = self._server.server_address[:2]
+    return f"{host}:{port}"
+
+  @property
+  def url(self) -> str:
+    return f"http://{self.address}"
+
+  def requests(self, service: str) -> int:
+    """Returns how many requests a service has answered."""
+    with self._counters.lock:
+      return self._counters.requests.get(service, 0)
+
+  def unmatched(self) -> List[str]:
+    """Returns the "METHOD path" of every request no route matched."""
+    with self._counters.lock:
+      return list(self._counters.unmatched)
+
+  def _dispatch(self, handler: BaseHTTPRequestHandler):
+    url = urlsplit(handler.path)
+    length = int(handler.headers.get("Content-Length") or 0)
+    body = handler.rfile.read(length) if length else b""
+    for candidate in self.routes:
+      match = candidate.pattern.fullmatch(url.path)
+      if candidate.method == handler.command and match:
+        break
+    else:
+      with self._counters.lock:
+        self._counters.unmatched.append(f"{handler.command} {url.path}")
+      self._send(handler, StubResponse(b'{"error": "no stub for this request"}', status=404))
+      return
+    request = StubRequest(handler.command, url.path, parse_qs(url.query), handler.headers, body, match)
+    response = candidate.handler(request)
+    delay = self.latency.get(candidate.service, 0.0)
+    if delay:
+      time.sleep(delay)
+    with self._counters.lock:
+      self._counters.requests[candidate.service] = self._counters.requests.get(candidate.service, 0) + 1
+    self._send(handler, response)
+
+  @staticmethod
+  def _send(handler: BaseHTTPRequestHandler, response: StubResponse):
+    handler.send_response(response.status)
+    handler.send_header("Content-Type", response.content_type)
+    handler.send_header("Content-Length", str(len(response.body)))
+    handler.end_headers()
+    handler.wfile.write(response.body)
+
+  def start(self) -> "StubServer":
+    server = self
+
+    class Handler(BaseHTTPRequestHandler):
+      protocol_version = "HTTP/1.1"
+      # Small responses are written in two parts, headers and body, so
+      # Nagle's algorithm would hold the body back for a delayed ACK.
+      disable_nagle_algorithm = True
+
+      def do_GET(self):
+        server._dispatch(self)
+
+      do_POST = do_PUT = do_PATCH = do_DELETE = do_GET
+
+      def log_message(self, format, *args):
+        pass
+
+    self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    self._server.daemon_threads = True
+    self._thread = threading.Thread(target=self._server.serve_forever, name="stub-server", daemon=True)
+    self._thread.start()
+    return self
+
+  def stop(self):
+    if self._server is not None:
+      self._server.shutdown()
+      self._server.server_close()
+      self._thread.join()
+      self._server = None
+
+  def __enter__(self) -> "StubServer":
+    return self.start()
+
+  def __exit__(self, *exc_info):
+    self.stop()
@@ -0,0 +1,119 @@
+"""Benchmarks whole agent turns against the stubbed services.
+
+The stubbed model asks for the tool of the scenario matching the question
+in fixtures/openai_chat.json, then answers once the tool's result is in.
+
+Run with:
+  python -m pytest benchmark/offline/test_offline_agent.py
+"""
+import io
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from benchmark.offline.services import load_fixture  # noqa: E402
+from ecco6 import event_loop  # noqa: E402
+
+QUESTIONS = [
+  "What's the weather like in Stockholm?",
+  "Do I have any unread mail?",
+  "What's in my calendar today?",
+  "Turn on the light.",
+  "Which alarms do I have?",
+  "How do I get to T-Centralen from Kista?",
+  "Tell me the news headlines.",
+]
+ANSWER = load_fixture("openai_chat")["answer"]
+
+
+@pytest.fixture(scope="module")
+def agent(offline):
+  return offline.agent()
+
+
+def test_routing_can_be_turned_off(offline):
+  assert offline.agent().router is not None
+  assert offline.agent(route_tools=False).router is None
+
+
+@pytest.mark.parametrize("question", QUESTIONS)
+def test_chat_completion(run, agent, question):
+  answer = run(agent.chat_completion, [{"role": "user", "content": question}])
+  assert answer == ANSWER
+
+
+@pytest.mark.parametrize("question", [
+  "What's the weather like in Stockholm?",
+  "Do I have any unread mail?",
+  "Tell me the news headlines.",
+  "Which alarms do I have?",
+])
+def test_chat_completion_with_prefetch(run, agent, question):
+  from ecco6.tool import speculation
+
+  def turn():
+    agent.prefetch(question)
+    return agent.chat_completion([{"role": "user", "content": question}])
+
+  speculation.SPECULATIVE_RESULTS.clear()
+  assert run(turn, setup=speculation.SPECULATIVE_RESULTS.clear) == ANSWER
+  assert speculation.SPECULATIVE_RESULTS.stats()["hits"] == 1
+
+
+def test_streamed_completion(run, agent):
+  async def stream(context):
+    return "".join([token async for token in agent.astream_completion(
+        [{"role": "user", "content": QUESTIONS[0]}], context=context)])
+
+  assert run(lambda: event_loop.run(stream(agent.tool_context()))) == ANSWER
+
+
+def test_voice_turn(run, offline, agent):
+  """Transcription, the agent and synthesis of the answer, one after another."""
+  client = offline.openai_client()
+
+  def voice_turn():
+    recording = io.BytesIO(b"RIFF\x00\x00\x00\x00WAVE")
+    recording.name = "question.wav"
+    question = client.speech_to_text(recording)
+    answer = agent.chat_completion([{"role": "user", "content": question}])
+    return client.text_to_speech(answer)
+
+  assert run(voice_turn)
+  assert not offline.server.unmatched()
+
+
+def test_unstreamed_turn_plays_the_answer(offline, agent, monkeypatch):
+  import sys
+  import types
+
+  import streamlit as st
+  from pydub import AudioSegment
+
+  from ecco6 import util
+
+  # The sign-in module connects to Firebase with real credentials on import,
+  # and handle_turn does not use it.
+  monkeypatch.setitem(sys.modules, "ecco6.auth.firebase_auth", types.ModuleType("firebase_auth"))
+  from ecco6.views import homepage_view
+
+  class Recording(AudioSegment):
+    def export(self, *args, **kwargs):
+      # pydub needs ffmpeg to write MP3.
+      return io.BytesIO(b"mp3")
+
+  silence = AudioSegment.silent(duration=500, frame_rate=16000)
+  played = []
+  monkeypatch.setattr(homepage_view, "STREAM_RESPONSES", False)
+  monkeypatch.setattr(homepage_view, "STREAM_AUDIO", False)
+  monkeypatch.setattr(util, "autoplay_hidden_audio", played.append)
+  st.session_state.messages = []
+  st.session_state.pop("chat_history", None)
+
+  homepage_view.handle_turn(
+      Recording(silence.raw_data, sample_width=2, frame_rate=16000, channels=1),
+      agent, offline.openai_client())
+  assert [message["role"] for message in st.session_state.messages] == ["user", "assistant"]
+  assert st.session_state.messages[1]["content"] == ANSWER
+  assert played == [util.message_audio(st.session_state.messages[1])]
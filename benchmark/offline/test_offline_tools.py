@@ -0,0 +1,66 @@
+"""Benchmarks every tool against the stubbed services.
+
+Run with:
+  python -m pytest benchmark/offline/test_offline_tools.py
+"""
+import time
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from ecco6 import event_loop  # noqa: E402
+from ecco6.tool import registry  # noqa: E402
+
+# Tool name, arguments and a part of the expected result.
+TOOL_CASES = [
+  ("get_weather", {"city_name": "Stockholm"}, "Partly cloudy"),
+  ("get_weather", {"city_name": "Stockholm", "date": "2024-05-03"}, "2024-05-03"),
+  ("get_top_headlines", {}, "Headline 1"),
+  ("get_current_location", {}, "Drottninggatan 1"),
+  ("get_events_by_date", {"date": "2024-05-01"}, "Lunch with Alex"),
+  ("get_unread_messages", {}, "Subject: Lunch"),
+  ("list_task_lists", {}, "Groceries"),
+  ("list_tasks_in_list", {"task_list_name": "Groceries"}, "Buy milk"),
+  ("get_alarms", {}, "Wake up"),
+  ("set_alarm", {"day": "Friday", "date": "2024-05-03", "clock": "07:30"}, "successfully"),
+  ("turn_on_light", {}, "turned on"),
+  ("set_rpi_timer", {"time": "00:05:00"}, "successfully"),
+  ("get_nearby_stops", {"latitude": 59.3308, "longitude": 18.0592}, "Stockholm"),
+  ("get_travel_suggestions", {"origin_station_name": "Kista", "destination_station_name": "T-Centralen"}, "Kista"),
+  ("get_itinerary_suggestions", {"station_names": ["Kista", "Slussen", "Kista"]}, "From Slussen to Kista"),
+  ("get_travel_suggestions_from_location", {"destination_station_name": "Kista"}, "Nearest stop"),
+]
+
+
+@pytest.fixture(scope="module")
+def tools(offline):
+  context = offline.tool_context()
+  return context, {tool.name: tool for tool in registry.get_tools(context)}
+
+
+def clear_caches():
+  from ecco6.tool import sl
+  sl.TRIP_CACHE.clear()
+
+
+@pytest.mark.parametrize("name,args,expected", TOOL_CASES, ids=[case[0] for case in TOOL_CASES])
+def test_tool(run, offline, tools, name, args, expected):
+  context, by_name = tools
+  with registry.tool_context(context):
+    result = run(by_name[name].invoke, args, setup=clear_caches)
+  assert expected in str(result)
+  assert not offline.server.unmatched()
+
+
+
+def test_itinerary_legs_are_requested_together(offline, tools, monkeypatch):
+  context, by_name = tools
+  monkeypatch.setitem(offline.server.latency, "sl", 0.2)
+  clear_caches()
+  start = time.perf_counter()
+  with registry.tool_context(context):
+    result = event_loop.run(by_name["get_itinerary_suggestions"].ainvoke(
+        {"station_names": ["Kista", "Slussen", "Medborgarplatsen", "Kista"]}))
+  assert time.perf_counter() - start < 0.4
+  assert result.count("From ") == 3
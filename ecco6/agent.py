@@ -1,14 +1,19 @@
-import functools
-from typing import Mapping, Sequence, Tuple
+import hashlib
+import logging
+import re
+from typing import AsyncIterator, Dict, FrozenSet, List, Mapping, Optional, Sequence, Tuple
 
 import streamlit as st
 from langchain.agents import AgentExecutor, create_tool_calling_agent
 from langchain.tools import StructuredTool
-from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_openai import ChatOpenAI
 
-from ecco6.tool import google, location, time, weather, rpi_timer, news, sl, alarm, light
+from ecco6 import history, tracing
+from ecco6.client.OpenAIClient import AsyncChatCompletions, PoolConfig, get_openai
+from ecco6.executor import ParallelAgentExecutor
+from ecco6.tool import prefetch, registry
 
 SYS_PROMPT = """\
 You are a voice assistant named Ecco6. Your task is to handle questions and
@@ -21,25 +26,129 @@ if the tools does not provide information to answer that question.
 In the Google Task, we can create multiple task lists, and each task list can contain multiple tasks.
 """
 
+SUMMARY_PROMPT = """\
+Summarize the conversation between a user and the voice assistant Ecco6
+below in a few sentences. Extend the existing summary if there is one. Keep
+names, dates, times, places and anything the user asked to remember.
+"""
+
+# Word stems that make the router offer a group of tools. A word matches a
+# stem it starts with, so "meetings" matches "meeting", but not a stem in
+# its middle, so "email" needs its own stem next to "mail".
+TOOL_GROUP_KEYWORDS = {
+  "calendar": ("calendar", "event", "meeting", "appointment", "schedule", "agenda", "busy"),
+  "gmail": ("mail", "email", "e-mail", "gmail", "inbox", "unread", "message", "send", "reply"),
+  "tasks": ("task", "todo", "to-do", "list", "chore"),
+  "docs": ("document", "docs", "note", "write", "insert", "text"),
+  "location": ("where", "location", "address", "here", "nearby", "near"),
+  "news": ("news", "headline"),
+  "weather": (
+    "weather", "temperature", "forecast", "rain", "snow", "sun", "wind", "cold", "warm",
+    "hot", "umbrella", "degree"),
+  "alarm": ("alarm", "wake"),
+  "timer": ("timer", "countdown", "count down"),
+  "light": ("light", "lamp", "bright", "dim", "dark", "bulb"),
+  "travel": (
+    "travel", "trip", "journey", "route", "commute", "bus", "metro", "subway", "tunnelbana",
+    "train", "tram", "pendeltåg", "ferry", "boat", "station", "stop", "depart", "arriv",
+    "get to", "go to", "going to", "get from", "how do i get", "how can i get", "take me"),
+}
+# Groups offered with every request. The time tool is small and most
+# requests about dates need it.
+ALWAYS_ROUTED_GROUPS = frozenset({"time"})
+# Groups that come with another group, e.g. nearby stops need the location.
+ROUTED_GROUP_DEPENDENCIES = {
+  "weather": frozenset({"location"}),
+  "travel": frozenset({"location"}),
+}
+
+
+class ToolRouter:
+  """Picks the tool groups an utterance may need with a keyword match.
+
+  Only the tools of those groups are sent to the model, which keeps the
+  function-calling prompt small. When no group matches, for example on a
+  follow-up like "yes, do it", every group is offered.
+
+  Args:
+    keywords: Maps each group to the word stems that select it.
+    history_turns: How many earlier user messages are routed along with the
+      last one, so that follow-ups keep the tools of the previous turn.
+  """
+
+  def __init__(
+      self, keywords: Mapping[str, Sequence[str]] = TOOL_GROUP_KEYWORDS,
+      history_turns: int = 1):
+    self.history_turns = history_turns
+    self._patterns = {
+      group: re.compile(r"\b(?:" + "|".join(map(re.escape, stems)) + ")", re.IGNORECASE)
+      for group, stems in keywords.items()
+    }
+
+  def route_text(self, text: str) -> Optional[FrozenSet[str]]:
+    """Returns the groups `text` asks for, or None if it matches none."""
+    groups = {group for group, pattern in self._patterns.items() if pattern.search(text)}
+    if not groups:
+      return None
+    for group in list(groups):
+      groups |= ROUTED_GROUP_DEPENDENCIES.get(group, frozenset())
+    return frozenset(groups | ALWAYS_ROUTED_GROUPS)
+
+  def route(self, messages: Sequence[Mapping[str, str]]) -> Optional[FrozenSet[str]]:
+    """Returns the groups to offer for the last message, or None for all."""
+    user_messages = [message["content"] for message in messages if message["role"] == "user"]
+    return self.route_text(" ".join(user_messages[-(self.history_turns + 1):]))
+
 
 class Ecco6Agent:
   def __init__(
-    self, openai_api_key: str, google_credentials, rpi_url, chat_model: str = "gpt-4-turbo"):
+    self, openai_api_key: str, google_credentials, rpi_url, chat_model: str = "gpt-4-turbo",
+    router: Optional[ToolRouter] = None, route_tools: bool = True,
+    parallel_tools: bool = True, openai_pool: PoolConfig = PoolConfig()):
     self.google_credentials = google_credentials
     self.rpi_url = rpi_url
-    llm = ChatOpenAI(model=chat_model, api_key=openai_api_key)
-    prompt = ChatPromptTemplate.from_messages([
+    # Without routing, every request is offered every tool.
+    if not route_tools:
+      self.router = None
+    else:
+      self.router = router if router is not None else ToolRouter()
+    self.parallel_tools = parallel_tools
+    self.chat_model = chat_model
+    # The model shares the connection pool of speech-to-text and
+    # text-to-speech, see OpenAIClient.get_openai.
+    self.llm = ChatOpenAI(
+        model=chat_model, api_key=openai_api_key,
+        client=get_openai(openai_api_key, openai_pool).chat.completions,
+        async_client=AsyncChatCompletions(openai_api_key, openai_pool))
+    self.prompt = ChatPromptTemplate.from_messages([
         ("system", SYS_PROMPT),
         MessagesPlaceholder(variable_name="chat_history", optional=True),
         ("user", "{input}"),
         MessagesPlaceholder(variable_name="agent_scratchpad"),
     ])
-    tools = self._create_tools()
-    #tools = self._create_dummy_tools()
-    agent = create_tool_calling_agent(llm, tools, prompt)
-    self.agent_executor = AgentExecutor(
-       agent=agent, tools=tools, verbose=True)
-    
+    self._build_context = self.tool_context()
+    self._executors: Dict[Optional[FrozenSet[str]], AgentExecutor] = {}
+    self.agent_executor = self._get_executor(None)
+
+  def _get_executor(self, groups: Optional[FrozenSet[str]]) -> AgentExecutor:
+    """Returns the executor offering the tools of `groups`, or all if None."""
+    executor = self._executors.get(groups)
+    if executor is None:
+      tools = registry.get_tools(self._build_context, groups)
+      #tools = self._create_dummy_tools()
+      agent = create_tool_calling_agent(self.llm, tools, self.prompt)
+      executor_class = ParallelAgentExecutor if self.parallel_tools else AgentExecutor
+      executor = self._executors[groups] = executor_class(
+         agent=agent, tools=tools, verbose=True)
+    return executor
+
+  def _route(self, messages: Sequence[Mapping[str, str]]) -> AgentExecutor:
+    if self.router is None:
+      return self.agent_executor
+    groups = self.router.route(messages)
+    logging.info(f"Offering tool groups: {'all' if groups is None else sorted(groups)}")
+    return self._get_executor(groups)
+
   def _create_dummy_tools(self):
     dummy_tool = StructuredTool.from_function(
         func=lambda x: "Hello world",
@@ -47,281 +156,170 @@ class Ecco6Agent:
         description='Returns "Hellow world" as a string.',
     )
     return [dummy_tool]
-    
-  def _create_tools(self):
-    tools = []
-    if self.google_credentials is not None:
-      get_events_by_date_tool = StructuredTool.from_function(
-          func=functools.partial(
-            google.get_events_by_date, google_credentials=self.google_credentials),
-          name="get_events_by_date",
-          description="Get all events of a day from Google calendar.",
-          args_schema=google.GetEventsByDateInput,
-      )
-      tools.append(get_events_by_date_tool)
-
-    get_current_time_tool = StructuredTool.from_function(
-        func=time.get_current_time,
-        name="get_current_time",
-        description="Get the current date, time and the week day name."
-    )
-    tools.append(get_current_time_tool)
-    
-    add_event_tool = StructuredTool.from_function(
-        func=functools.partial(
-        google.add_event, google_credentials=self.google_credentials),
-        name="add_event",
-        description="Add an event to the Google calendar.",
-        args_schema=google.AddEventInput,
-    )
-    tools.append(add_event_tool)
-
-    remove_event_tool = StructuredTool.from_function(
-        func=functools.partial(
-            google.remove_event, google_credentials=self.google_credentials),
-        name="remove_event",
-        description="Remove an event from the Google calendar.",
-        args_schema=google.RemoveEventInput,
-    )
-    tools.append(remove_event_tool)
 
-    get_unread_messages_tool = StructuredTool.from_function(
-          func=functools.partial(google.get_unread_messages, google_credentials=self.google_credentials),
-          name="get_unread_messages",
-          description="Retrieve unread messages from Gmail.",
-          args_schema=google.GetUnreadMessagesInput,
-    )
-    tools.append(get_unread_messages_tool)
-    
-    send_email_tool = StructuredTool.from_function(
-        func=functools.partial(google.send_email, google_credentials=self.google_credentials),
-        name="send_email",
-        description="Send an email via Gmail.",
-        args_schema=google.SendEmailInput,
-    )
-    tools.append(send_email_tool)
+  def tool_context(self) -> registry.ToolContext:
+    """The values the tools read for the current session.
 
-    list_task_lists_tool = StructuredTool.from_function(
-        func=functools.partial(google.list_task_lists, google_credentials=self.google_credentials),
-        name="list_task_lists",
-        description="List all task lists from Google Tasks.",
-        args_schema=google.ListTaskListsInput,
-    )
-    tools.append(list_task_lists_tool)
-    
-    create_taskList_tool = StructuredTool.from_function(
-        func=functools.partial(google.create_taskList, google_credentials=self.google_credentials),
-        name="create_taskList",
-        description="Create a new task list in Google Tasks.",
-        args_schema=google.CreateTaskListInput,
-    )
-    tools.append(create_taskList_tool)
-
-    list_tasks_in_list_tool = StructuredTool.from_function(
-        func=functools.partial(
-        google.list_tasks_in_list, google_credentials=self.google_credentials),
-        name="list_tasks_in_list",
-        description="List all tasks in a specified task list from Google Tasks.",
-        args_schema=google.ListTasksInListInput,
+    They come from st.session_state, so this must be called in the script
+    thread.
+    """
+    return registry.ToolContext(
+        google_credentials=self.google_credentials,
+        email=st.session_state.get("email"),
+        rpi_url=self.rpi_url,
+        latitude=st.session_state.get("latitude"),
+        longitude=st.session_state.get("longitude"),
     )
-    tools.append(list_tasks_in_list_tool)
-
-    add_task_tool = StructuredTool.from_function(
-        func=functools.partial(
-        google.add_task, google_credentials=self.google_credentials),
-        name="add_task",
-        description="Add a task to a specified task list in Google Tasks.",
-        args_schema=google.AddTaskInput,
-    )
-    tools.append(add_task_tool)
-
-    remove_task_list_tool = StructuredTool.from_function(
-        func=functools.partial(
-        google.remove_task_list, google_credentials=self.google_credentials),
-        name="remove_task_list",
-        description="Remove the entire task list in Google Tasks.",
-        args_schema=google.RemoveTaskListInput,
-    )
-    tools.append(remove_task_list_tool)
-
-    remove_task_tool = StructuredTool.from_function(
-        func=functools.partial(
-        google.remove_task, google_credentials=self.google_credentials),
-        name="remove_task",
-        description="Remove a task from a specified task list in Google Tasks.",
-        args_schema=google.RemoveTaskInput,
-    )
-    tools.append(remove_task_tool)
-    
-    if "latitude" in st.session_state and "longitude" in st.session_state:
-      get_current_location_tool = StructuredTool.from_function(
-          func=lambda x: location.get_current_location(latitude=st.session_state.latitude, longitude=st.session_state.longitude),
-          name="get_current_location",
-          description="Get my current location.",
-      )
-      tools.append(get_current_location_tool)
-    
-    get_news_tool = StructuredTool.from_function(
-    func=news.get_top_headlines,
-    name="get_top_headlines",
-    description="Get the top headlines news from various sources."
-    )
-    tools.append(get_news_tool)
 
-    get_weather_tool = StructuredTool.from_function(
-        func=lambda city_name,date=None: weather.get_weather(weather.WeatherInput(city_name=city_name,date=date)),
-        name="get_weather",
-        description="Get the current weather for a specified city.",
-        args_schema=weather.WeatherInput,
-    )
-    tools.append(get_weather_tool)
+  def prefetch(self, transcript: str) -> List[str]:
+    """Starts the tool calls the transcript likely needs in the background.
 
-    set_alarm_tool = StructuredTool.from_function(
-        func=lambda day, date, clock, title=None: alarm.set_alarm(alarm.SetAlarmInput(day=day, date=date, clock=clock, title=title)),
-        name="set_alarm",
-        description="Set an alarm for a specified time.",
-        args_schema=alarm.SetAlarmInput,
-    )
-    tools.append(set_alarm_tool)
+    Call it before `chat_completion`, in the same session, so the model's
+    calls find the results. See ecco6.tool.prefetch.
 
-    remove_alarm_tool = StructuredTool.from_function(
-        func=lambda day, date, clock, title=None: alarm.delete_alarm(alarm.SetAlarmInput(day=day, date=date, clock=clock, title=title)),
-        name="remove_alarm",
-        description="Remove an alarm of a specified time.",
-        args_schema=alarm.SetAlarmInput,
-    )
-    tools.append(remove_alarm_tool)
+    Returns:
+      The names of the tools started.
+    """
+    return prefetch.prefetch(transcript, self.tool_context())
 
-    get_alarm_tool = StructuredTool.from_function(
-        func=alarm.list_user_alarms,
-        name="get_alarms",
-        description="Get the users alarms",
-    )
-    tools.append(get_alarm_tool)
+  @staticmethod
+  def _summary_prompt(summary: str, messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+    transcript = "\n".join(
+      f"{'User' if isinstance(message, HumanMessage) else 'Ecco6'}: {message.content}"
+      for message in messages)
+    if summary:
+      transcript = f"Existing summary: {summary}\n\n{transcript}"
+    return [SystemMessage(content=SUMMARY_PROMPT), HumanMessage(content=transcript)]
 
-    modify_alarm_tool = StructuredTool.from_function(
-        func=lambda existing_day, existing_date, existing_clock, existing_title=None, new_day=None, new_date=None, new_clock=None, new_title=None: alarm.modify_alarm(alarm.ModifyAlarmArgs(existing_day=existing_day,existing_date=existing_date,existing_clock=existing_clock,existing_title=existing_title,new_day=new_day,new_date=new_date,new_clock=new_clock,new_title=new_title)),
-        name="modify_alarm",
-        description="Modify an existing alarm with new information.",
-        args_schema=alarm.ModifyAlarmArgs, 
-    )
-    tools.append(modify_alarm_tool)
-
-    if self.rpi_url is not None:
-      set_rpi_timer_tool = StructuredTool.from_function(
-          func=functools.partial(rpi_timer.set_rpi_timer, url=self.rpi_url),
-          name="set_rpi_timer",
-          description="Set an timer/countdown by given time.",
-          args_schema=rpi_timer.SetRpiTimerInput,
-      )
-      tools.append(set_rpi_timer_tool)
-
-    turn_on_light_tool = StructuredTool.from_function(
-        func=functools.partial(
-          light.turn_on_light, 
-          url=st.secrets["LIGHT"]["URL"]+"/api/services/script/turn_on_bulb",
-          token = st.secrets["LIGHT"]["API_KEY"]
-        ),
-        name="turn_on_light",
-        description="Turn on the light.",
-        args_schema=light.SetLightInput,
-    )
-    tools.append(turn_on_light_tool)
-
-    turn_off_light_tool = StructuredTool.from_function(
-        func=functools.partial(
-          light.turn_off_light,
-          url=st.secrets["LIGHT"]["URL"]+"/api/services/script/turn_off_bulb",
-          token=st.secrets["LIGHT"]["API_KEY"]
-        ),
-        name="turn_off_light",
-        description="Turn off the light.",
-        args_schema=light.SetLightInput,
-    )
-    tools.append(turn_off_light_tool)
-
-    set_brightness_low_tool = StructuredTool.from_function(
-        func=functools.partial(
-          light.set_brightness_low, 
-          url=st.secrets["LIGHT"]["URL"]+"/api/services/script/set_brightness_low",
-          token = st.secrets["LIGHT"]["API_KEY"]
-        ),
-        name="set_brightness_low",
-        description="Set the brightness of the light as low.",
-        args_schema=light.SetLightInput,
-    )
-    tools.append(set_brightness_low_tool)
-
-    set_brightness_medium_tool = StructuredTool.from_function(
-        func=functools.partial(
-          light.set_brightness_medium, 
-          url=st.secrets["LIGHT"]["URL"]+"/api/services/script/set_brightness_medium",
-          token = st.secrets["LIGHT"]["API_KEY"]
-        ),
-        name="set_brightness_medium",
-        description="Set the brightness of the light as medium.",
-        args_schema=light.SetLightInput,
-    )
-    tools.append(set_brightness_medium_tool)
-
-    set_brightness_high_tool = StructuredTool.from_function(
-        func=functools.partial(
-          light.set_brightness_high, 
-          url=st.secrets["LIGHT"]["URL"]+"/api/services/script/set_brightness_high",
-          token = st.secrets["LIGHT"]["API_KEY"]
-        ),
-        name="set_brightness_high",
-        description="Set the brightness of the light as high.",
-        args_schema=light.SetLightInput,
-    )
-    tools.append(set_brightness_high_tool)
-    
-    get_travel_suggestions_tool = StructuredTool.from_function(
-        func=sl.get_travel_suggestions,
-        name="get_travel_suggestions",
-        description="Get travel suggestions for a specific journey.",
-        args_schema=sl.GetTravelSuggestionsInput,
-    )
-    tools.append(get_travel_suggestions_tool)
-    
-    get_nearby_stops_tool = StructuredTool.from_function(
-        func=sl.get_nearby_stops,
-        name="get_nearby_stops",
-        description="Get nearby stops based on current location.",
-        args_schema=sl.GetNearbyStopsInput,
-    )
-    tools.append(get_nearby_stops_tool)
-
-    create_document_tool = StructuredTool.from_function(
-        func=functools.partial(
-        google.create_document, google_credentials=self.google_credentials),
-        name="create_document",
-        description="Create a new Google Docs document.",
-        args_schema=google.CreateDocumnetInput,
-    )
-    tools.append(create_document_tool)
+  @tracing.traced("history.summarize")
+  def _summarize(self, summary: str, messages: Sequence[BaseMessage]) -> str:
+    return self.llm.invoke(self._summary_prompt(summary, messages)).content
 
-    insert_text_tool = StructuredTool.from_function(
-        func=functools.partial(google.insert_text, google_credentials=self.google_credentials),
-        name="insert_text",
-        description="Insert text into a Google Docs document.",
-        args_schema=google.InsertTextInput,
-    )
-    tools.append(insert_text_tool)
-    return tools
-  
-  
-  def chat_completion(self, messages: Sequence[Mapping[str, str]]) -> str:
-    chat_history = []
-    for message in messages[:-1]:
-      if message["role"] == "user":
-        chat_history.append(HumanMessage(content=message["content"]))
-      else:
-        chat_history.append(AIMessage(content=message["content"]))
-    
-    result = self.agent_executor.invoke({
+  @tracing.traced("history.summarize")
+  async def _asummarize(self, summary: str, messages: Sequence[BaseMessage]) -> str:
+    return (await self.llm.ainvoke(self._summary_prompt(summary, messages))).content
+
+  def new_history(self, **kwargs) -> history.ChatHistory:
+    """Returns an empty history for a session, summarized by this agent's model.
+
+    Args:
+      **kwargs: Passed on to `history.ChatHistory`, e.g. max_tokens.
+    """
+    return history.ChatHistory(
+      history.get_token_counter(self.chat_model), self._summarize,
+      asummarize=self._asummarize, **kwargs)
+
+  def _agent_input(
+      self, messages: Sequence[Mapping[str, str]],
+      chat_history: Optional[history.ChatHistory] = None) -> Mapping:
+    if chat_history is None:
+      chat_history = [history.to_message(message) for message in messages[:-1]]
+    else:
+      chat_history.update(messages[:-1])
+      chat_history = chat_history.messages()
+    return {
       "chat_history": chat_history,
       "input": messages[-1]["content"],
-    })
+    }
+
+  async def _aagent_input(
+      self, messages: Sequence[Mapping[str, str]],
+      chat_history: Optional[history.ChatHistory] = None) -> Mapping:
+    # Summarizing must not block the shared event loop, which every
+    # session's streamed turn runs on.
+    if chat_history is not None:
+      await chat_history.aupdate(messages[:-1])
+      return {"chat_history": chat_history.messages(), "input": messages[-1]["content"]}
+    return self._agent_input(messages)
+
+  def chat_completion(
+      self, messages: Sequence[Mapping[str, str]],
+      chat_history: Optional[history.ChatHistory] = None) -> str:
+    """Answers the last of `messages`.
+
+    Args:
+      messages: The session's messages, the last one being the request.
+      chat_history: The session's history from `new_history`. If given, the
+        earlier messages are sent through it, budgeted and summarized,
+        instead of all of them verbatim.
+    Returns:
+      The answer of the agent.
+    """
+    agent_executor = self._route(messages)
+    with registry.tool_context(self.tool_context()):
+      result = agent_executor.invoke(
+        self._agent_input(messages, chat_history), {"callbacks": [tracing.LLMSpans()]})
     return result["output"]
 
+  async def achat_completion(
+      self, messages: Sequence[Mapping[str, str]],
+      chat_history: Optional[history.ChatHistory] = None,
+      context: Optional[registry.ToolContext] = None) -> str:
+    """Like chat_completion, but awaits the tools that have async variants.
+
+    Args:
+      messages: The session's messages, the last one being the request.
+      chat_history: The session's history from `new_history`.
+      context: The session's `tool_context()`. It must be given when not
+        running in the script thread, e.g. on ecco6.event_loop.
+    """
+    agent_executor = self._route(messages)
+    with registry.tool_context(context or self.tool_context()):
+      result = await agent_executor.ainvoke(
+        await self._aagent_input(messages, chat_history), {"callbacks": [tracing.LLMSpans()]})
+    return result["output"]
+
+  async def astream_completion(
+      self, messages: Sequence[Mapping[str, str]],
+      chat_history: Optional[history.ChatHistory] = None,
+      context: Optional[registry.ToolContext] = None) -> AsyncIterator[str]:
+    """Like achat_completion, but yields the answer as the model writes it.
+
+    Yields:
+      The pieces of text the chat model streams, tool calls left out.
+    """
+    agent_executor = self._route(messages)
+    with registry.tool_context(context or self.tool_context()):
+      async for event in agent_executor.astream_events(
+          await self._aagent_input(messages, chat_history), {"callbacks": [tracing.LLMSpans()]},
+          version="v2"):
+        if event["event"] != "on_chat_model_stream":
+          continue
+        content = event["data"]["chunk"].content
+        if content and isinstance(content, str):
+          yield content
+
+
+def credential_identity(google_credentials) -> Optional[str]:
+  """Returns a stable, non-secret identity of Google credentials."""
+  if google_credentials is None:
+    return None
+  secret = google_credentials.refresh_token or google_credentials.token
+  return hashlib.sha256(f"{google_credentials.client_id}:{secret}".encode()).hexdigest()
+
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def _get_cached_agent(
+    openai_api_key: str, chat_model: str, google_identity: Optional[str],
+    rpi_url: Optional[str], has_location: bool, openai_pool: PoolConfig, route_tools: bool,
+    _google_credentials) -> Ecco6Agent:
+  return Ecco6Agent(
+      openai_api_key, google_credentials=_google_credentials, rpi_url=rpi_url,
+      chat_model=chat_model, route_tools=route_tools, openai_pool=openai_pool)
+
+
+def get_agent(
+    openai_api_key: str, google_credentials, rpi_url, chat_model: str = "gpt-4-turbo",
+    openai_pool: PoolConfig = PoolConfig(), route_tools: bool = True) -> Ecco6Agent:
+  """Returns an Ecco6Agent, reusing the one built on an earlier rerun.
+
+  The agent is rebuilt only when the chat model, the Google credentials, the
+  Raspberry Pi url or whether a location is known change, which are what
+  decide its tool set. The tools themselves are shared process-wide and read
+  the per-session state, such as the location, from the request's
+  `registry.ToolContext`.
+  """
+  has_location = "latitude" in st.session_state and "longitude" in st.session_state
+  return _get_cached_agent(
+      openai_api_key, chat_model, credential_identity(google_credentials), rpi_url,
+      has_location, openai_pool, route_tools, google_credentials)
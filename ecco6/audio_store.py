@@ -0,0 +1,105 @@
+"""Bounded storage for the audio of a session's messages.
+
+Every turn adds the user's recording and the spoken answer to the session,
+so keeping them all as bytes grows each session's memory without bound.
+`AudioStore` keeps the most recently used audio in memory up to a byte
+limit and moves older audio to a spool file, an append-only temporary file
+deleted with the store. Messages hold an `AudioRef` instead of the bytes,
+and spooled audio is only read back if it is played again.
+"""
+import dataclasses
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+@dataclasses.dataclass(frozen=True)
+class AudioRef:
+  """The audio of one message in an `AudioStore`."""
+  store: "AudioStore" = dataclasses.field(repr=False, compare=False)
+  id: int
+  size: int
+
+  def read(self) -> bytes:
+    return self.store.get(self.id)
+
+
+class AudioStore:
+  """Audio kept in memory up to `max_memory_bytes`, the rest on disk.
+
+  Args:
+    max_memory_bytes: Maximum size of the audio in memory. Storing beyond
+      it spools the least recently used audio to disk.
+    directory: Where the spool file is created, the system's temporary
+      directory by default.
+  """
+
+  def __init__(self, max_memory_bytes: int = 4 * 2**20, directory: Optional[str] = None):
+    self.max_memory_bytes = max_memory_bytes
+    self.directory = directory
+    self._memory: "OrderedDict[int, bytes]" = OrderedDict()
+    self._memory_size = 0
+    # Where each spooled audio is in the spool file: (offset, size).
+    self._spooled: Dict[int, Tuple[int, int]] = {}
+    self._spool = None
+    self._spool_size = 0
+    self._next_id = 0
+    self.reloads = 0
+    self._lock = threading.Lock()
+
+  def _spool_out(self, id: int, audio: bytes):
+    if id in self._spooled:
+      # Audio never changes, so audio read back is still in the spool file.
+      return
+    if self._spool is None:
+      self._spool = tempfile.TemporaryFile(prefix="ecco6-audio-", dir=self.directory)
+    self._spool.seek(self._spool_size)
+    self._spool.write(audio)
+    self._spooled[id] = (self._spool_size, len(audio))
+    self._spool_size += len(audio)
+
+  def _remember(self, id: int, audio: bytes):
+    self._memory[id] = audio
+    self._memory_size += len(audio)
+    while self._memory_size > self.max_memory_bytes and self._memory:
+      old_id, old_audio = self._memory.popitem(last=False)
+      self._memory_size -= len(old_audio)
+      self._spool_out(old_id, old_audio)
+
+  def put(self, audio: bytes) -> AudioRef:
+    """Stores `audio` and returns the reference to keep instead of it."""
+    with self._lock:
+      id = self._next_id
+      self._next_id += 1
+      self._remember(id, audio)
+    return AudioRef(self, id, len(audio))
+
+  def get(self, id: int) -> bytes:
+    """Returns stored audio, reading it back from disk if it was spooled."""
+    with self._lock:
+      audio = self._memory.get(id)
+      if audio is not None:
+        self._memory.move_to_end(id)
+        return audio
+      offset, size = self._spooled[id]
+      self._spool.seek(offset)
+      audio = self._spool.read(size)
+      self.reloads += 1
+      self._remember(id, audio)
+      return audio
+
+  def stats(self) -> Dict[str, int]:
+    """Returns the size of the audio in memory and in the spool file."""
+    with self._lock:
+      return {
+        "audio": self._next_id, "memory_bytes": self._memory_size,
+        "spool_bytes": self._spool_size, "reloads": self.reloads,
+      }
+
+  def close(self):
+    """Deletes the spool file. The spooled audio can no longer be read."""
+    with self._lock:
+      if self._spool is not None:
+        self._spool.close()
+        self._spool = None
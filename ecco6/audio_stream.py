@@ -0,0 +1,225 @@
+"""Streams synthesized speech to the browser over a local HTTP endpoint.
+
+`autoplay_hidden_audio` and `queue_hidden_audio` embed the whole MP3 in the
+page as base64, so nothing plays before text-to-speech has finished, and the
+audio is held in Python as bytes, as base64 and as HTML at once. Instead,
+`SpeechStream` receives the audio a chunk at a time as OpenAI sends it, and
+`AudioServer` serves it at an unguessable URL with chunked transfer encoding,
+writing each chunk to the browser as soon as it arrives. The page only gets
+the URL, and playback starts on the first chunk. Range requests, such as the
+probe Safari sends before playing media, are answered once the audio is
+complete.
+"""
+import functools
+import logging
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Iterator, List, Optional
+
+
+class SpeechStream:
+  """Audio that is readable, any number of times, while it is arriving.
+
+  Chunks are kept as the bytes objects they arrive as, so readers are handed
+  the same objects instead of copies.
+  """
+
+  def __init__(self):
+    self._chunks: List[bytes] = []
+    self._done = False
+    self._error: Optional[BaseException] = None
+    self._changed = threading.Condition()
+    self.first_chunk_at: Optional[float] = None
+
+  @classmethod
+  def from_bytes(cls, audio: bytes) -> "SpeechStream":
+    """Returns a finished stream of `audio`."""
+    stream = cls()
+    stream.write(audio)
+    stream.close()
+    return stream
+
+  def write(self, chunk: bytes):
+    if not chunk:
+      return
+    with self._changed:
+      if self.first_chunk_at is None:
+        self.first_chunk_at = time.perf_counter()
+      self._chunks.append(chunk)
+      self._changed.notify_all()
+
+  def close(self, error: Optional[BaseException] = None):
+    """Marks the stream finished, by `error` if it failed."""
+    with self._changed:
+      self._done = True
+      self._error = error
+      self._changed.notify_all()
+
+  def __iter__(self) -> Iterator[bytes]:
+    """Yields the chunks, waiting for the ones that have not arrived yet."""
+    with self._changed:
+      # `audio()` replaces the list once the stream is done, so a reader
+      # that started before keeps reading the list it started with.
+      chunks = self._chunks
+    sent = 0
+    while True:
+      with self._changed:
+        self._changed.wait_for(lambda: sent < len(chunks) or self._done)
+        if sent == len(chunks):
+          return
+        chunk = chunks[sent]
+      sent += 1
+      yield chunk
+
+  def audio(self, timeout: Optional[float] = None) -> bytes:
+    """Waits for the stream to finish and returns the whole audio.
+
+    Raises:
+      TimeoutError: If it does not finish within `timeout` seconds.
+      Exception: Whatever the synthesis failed with.
+    """
+    with self._changed:
+      if not self._changed.wait_for(lambda: self._done, timeout):
+        raise TimeoutError("Speech did not finish in time.")
+      if self._error is not None:
+        raise self._error
+      if len(self._chunks) != 1:
+        # MP3 frames can be concatenated into one playable file. Joined
+        # once, so that the chunks are not kept alongside the whole.
+        self._chunks = [b"".join(self._chunks)]
+      return self._chunks[0]
+
+
+class AudioServer:
+  """Serves published `SpeechStream`s in a background thread.
+
+  Args:
+    host: The interface to listen on.
+    port: The port to listen on, 0 for any free port.
+    public_url: The URL the browser reaches the server at, if it is not
+      http://host:port, e.g. behind a reverse proxy.
+    ttl: Seconds a stream stays published. It stays published after it has
+      been served, since browsers fetch media again, e.g. to replay it, and
+      is dropped when a stream is published after it has expired.
+  """
+
+  _PATH = re.compile(r"/speech/([\w-]+)\.mp3")
+  _RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+
+  def __init__(
+      self, host: str = "127.0.0.1", port: int = 0, public_url: Optional[str] = None,
+      ttl: float = 60):
+    self.ttl = ttl
+    self._streams: "OrderedDict[str, tuple]" = OrderedDict()
+    self._lock = threading.Lock()
+    server = self
+
+    class Handler(BaseHTTPRequestHandler):
+      protocol_version = "HTTP/1.1"
+      disable_nagle_algorithm = True
+
+      def do_GET(self):
+        server._serve(self)
+
+      def log_message(self, format, *args):
+        logging.debug(f"Audio server: {format % args}")
+
+    self._server = ThreadingHTTPServer((host, port), Handler)
+    self._server.daemon_threads = True
+    bound_host, bound_port = self._server.server_address[:2]
+    self.url = (public_url or f"http://{bound_host}:{bound_port}").rstrip("/")
+    threading.Thread(
+        target=self._server.serve_forever, name="ecco6-audio-server", daemon=True).start()
+    logging.info(f"Serving streamed speech at {self.url}")
+
+  def publish(self, stream: SpeechStream) -> str:
+    """Returns the URL `stream` is served at until it expires."""
+    token = secrets.token_urlsafe(16)
+    now = time.monotonic()
+    with self._lock:
+      while self._streams and next(iter(self._streams.values()))[0] < now - self.ttl:
+        self._streams.popitem(last=False)
+      self._streams[token] = (now, stream)
+    return f"{self.url}/speech/{token}.mp3"
+
+  def _serve(self, handler: BaseHTTPRequestHandler):
+    match = self._PATH.fullmatch(handler.path.split("?", 1)[0])
+    with self._lock:
+      entry = self._streams.get(match.group(1)) if match else None
+    if entry is None:
+      handler.send_error(404)
+      return
+    requested_range = self._RANGE.fullmatch(handler.headers.get("Range", "").strip())
+    try:
+      if requested_range:
+        self._serve_range(handler, entry[1], *requested_range.groups())
+        return
+      self._send_headers(handler, 200)
+      handler.send_header("Transfer-Encoding", "chunked")
+      handler.end_headers()
+      for chunk in entry[1]:
+        handler.wfile.write(b"%X\r\n" % len(chunk))
+        handler.wfile.write(chunk)
+        handler.wfile.write(b"\r\n")
+      handler.wfile.write(b"0\r\n\r\n")
+    except (BrokenPipeError, ConnectionResetError):
+      # The page was left or reloaded while the audio was playing.
+      handler.close_connection = True
+
+  @staticmethod
+  def _send_headers(handler: BaseHTTPRequestHandler, status: int):
+    handler.send_response(status)
+    handler.send_header("Content-Type", "audio/mpeg")
+    handler.send_header("Accept-Ranges", "bytes")
+    handler.send_header("Cache-Control", "no-store")
+    handler.send_header("Access-Control-Allow-Origin", "*")
+
+  def _serve_range(self, handler: BaseHTTPRequestHandler, stream: SpeechStream, first: str, last: str):
+    try:
+      audio = stream.audio(self.ttl)
+    except Exception as e:
+      logging.warning(f"Cannot serve a range of speech: {e}")
+      handler.send_error(502)
+      return
+    if not first:
+      # A suffix range, the last `last` bytes.
+      start, end = max(len(audio) - int(last or 0), 0), len(audio) - 1
+    else:
+      start, end = int(first), min(int(last), len(audio) - 1) if last else len(audio) - 1
+    if start > end:
+      handler.send_response(416)
+      handler.send_header("Content-Range", f"bytes */{len(audio)}")
+      handler.send_header("Content-Length", "0")
+      handler.end_headers()
+      return
+    self._send_headers(handler, 206)
+    handler.send_header("Content-Range", f"bytes {start}-{end}/{len(audio)}")
+    handler.send_header("Content-Length", str(end - start + 1))
+    handler.end_headers()
+    handler.wfile.write(memoryview(audio)[start:end + 1])
+
+  def close(self):
+    self._server.shutdown()
+    self._server.server_close()
+
+
+@functools.lru_cache(maxsize=1)
+def get_audio_server(
+    host: str = "127.0.0.1", port: int = 0, public_url: Optional[str] = None) -> AudioServer:
+  """Returns the process-wide audio server."""
+  return AudioServer(host, port, public_url)
+
+
+def stream_chunks(chunks: Iterable[bytes], stream: SpeechStream):
+  """Writes `chunks` to `stream` and closes it, by the error if one is raised."""
+  try:
+    for chunk in chunks:
+      stream.write(chunk)
+  except Exception as e:
+    stream.close(e)
+    raise
+  stream.close()
@@ -0,0 +1,58 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+  """A thread-safe LRU cache whose entries expire after a fixed time.
+
+  Args:
+    maxsize: Maximum number of entries. Inserting beyond it evicts the least
+      recently used entry.
+    ttl: Seconds an entry stays valid after it was put.
+    clock: Returns the current time in seconds, for tests.
+  """
+
+  def __init__(
+      self, maxsize: int = 128, ttl: float = 60.0,
+      clock: Callable[[], float] = time.monotonic):
+    self.maxsize = maxsize
+    self.ttl = ttl
+    self.hits = 0
+    self.misses = 0
+    self._clock = clock
+    self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+    """Returns the cached value of `key`, or `default` if missing or expired."""
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None and entry[0] > self._clock():
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+      if entry is not None:
+        del self._entries[key]
+      self.misses += 1
+      return default
+
+  def put(self, key: Hashable, value: Any):
+    """Caches `value` under `key` for `ttl` seconds."""
+    with self._lock:
+      self._entries[key] = (self._clock() + self.ttl, value)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.maxsize:
+        self._entries.popitem(last=False)
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+
+  def __len__(self) -> int:
+    return len(self._entries)
+
+  def stats(self) -> Dict[str, int]:
+    """Returns the hit and miss counters and the current size."""
+    return {"hits": self.hits, "misses": self.misses, "size": len(self)}
@@ -1,7 +1,17 @@
+import contextvars
+import dataclasses
 import logging
-from typing import BinaryIO, Mapping, Sequence
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, Mapping, Optional, Sequence, Tuple
 
-from openai import OpenAI
+import httpx
+from openai import (AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient,
+                    OpenAI)
+
+from ecco6 import event_loop, tracing
+from ecco6.audio_stream import SpeechStream, stream_chunks
+from ecco6.tts_cache import TTSCache
 
 logging.basicConfig(
     level=logging.INFO,
@@ -9,64 +19,258 @@ logging.basicConfig(
     datefmt='%Y-%m-%d %H:%M:%S',
 )
 
+DEFAULT_CHAT_MODEL = "gpt-3.5-turbo"
+DEFAULT_STT_MODEL = "whisper-1"
+DEFAULT_TTS_MODEL = "tts-1"
+DEFAULT_TTS_VOICE = "nova"
+# How recordings are encoded for speech-to-text, see ecco6.util.encode_speech.
+DEFAULT_UPLOAD_FORMAT = "ogg"
+DEFAULT_UPLOAD_BITRATE = "24k"
+# Size of the chunks streamed speech is read in. An MP3 frame of tts-1 is
+# about 400 bytes.
+SPEECH_CHUNK_SIZE = 4096
+# Maximum number of texts being streamed from text-to-speech at once, over
+# every session.
+MAX_SPEECH_THREADS = 8
+
+_speech_pool = ThreadPoolExecutor(max_workers=MAX_SPEECH_THREADS, thread_name_prefix="ecco6-tts")
+
+
+@dataclasses.dataclass(frozen=True)
+class PoolConfig:
+  """Limits of the HTTP connection pool shared by every OpenAI call.
+
+  Args:
+    max_connections: Maximum number of open connections. Requests beyond
+      it wait for a free one.
+    max_keepalive_connections: Maximum number of idle connections kept open
+      for the next requests.
+    keepalive_expiry: Seconds an idle connection is kept open.
+  """
+  max_connections: int = 20
+  max_keepalive_connections: int = 10
+  keepalive_expiry: float = 60.0
+
+  def limits(self) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=self.max_connections,
+        max_keepalive_connections=self.max_keepalive_connections,
+        keepalive_expiry=self.keepalive_expiry)
+
+
+# The shared clients by (API key, pool). They are kept, and their
+# connections open, for the lifetime of the process: the keys and pool
+# limits come from the secrets, so there are only ever a few.
+_clients: Dict[Tuple[str, PoolConfig], OpenAI] = {}
+_async_clients: Dict[Tuple[str, PoolConfig], AsyncOpenAI] = {}
+_clients_lock = threading.Lock()
+
+
+def get_openai(api_key: str, pool: PoolConfig = PoolConfig()) -> OpenAI:
+  """Returns the process-wide OpenAI client of an API key.
+
+  Speech-to-text, text-to-speech and the agent's chat model all go through
+  it, so they share one pool of keep-alive connections to the API instead of
+  opening new ones on every rerun of the script.
+  """
+  with _clients_lock:
+    client = _clients.get((api_key, pool))
+    if client is None:
+      logging.info("Creating the shared OpenAI client")
+      client = _clients[(api_key, pool)] = OpenAI(
+          api_key=api_key, http_client=DefaultHttpxClient(limits=pool.limits()))
+  return client
+
+
+def get_async_openai(api_key: str, pool: PoolConfig = PoolConfig()) -> AsyncOpenAI:
+  """Returns the process-wide AsyncOpenAI client of an API key.
+
+  An httpx.AsyncClient is bound to the event loop it first runs on, so the
+  async client lives on the shared loop of ecco6.event_loop, where every
+  async call runs. The streamed agent and the text-to-speech of its
+  sentences share its connections across turns. A sync and an async httpx
+  client cannot share connections, so this is the second of the two pools
+  of a key, next to `get_openai`'s.
+
+  Raises:
+    RuntimeError: If not called on the shared event loop.
+  """
+  event_loop.require_loop("The async OpenAI client")
+  client = _async_clients.get((api_key, pool))
+  if client is None:
+    logging.info("Creating the shared async OpenAI client")
+    client = _async_clients[(api_key, pool)] = AsyncOpenAI(
+        api_key=api_key, http_client=DefaultAsyncHttpxClient(limits=pool.limits()))
+  return client
+
+
+class AsyncChatCompletions:
+  """The chat completions API of `get_async_openai`.
+
+  LangChain's ChatOpenAI takes its async client when it is built, in the
+  script thread, while `get_async_openai` must be called on the shared
+  event loop. Passing this as its `async_client` gets the client when a
+  request is made.
+  """
+
+  def __init__(self, api_key: str, pool: PoolConfig = PoolConfig()):
+    self.api_key = api_key
+    self.pool = pool
+
+  def create(self, **kwargs):
+    return get_async_openai(self.api_key, self.pool).chat.completions.create(**kwargs)
+
+
 class OpenAIClient:
   """The OpenAI client.
-  
-  This client is responsible for audio-based questioning-answering.
+
+  This client is responsible for audio-based questioning-answering. It is
+  cheap to create: the HTTP client underneath is shared process-wide per
+  API key, see `get_openai`.
+
+  Args:
+    openai_api_key: The OpenAI API key.
+    pool: Limits of the shared connection pool.
+    upload_format: The format recordings are encoded in before upload,
+      "ogg" (Opus), "flac" or "wav".
+    upload_bitrate: The Opus bitrate of uploaded recordings.
+    tts_cache: Where synthesized speech is cached, or None to synthesize
+      every text.
   """
   def __init__(
-      self, openai_api_key: str, chat_model: str = "gpt-3.5-turbo",
-      stt_model: str = "whisper-1", tts_model: str = "tts-1", 
-      tts_voice: str = "nova"):
-    self.client = OpenAI(api_key=openai_api_key)
-    self.chat_model = chat_model
-    self.stt_model = stt_model
-    self.tts_model = tts_model
-    self.tts_voice = tts_voice
-    logging.info("OpenAIClient initialized")
-
-  def speech_to_text(self, file: BinaryIO) -> str:
+      self, openai_api_key: str, pool: PoolConfig = PoolConfig(),
+      upload_format: str = DEFAULT_UPLOAD_FORMAT, upload_bitrate: str = DEFAULT_UPLOAD_BITRATE,
+      tts_cache: Optional[TTSCache] = None):
+    self.client = get_openai(openai_api_key, pool)
+    self.api_key = openai_api_key
+    self.pool = pool
+    self.upload_format = upload_format
+    self.upload_bitrate = upload_bitrate
+    self.tts_cache = tts_cache
+
+  @tracing.traced("openai.speech_to_text")
+  def speech_to_text(self, file: BinaryIO, model: str = DEFAULT_STT_MODEL) -> str:
     """Transfer speech recording to text.
-  
+
       Args:
         file: The file of the audio recording
+        model: The speech-to-text model.
       Returns:
         A string of audio recording.
     """
     transcription = self.client.audio.transcriptions.create(
-        model=self.stt_model,
+        model=model,
         file=file,
     )
     logging.debug(f"Transcribed {file.name} to {transcription.text}")
     return transcription.text
 
-  def text_to_speech(self, text: str) -> bytes:
+  @tracing.traced("openai.text_to_speech")
+  def text_to_speech(
+      self, text: str, voice: str = DEFAULT_TTS_VOICE, model: str = DEFAULT_TTS_MODEL) -> bytes:
     """Transfer generated text to audio response.
-  
+
+      Texts in `tts_cache` are not sent to OpenAI.
+
       Args:
-        file: The generated text from GPT. 
+        text: The generated text from GPT.
+        voice: The voice to speak it with.
+        model: The text-to-speech model.
       Returns:
         The bytes of audio response.
     """
+    if self.tts_cache is not None:
+      audio = self.tts_cache.get(model, voice, text)
+      if audio is not None:
+        logging.debug(f"Found {text} in the speech cache")
+        return audio
     response = self.client.audio.speech.create(
-        model=self.tts_model,
-        voice=self.tts_voice,
+        model=model,
+        voice=voice,
         input=text,
     )
     logging.debug(f"Converted {text} to audio")
-    return response.read()
+    audio = response.read()
+    if self.tts_cache is not None:
+      self.tts_cache.put(model, voice, text, audio)
+    return audio
+
+  @tracing.traced("openai.text_to_speech")
+  async def atext_to_speech(
+      self, text: str, voice: str = DEFAULT_TTS_VOICE, model: str = DEFAULT_TTS_MODEL) -> bytes:
+    """Like `text_to_speech`, on the async client of the shared event loop."""
+    if self.tts_cache is not None:
+      audio = self.tts_cache.get(model, voice, text)
+      if audio is not None:
+        logging.debug(f"Found {text} in the speech cache")
+        return audio
+    response = await get_async_openai(self.api_key, self.pool).audio.speech.create(
+        model=model,
+        voice=voice,
+        input=text,
+    )
+    logging.debug(f"Converted {text} to audio")
+    audio = response.read()
+    if self.tts_cache is not None:
+      self.tts_cache.put(model, voice, text, audio)
+    return audio
+
+  def stream_speech(
+      self, text: str, voice: str = DEFAULT_TTS_VOICE, model: str = DEFAULT_TTS_MODEL) -> SpeechStream:
+    """Starts synthesizing text, returning its audio as it arrives.
+
+      Unlike `text_to_speech` this returns at once. The audio is read from
+      OpenAI in the background, a chunk at a time, and can be played, e.g.
+      through ecco6.audio_stream.AudioServer, before it is complete.
+
+      Args:
+        text: The generated text from GPT.
+        voice: The voice to speak it with.
+        model: The text-to-speech model.
+      Returns:
+        The stream of the audio response.
+    """
+    if self.tts_cache is not None:
+      audio = self.tts_cache.get(model, voice, text)
+      if audio is not None:
+        logging.debug(f"Found {text} in the speech cache")
+        return SpeechStream.from_bytes(audio)
+    stream = SpeechStream()
+    _speech_pool.submit(
+        contextvars.copy_context().run, self._stream_speech, stream, text, voice, model)
+    return stream
+
+  @tracing.traced("openai.text_to_speech")
+  def _stream_speech(self, stream: SpeechStream, text: str, voice: str, model: str):
+    try:
+      with self.client.audio.speech.with_streaming_response.create(
+          model=model,
+          voice=voice,
+          input=text,
+      ) as response:
+        stream_chunks(response.iter_bytes(SPEECH_CHUNK_SIZE), stream)
+    except Exception as e:
+      logging.warning(f"Cannot stream {text} as audio: {e}")
+      stream.close(e)
+      return
+    logging.debug(f"Streamed {text} as audio")
+    if self.tts_cache is not None:
+      self.tts_cache.put(model, voice, text, stream.audio())
 
-  def chat_completion(self, messages: Sequence[Mapping[str, str]]) -> str:
+  @tracing.traced("openai.chat_completion")
+  def chat_completion(
+      self, messages: Sequence[Mapping[str, str]], model: str = DEFAULT_CHAT_MODEL) -> str:
     """Complete chat by getting response from GPT API.
 
       Args:
-        messages: The chat messages in session state. 
+        messages: The chat messages in session state.
+        model: The chat model.
       Returns:
         A string of response from OpenAI.
     """
     response = self.client.chat.completions.create(
-      model=self.chat_model,
+      model=model,
       messages=messages,
     )
-    logging.debug(f"Send {len(messages)} messages to {self.chat_model}. Received {response.choices[0].message.content}")
+    logging.debug(f"Send {len(messages)} messages to {model}. Received {response.choices[0].message.content}")
     return response.choices[0].message.content
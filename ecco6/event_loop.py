@@ -0,0 +1,93 @@
+"""The process-wide event loop every async call runs on.
+
+The connections of an httpx.AsyncClient belong to the event loop they were
+opened on. With an `asyncio.run` per turn, every turn needed new async
+clients, opened new connections and left the old clients behind. Instead,
+async work runs on one long-lived loop in a background thread, through `run`
+and `iterate`, and the async clients of OpenAI and SL live on it for the
+lifetime of the process, reusing their keep-alive connections across turns
+and sessions.
+
+Coroutines run in a copy of the caller's context, so they see its
+contextvars, e.g. the current tracing turn. They do not run in the script
+thread, so they must not call Streamlit; `iterate` hands their results back
+to the caller to render.
+"""
+import asyncio
+import functools
+import queue
+import threading
+from typing import AsyncIterable, Awaitable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+@functools.lru_cache(maxsize=1)
+def get_loop() -> asyncio.AbstractEventLoop:
+  """Returns the shared event loop, starting its thread on first use."""
+  loop = asyncio.new_event_loop()
+  threading.Thread(target=loop.run_forever, name="ecco6-event-loop", daemon=True).start()
+  return loop
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+  try:
+    return asyncio.get_running_loop()
+  except RuntimeError:
+    return None
+
+
+def require_loop(what: str):
+  """Raises RuntimeError unless running on the shared event loop.
+
+  Args:
+    what: What needs the shared loop, for the error message.
+  """
+  if _running_loop() is not get_loop():
+    raise RuntimeError(f"{what} must run on the shared event loop, see ecco6.event_loop.run.")
+
+
+def run(awaitable: Awaitable[T], timeout: Optional[float] = None) -> T:
+  """Runs a coroutine on the shared event loop and returns its result.
+
+  Raises:
+    RuntimeError: If called from the shared event loop itself, which would
+      deadlock.
+  """
+  loop = get_loop()
+  if _running_loop() is loop:
+    raise RuntimeError("event_loop.run cannot be called from the shared event loop.")
+  return asyncio.run_coroutine_threadsafe(awaitable, loop).result(timeout)
+
+
+def iterate(items: AsyncIterable[T]) -> Iterator[T]:
+  """Iterates an async iterable on the shared event loop, yielding its items
+  in the calling thread as soon as each one is produced.
+
+  The iterable is consumed by one task, so context variables it sets stay
+  set between its items. If the caller stops early, the task is cancelled.
+  """
+  results: "queue.Queue" = queue.Queue()
+
+  async def produce():
+    try:
+      async for item in items:
+        results.put((item, None))
+    except BaseException as e:
+      results.put((_DONE, e))
+      raise
+    results.put((_DONE, None))
+
+  future = asyncio.run_coroutine_threadsafe(produce(), get_loop())
+  try:
+    while True:
+      item, error = results.get()
+      if item is _DONE:
+        if error is not None:
+          raise error
+        return
+      yield item
+  finally:
+    future.cancel()
@@ -0,0 +1,78 @@
+"""An AgentExecutor running the tool calls of one step concurrently.
+
+When the model asks for several tools at once, e.g. the weather, today's
+events and unread mail for a morning briefing, `AgentExecutor.invoke` runs
+them one after another, each a blocking network call. `ParallelAgentExecutor`
+runs them on a shared thread pool and hands the results back in the order
+the model asked for them. `ainvoke` already gathers the calls of a step
+concurrently, so only the synchronous loop is changed.
+"""
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Union
+
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentAction, AgentFinish, AgentStep
+from langchain_core.callbacks import CallbackManagerForChainRun
+from langchain_core.tools import BaseTool
+
+# Maximum number of tool calls running at once, over every session.
+MAX_TOOL_THREADS = 8
+
+_tool_pool = ThreadPoolExecutor(max_workers=MAX_TOOL_THREADS, thread_name_prefix="ecco6-tool")
+
+
+class _StepActions:
+  """The tool calls of the step being run, and their results once started."""
+
+  def __init__(self):
+    self.actions: List[AgentAction] = []
+    self.futures: Optional[List[Future]] = None
+
+
+_step_actions: "contextvars.ContextVar[Optional[_StepActions]]" = contextvars.ContextVar(
+    "ecco6_step_actions", default=None)
+
+
+class ParallelAgentExecutor(AgentExecutor):
+  """AgentExecutor that runs the tool calls of a step on a thread pool."""
+
+  def _iter_next_step(
+      self, name_to_tool_map: Dict[str, BaseTool], color_mapping: Dict[str, str],
+      inputs: Dict[str, str], intermediate_steps: List,
+      run_manager: Optional[CallbackManagerForChainRun] = None,
+      ) -> Iterator[Union[AgentFinish, AgentAction, AgentStep]]:
+    # AgentExecutor yields every action of the step before it performs the
+    # first one, so the step's actions are all known by the time
+    # _perform_agent_action is first called.
+    step = _StepActions()
+    _step_actions.set(step)
+    try:
+      for output in super()._iter_next_step(
+          name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager):
+        if isinstance(output, AgentAction):
+          step.actions.append(output)
+        yield output
+    finally:
+      _step_actions.set(None)
+
+  def _perform_agent_action(
+      self, name_to_tool_map: Dict[str, BaseTool], color_mapping: Dict[str, str],
+      agent_action: AgentAction,
+      run_manager: Optional[CallbackManagerForChainRun] = None) -> AgentStep:
+    step = _step_actions.get()
+    if step is None or len(step.actions) < 2:
+      return super()._perform_agent_action(
+          name_to_tool_map, color_mapping, agent_action, run_manager)
+    if step.futures is None:
+      perform = super()._perform_agent_action
+      # Every call gets its own copy of the context, so tools still see the
+      # request's registry.ToolContext.
+      step.futures = [
+        _tool_pool.submit(
+            contextvars.copy_context().run, perform,
+            name_to_tool_map, color_mapping, action, run_manager)
+        for action in step.actions
+      ]
+    index = next(i for i, action in enumerate(step.actions) if action is agent_action)
+    return step.futures[index].result()
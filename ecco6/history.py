@@ -0,0 +1,167 @@
+import asyncio
+import functools
+import logging
+from typing import Awaitable, Callable, List, Mapping, Optional, Sequence
+
+import tiktoken
+from langchain_core.messages import (AIMessage, BaseMessage, HumanMessage,
+                                     SystemMessage)
+
+# Tokens OpenAI adds around every chat message, on top of its content and role.
+TOKENS_PER_MESSAGE = 3
+
+
+@functools.lru_cache(maxsize=8)
+def get_token_counter(model: str) -> Callable[[str], int]:
+  """Returns a function counting the tokens of a text for an OpenAI model.
+
+  The tokenizer runs locally with tiktoken. If its encoding files cannot be
+  loaded, which needs network on first use, tokens are estimated as four
+  characters each.
+  """
+  try:
+    try:
+      encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+      encoding = tiktoken.get_encoding("cl100k_base")
+  except Exception as e:
+    logging.warning(f"Cannot load the tokenizer of {model}, estimating token counts: {e}")
+    return lambda text: (len(text) + 3) // 4
+  return lambda text: len(encoding.encode(text))
+
+
+def to_message(message: Mapping[str, str]) -> BaseMessage:
+  """Converts a session message to a LangChain message."""
+  if message["role"] == "user":
+    return HumanMessage(content=message["content"])
+  return AIMessage(content=message["content"])
+
+
+class ChatHistory:
+  """Token-budgeted chat history of one session.
+
+  The last `keep_turns` turns, a user message and the answers to it, are
+  kept verbatim. Older turns are folded into a running summary, `fold_turns`
+  turns at a time so that the summary is not rewritten on every turn. Turns
+  are folded earlier if the verbatim turns and the summary exceed
+  `max_tokens`; the last turn is always kept. If summarizing fails, the turns
+  are kept verbatim and folded on a later update.
+
+  Session messages are converted to LangChain messages once, as they arrive,
+  instead of on every turn.
+
+  Args:
+    count_tokens: Counts the tokens of a text, see `get_token_counter`.
+    summarize: Returns a new summary given the current one, possibly empty,
+      and the messages to fold into it.
+    asummarize: The async variant of `summarize`, used by `aupdate`. Without
+      it, `aupdate` runs `summarize` in a thread.
+    max_tokens: Token budget of the history sent with each request.
+    keep_turns: How many of the latest turns are kept verbatim.
+    fold_turns: How many turns beyond `keep_turns` may pile up before they
+      are folded into the summary.
+  """
+
+  def __init__(
+      self, count_tokens: Callable[[str], int],
+      summarize: Callable[[str, Sequence[BaseMessage]], str],
+      max_tokens: int = 2000, keep_turns: int = 6, fold_turns: int = 2,
+      asummarize: Optional[Callable[[str, Sequence[BaseMessage]], Awaitable[str]]] = None):
+    self.count_tokens = count_tokens
+    self.summarize = summarize
+    self.asummarize = asummarize
+    self.max_tokens = max_tokens
+    self.keep_turns = keep_turns
+    self.fold_turns = fold_turns
+    self.summary = ""
+    self._summary_tokens = 0
+    self._messages: List[BaseMessage] = []
+    self._message_tokens: List[int] = []
+    self._consumed = 0
+
+  def _count(self, message: BaseMessage) -> int:
+    return TOKENS_PER_MESSAGE + 1 + self.count_tokens(message.content)
+
+  def _turn_starts(self) -> List[int]:
+    starts = [i for i, message in enumerate(self._messages) if isinstance(message, HumanMessage)]
+    if self._messages and starts[:1] != [0]:
+      starts.insert(0, 0)
+    return starts
+
+  def _summary_message(self) -> SystemMessage:
+    return SystemMessage(content=f"Summary of the earlier conversation: {self.summary}")
+
+  def _fold(self, end: int, summary: str):
+    self.summary = summary
+    self._summary_tokens = self._count(self._summary_message())
+    del self._messages[:end]
+    del self._message_tokens[:end]
+
+  def update(self, messages: Sequence[Mapping[str, str]]):
+    """Adds the session messages not seen yet and folds old turns.
+
+    Args:
+      messages: Every message of the session so far, oldest first. Only
+        the ones beyond those passed before are converted.
+    """
+    end = self._add(messages)
+    if not end:
+      return
+    try:
+      summary = self.summarize(self.summary, self._messages[:end])
+    except Exception as e:
+      logging.warning(f"Cannot summarize the history, keeping its turns: {e}")
+      return
+    self._fold(end, summary)
+
+  async def aupdate(self, messages: Sequence[Mapping[str, str]]):
+    """Like `update`, but awaits the summary instead of blocking on it."""
+    end = self._add(messages)
+    if not end:
+      return
+    try:
+      if self.asummarize is not None:
+        summary = await self.asummarize(self.summary, self._messages[:end])
+      else:
+        summary = await asyncio.to_thread(self.summarize, self.summary, self._messages[:end])
+    except Exception as e:
+      logging.warning(f"Cannot summarize the history, keeping its turns: {e}")
+      return
+    self._fold(end, summary)
+
+  def _add(self, messages: Sequence[Mapping[str, str]]) -> int:
+    """Adds the messages not seen yet and returns how many to fold, if any."""
+    if len(messages) < self._consumed:
+      # The session started over.
+      self.clear()
+    for message in messages[self._consumed:]:
+      converted = to_message(message)
+      self._messages.append(converted)
+      self._message_tokens.append(self._count(converted))
+    self._consumed = len(messages)
+
+    starts = self._turn_starts()
+    fold = 0
+    if len(starts) > self.keep_turns + self.fold_turns:
+      fold = len(starts) - self.keep_turns
+    budget = self.max_tokens - self._summary_tokens
+    while fold < len(starts) - 1 and sum(self._message_tokens[starts[fold]:]) > budget:
+      fold += 1
+    return starts[fold] if fold else 0
+
+  def messages(self) -> List[BaseMessage]:
+    """Returns the summary, if any, followed by the verbatim turns."""
+    if not self.summary:
+      return list(self._messages)
+    return [self._summary_message(), *self._messages]
+
+  def tokens(self) -> int:
+    """Returns the number of tokens of `messages()`."""
+    return self._summary_tokens + sum(self._message_tokens)
+
+  def clear(self):
+    self.summary = ""
+    self._summary_tokens = 0
+    self._messages.clear()
+    self._message_tokens.clear()
+    self._consumed = 0
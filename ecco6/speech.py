@@ -0,0 +1,73 @@
+"""Sentence-level text-to-speech pipelining for streamed answers.
+
+`split_sentences` cuts a stream of model tokens into sentences, and
+`synthesize_in_order` starts synthesizing each sentence as soon as it is
+complete, while later tokens are still arriving, and yields the audio in
+sentence order. The first sentence can then be played before the model has
+finished the answer.
+"""
+import asyncio
+import re
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Tuple
+
+# A sentence ends at ., ! or ? followed by whitespace, or at a line break.
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+async def split_sentences(tokens: AsyncIterable[str], min_chars: int = 20) -> AsyncIterator[str]:
+  """Yields the sentences of a token stream as soon as each one is complete.
+
+  Args:
+    tokens: Pieces of text, in order.
+    min_chars: Sentences shorter than this are joined with the next one, so
+      that a short "Sure." is not synthesized on its own.
+  Yields:
+    The sentences, stripped. The text after the last sentence end is
+    yielded once the stream ends.
+  """
+  buffer = ""
+  async for token in tokens:
+    buffer += token
+    start = 0
+    for match in SENTENCE_END.finditer(buffer):
+      if match.start() - start >= min_chars:
+        yield buffer[start:match.start()].strip()
+        start = match.end()
+    buffer = buffer[start:]
+  if buffer.strip():
+    yield buffer.strip()
+
+
+async def synthesize_in_order(
+    sentences: AsyncIterable[str], synthesize: Callable[[str], Awaitable[bytes]],
+    max_pending: int = 3) -> AsyncIterator[Tuple[str, bytes]]:
+  """Synthesizes sentences concurrently and yields their audio in order.
+
+  Args:
+    sentences: The sentences to speak, in order.
+    synthesize: Returns the audio of a sentence.
+    max_pending: Maximum number of sentences being synthesized at once.
+  Yields:
+    (sentence, audio) pairs, in the order of `sentences`.
+  """
+  pending: "asyncio.Queue[Tuple[str, asyncio.Task] | None]" = asyncio.Queue(max_pending)
+
+  async def produce():
+    try:
+      async for sentence in sentences:
+        await pending.put((sentence, asyncio.ensure_future(synthesize(sentence))))
+    finally:
+      await pending.put(None)
+
+  producer = asyncio.ensure_future(produce())
+  try:
+    while (item := await pending.get()) is not None:
+      sentence, task = item
+      yield sentence, await task
+    await producer
+  finally:
+    producer.cancel()
+    while not pending.empty():
+      item = pending.get_nowait()
+      if item is not None:
+        item[1].cancel()
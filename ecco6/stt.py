@@ -0,0 +1,130 @@
+"""Streaming speech-to-text, transcribing a recording a phrase at a time.
+
+`StreamingTranscriber` takes audio as it is recorded and cuts it at pauses,
+found by voice activity detection on its loudness. Each chunk is sent for
+transcription as soon as it is cut, while later audio is still arriving,
+and the partial transcripts are joined in order once the recording ends.
+Only the last chunk is left to transcribe after the user stops speaking,
+instead of the whole recording.
+"""
+import contextvars
+import io
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Callable, List, Optional
+
+from pydub import AudioSegment
+
+# Maximum number of chunks being transcribed at once, over every session.
+MAX_TRANSCRIPTION_THREADS = 4
+
+_transcription_pool = ThreadPoolExecutor(
+    max_workers=MAX_TRANSCRIPTION_THREADS, thread_name_prefix="ecco6-stt")
+
+
+def wav_file(audio: AudioSegment, name: str = "chunk.wav") -> BinaryIO:
+  """Returns a named in-memory WAV file of `audio`, for upload."""
+  file = io.BytesIO()
+  audio.export(file, format="wav")
+  file.seek(0)
+  file.name = name
+  return file
+
+
+class StreamingTranscriber:
+  """Transcribes audio chunk by chunk while it is being recorded.
+
+  Args:
+    transcribe: Returns the transcript of a chunk of audio.
+    min_chunk_ms: Chunks are at least this long, so that each has enough
+      context to be transcribed well.
+    max_chunk_ms: Chunks are cut at this length even without a pause.
+    silence_ms: How long a pause must be to cut there.
+    silence_thresh: Frames quieter than this, in dBFS, are silent.
+    frame_ms: The length of the frames loudness is measured over.
+  """
+
+  def __init__(
+      self, transcribe: Callable[[AudioSegment], str], min_chunk_ms: int = 2000,
+      max_chunk_ms: int = 15000, silence_ms: int = 300, silence_thresh: float = -40.0,
+      frame_ms: int = 20):
+    self.transcribe = transcribe
+    self.min_chunk_ms = min_chunk_ms
+    self.max_chunk_ms = max_chunk_ms
+    self.silence_ms = silence_ms
+    self.silence_thresh = silence_thresh
+    self.frame_ms = frame_ms
+    self._buffer = AudioSegment.empty()
+    # How far into the buffer loudness was measured, in ms, and where the
+    # silence reaching there started.
+    self._scanned = 0
+    self._silence_start: Optional[int] = None
+    self._futures: List[Future] = []
+
+  def _find_cut(self) -> Optional[int]:
+    """Returns where to cut the buffer, in ms, or None to wait for more audio."""
+    while self._scanned + self.frame_ms <= len(self._buffer):
+      frame = self._buffer[self._scanned:self._scanned + self.frame_ms]
+      if frame.dBFS < self.silence_thresh:
+        if self._silence_start is None:
+          self._silence_start = self._scanned
+      else:
+        self._silence_start = None
+      self._scanned += self.frame_ms
+      if self._silence_start is not None and self._scanned - self._silence_start >= self.silence_ms:
+        # Cut in the middle of the pause.
+        cut = (self._silence_start + self._scanned) // 2
+        if cut >= self.min_chunk_ms:
+          return cut
+      if self._scanned >= self.max_chunk_ms:
+        return self._scanned
+    return None
+
+  def _submit(self, chunk: AudioSegment):
+    if len(chunk) == 0 or chunk.dBFS < self.silence_thresh:
+      # Whisper makes up words for silence.
+      return
+    self._futures.append(_transcription_pool.submit(
+        contextvars.copy_context().run, self.transcribe, chunk))
+
+  def feed(self, audio: AudioSegment):
+    """Adds recorded audio, sending every chunk it completes for transcription."""
+    self._buffer += audio
+    while (cut := self._find_cut()) is not None:
+      self._submit(self._buffer[:cut])
+      self._buffer = self._buffer[cut:]
+      self._scanned -= cut
+      if self._silence_start is not None:
+        self._silence_start = max(0, self._silence_start - cut)
+
+  def chunks(self) -> int:
+    """Returns how many chunks were sent for transcription."""
+    return len(self._futures)
+
+  def finish(self) -> str:
+    """Transcribes the rest of the audio and returns the whole transcript."""
+    self._submit(self._buffer)
+    self._buffer = AudioSegment.empty()
+    texts = [future.result().strip() for future in self._futures]
+    self._futures = []
+    self._scanned, self._silence_start = 0, None
+    logging.debug(f"Transcribed {len(texts)} chunks.")
+    return " ".join(text for text in texts if text)
+
+
+def transcribe_recording(
+    audio: AudioSegment, transcribe: Callable[[AudioSegment], str], feed_ms: int = 1000,
+    **kwargs) -> str:
+  """Transcribes a whole recording chunk by chunk, the chunks concurrently.
+
+  Args:
+    audio: The recording.
+    transcribe: Returns the transcript of a chunk of audio.
+    feed_ms: The recording is fed in slices this long, as if it was still
+      being recorded.
+    **kwargs: Passed to `StreamingTranscriber`.
+  """
+  transcriber = StreamingTranscriber(transcribe, **kwargs)
+  for start in range(0, len(audio), feed_ms):
+    transcriber.feed(audio[start:start + feed_ms])
+  return transcriber.finish()
@@ -1,11 +1,12 @@
 from firebase_admin import db
 from langchain.pydantic_v1 import BaseModel, Field
-import streamlit as st
 import time
 import datetime
 import pyttsx3
 from typing import Optional
 
+from ecco6.tool import registry
+
 class SetAlarmInput(BaseModel):
     day: str = Field(description="The day to set the alarm for.")
     date: str = Field(description="The date to set the alarm for.")
@@ -13,6 +14,10 @@ class SetAlarmInput(BaseModel):
     title: Optional[str] = Field(description="Optional title for the alarm.")
 
 
+class ListAlarmsInput(BaseModel):
+    pass
+
+
 class ModifyAlarmArgs(BaseModel):
     existing_day: str
     existing_date: str
@@ -25,7 +30,7 @@ class ModifyAlarmArgs(BaseModel):
 
 
 # Implement the alarm function
-def set_alarm(alarm_info: SetAlarmInput) -> str:
+def set_alarm(alarm_info: SetAlarmInput, email: str) -> str:
     # Construct the alarm data
     alarm_data = {
         "day": alarm_info.day,
@@ -35,14 +40,14 @@ def set_alarm(alarm_info: SetAlarmInput) -> str:
     }
 
     # Push the alarm data to Firebase
-    db.reference(f'/users/{st.session_state.email.replace(".", "_")}/alarms').push(alarm_data)
+    db.reference(f'/users/{email.replace(".", "_")}/alarms').push(alarm_data)
 
     return "Alarm set successfully."
 
 
-def delete_alarm(alarm_info: SetAlarmInput) -> str:
+def delete_alarm(alarm_info: SetAlarmInput, email: str) -> str:
     # Get the user's email
-    user_email = st.session_state.email.replace(".", "_")
+    user_email = email.replace(".", "_")
 
     # Query Firebase for alarms matching the given properties
     alarms_ref = db.reference(f'/users/{user_email}/alarms')
@@ -75,9 +80,9 @@ def delete_alarm(alarm_info: SetAlarmInput) -> str:
         return "No alarms found matching the specified properties."
 
 
-def modify_alarm(args: ModifyAlarmArgs) -> str:
+def modify_alarm(args: ModifyAlarmArgs, email: str) -> str:
     # Get the user's email
-    user_email = st.session_state.email.replace(".", "_")
+    user_email = email.replace(".", "_")
 
     # Query Firebase for all alarms
     alarms_ref = db.reference(f'/users/{user_email}/alarms')
@@ -124,9 +129,9 @@ def modify_alarm(args: ModifyAlarmArgs) -> str:
         return "No alarms found matching the specified properties."
 
 
-def list_user_alarms():
+def list_user_alarms(email: str):
     # Query Firebase for user alarms
-    user_email = st.session_state.email.replace(".", "_")
+    user_email = email.replace(".", "_")
     alarms_ref = db.reference(f'/users/{user_email}/alarms')
     alarms = alarms_ref.get()
 
@@ -192,4 +197,40 @@ def check_and_notify_alarms(email):
                 engine.runAndWait()
 
         # Wait for some time before checking again (e.g., every 60 seconds)
-        time.sleep(60)
\ No newline at end of file
+        time.sleep(60)
+
+
+_EMAIL = {"email": "email"}
+
+registry.register(
+    name="set_alarm",
+    group="alarm",
+    description="Set an alarm for a specified time.",
+    func=lambda email, **kwargs: set_alarm(SetAlarmInput(**kwargs), email),
+    args_schema=SetAlarmInput,
+    context_args=_EMAIL,
+)
+registry.register(
+    name="remove_alarm",
+    group="alarm",
+    description="Remove an alarm of a specified time.",
+    func=lambda email, **kwargs: delete_alarm(SetAlarmInput(**kwargs), email),
+    args_schema=SetAlarmInput,
+    context_args=_EMAIL,
+)
+registry.register(
+    name="get_alarms",
+    group="alarm",
+    description="Get the users alarms",
+    func=list_user_alarms,
+    args_schema=ListAlarmsInput,
+    context_args=_EMAIL,
+)
+registry.register(
+    name="modify_alarm",
+    group="alarm",
+    description="Modify an existing alarm with new information.",
+    func=lambda email, **kwargs: modify_alarm(ModifyAlarmArgs(**kwargs), email),
+    args_schema=ModifyAlarmArgs,
+    context_args=_EMAIL,
+)
@@ -10,6 +10,21 @@ from langchain.pydantic_v1 import BaseModel, Field
 from tzlocal import get_localzone
 from difflib import SequenceMatcher
 
+import streamlit as st
+
+from ecco6.tool import registry
+
+# Serves every Google API instead of googleapis.com when set, e.g. a stub
+# server, at <GOOGLE_API_ENDPOINT>/<service>/<version>/.
+GOOGLE_API_ENDPOINT = st.secrets.get("GOOGLE_API_ENDPOINT")
+
+
+def _build(service_name: str, version: str, credentials):
+    client_options = None
+    if GOOGLE_API_ENDPOINT:
+        client_options = {"api_endpoint": f"{GOOGLE_API_ENDPOINT}/{service_name}/{version}/"}
+    return build(service_name, version, credentials=credentials, client_options=client_options)
+
 #================== CALENDAR ==================================
 
 class GetEventsByDateInput(BaseModel):
@@ -40,7 +55,7 @@ def get_events_by_date(date: str, google_credentials) -> str:
         tzinfo=get_localzone()
     ).isoformat()
 
-    service = build("calendar", "v3", credentials=google_credentials)
+    service = _build("calendar", "v3", credentials=google_credentials)
     events_result = service.events().list(calendarId='primary', timeMin=event_date,timeMax=end_time).execute()
     all_events = events_result.get('items', [])
     return '\n'.join(
@@ -55,7 +70,7 @@ class AddEventInput(BaseModel):
     end_time: str = Field(description="The end datetime of the event, in the format of YYYY-MM-DDTHH:MM:SS.")
 
 def add_event(title: str, start_time: str, end_time: str, google_credentials) -> str:
-    service = build("calendar", "v3", credentials=google_credentials)
+    service = _build("calendar", "v3", credentials=google_credentials)
 
     timezone = str(get_localzone())
 
@@ -104,7 +119,7 @@ def get_eventID(date: str, google_credentials, event_title: str) -> str:
         tzinfo=get_localzone()
     ).isoformat()
 
-    service = build("calendar", "v3", credentials=google_credentials)
+    service = _build("calendar", "v3", credentials=google_credentials)
     events_result = service.events().list(calendarId='primary', timeMin=event_date, timeMax=end_time).execute()
     all_events = events_result.get('items', [])
     
@@ -125,7 +140,7 @@ def remove_event(event_title: str, date: str, google_credentials) -> str:
     
     if event_id:
         try:
-            service = build("calendar", "v3", credentials=google_credentials)
+            service = _build("calendar", "v3", credentials=google_credentials)
             service.events().delete(calendarId='primary', eventId=event_id).execute()
             return f"Event '{event_title}' deleted successfully"
         except Exception as e:
@@ -142,7 +157,7 @@ class GetUnreadMessagesInput(BaseModel):
 
 def get_unread_messages(google_credentials) -> str:
     creds = google_credentials
-    service = build('gmail', 'v1', credentials=creds)
+    service = _build('gmail', 'v1', credentials=creds)
 
     query = 'in:inbox is:unread -category:(promotions OR social)'
     unread_msgs = service.users().messages().list(userId='me', q=query).execute()
@@ -189,7 +204,7 @@ def send_email(recipient: str, subject: str, body: str, google_credentials) -> s
     email_msg.set_content(body)
 
     try:
-        service = build('gmail', 'v1', credentials=google_credentials)
+        service = _build('gmail', 'v1', credentials=google_credentials)
         message = {'raw': base64.urlsafe_b64encode(email_msg.as_bytes()).decode()}
         sent_message = service.users().messages().send(userId='me', body=message).execute()
 
@@ -204,7 +219,7 @@ class ListTaskListsInput(BaseModel):
 
 
 def list_task_lists(google_credentials) -> List[str]:
-    service = build("tasks", "v1", credentials=google_credentials)
+    service = _build("tasks", "v1", credentials=google_credentials)
     task_lists = service.tasklists().list(maxResults=10).execute()
     items = task_lists.get("items", [])
     return [item["title"] for item in items]
@@ -216,7 +231,7 @@ class CreateTaskListInput(BaseModel):
 
 def create_taskList(google_credentials, name: str) -> Dict:
     try:
-        service = build("tasks", "v1", credentials=google_credentials)
+        service = _build("tasks", "v1", credentials=google_credentials)
         
         new_task_list = service.tasklists().insert(body={"title": name}).execute()
         
@@ -233,7 +248,7 @@ class ListTasksInListInput(BaseModel):
 
 def list_tasks_in_list(task_list_name: str, google_credentials) -> List[str]:
     try:
-        service = build("tasks", "v1", credentials=google_credentials)
+        service = _build("tasks", "v1", credentials=google_credentials)
         task_lists = service.tasklists().list(maxResults=10).execute()
         items = task_lists.get("items", [])
         
@@ -266,7 +281,7 @@ class AddTaskInput(BaseModel):
 
 def add_task(task_name: str, task_list_name: str, google_credentials) -> str:
     try:
-        service = build("tasks", "v1", credentials=google_credentials)
+        service = _build("tasks", "v1", credentials=google_credentials)
         
         task_lists = service.tasklists().list(maxResults=10).execute()
         items = task_lists.get("items", [])
@@ -294,7 +309,7 @@ class RemoveTaskListInput(BaseModel):
     task_list_name: str = Field(description="The name of the task list to remove the task.")
 
 def remove_task_list(task_list_name: str, google_credentials) -> str:
-    service = build("tasks", "v1", credentials=google_credentials)
+    service = _build("tasks", "v1", credentials=google_credentials)
 
     task_lists = service.tasklists().list(maxResults=10).execute()
     items = task_lists.get("items", [])
@@ -316,7 +331,7 @@ class RemoveTaskInput(BaseModel):
 
 
 def remove_task(task_list_name: str, task_name: str, google_credentials) -> str:
-    service = build("tasks", "v1", credentials=google_credentials)
+    service = _build("tasks", "v1", credentials=google_credentials)
 
     task_lists = service.tasklists().list(maxResults=10).execute()
     items = task_lists.get("items", [])
@@ -346,7 +361,7 @@ class CreateDocumnetInput(BaseModel):
 
 def create_document(google_credentials, name: str) -> Dict:
     try:
-        service = build("docs", "v1", credentials=google_credentials)
+        service = _build("docs", "v1", credentials=google_credentials)
         
         new_doc = service.documents().create(body={"title": name}).execute()
         
@@ -363,7 +378,7 @@ class InsertTextInput(BaseModel):
 def get_document_id(google_credentials, document_name: str) -> str:
     SCOPES = ['https://www.googleapis.com/auth/drive']
 
-    service = build('drive', 'v3', credentials=google_credentials)
+    service = _build('drive', 'v3', credentials=google_credentials)
 
     results = service.files().list(q=f"name='{document_name}' and mimeType='application/vnd.google-apps.document'",
                                     fields="files(id)").execute()
@@ -390,7 +405,7 @@ def insert_text(google_credentials, text: str, document_name: str) -> Dict:
                 }
             ]
 
-            service = build("docs", "v1", credentials=google_credentials)
+            service = _build("docs", "v1", credentials=google_credentials)
             result = service.documents().batchUpdate(documentId=document_id, body={'requests': requests}).execute()
             return result
         else:
@@ -398,4 +413,115 @@ def insert_text(google_credentials, text: str, document_name: str) -> Dict:
     except HttpError as err:
         return {"error": f"HTTP Error: {err}"}
     except Exception as e:
-        return {"error": f"An error occurred: {e}"}
\ No newline at end of file
+        return {"error": f"An error occurred: {e}"}
+
+
+# ===================== TOOLS ====================================
+
+_CREDENTIALS = {"google_credentials": "google_credentials"}
+
+registry.register(
+    name="get_events_by_date",
+    group="calendar",
+    description="Get all events of a day from Google calendar.",
+    func=get_events_by_date,
+    args_schema=GetEventsByDateInput,
+    context_args=_CREDENTIALS,
+    available=lambda context: context.google_credentials is not None,
+)
+registry.register(
+    name="add_event",
+    group="calendar",
+    description="Add an event to the Google calendar.",
+    func=add_event,
+    args_schema=AddEventInput,
+    context_args=_CREDENTIALS,
+)
+registry.register(
+    name="remove_event",
+    group="calendar",
+    description="Remove an event from the Google calendar.",
+    func=remove_event,
+    args_schema=RemoveEventInput,
+    context_args=_CREDENTIALS,
+)
+registry.register(
+    name="get_unread_messages",
+    group="gmail",
+    description="Retrieve unread messages from Gmail.",
+    func=get_unread_messages,
+    args_schema=GetUnreadMessagesInput,
+    context_args=_CREDENTIALS,
+)
+registry.register(
+    name="send_email",
+    group="gmail",
+    description="Send an email via Gmail.",
+    func=send_email,
+    args_schema=SendEmailInput,
+    context_args=_CREDENTIALS,
+)
+registry.register(
+    name="list_task_lists",
+    group="tasks",
+    description="List all task lists from Google Tasks.",
+    func=list_task_lists,
+    args_schema=ListTaskListsInput,
+    context_args=_CREDENTIALS,
+)
+registry.register(
+    name="create_taskList",
+    group="tasks",
+    description="Create a new task list in Google Tasks.",
+    func=create_taskList,
+    args_schema=CreateTaskListInput,
+    context_args=_CREDENTIALS,
+)
+registry.register(
+    name="list_tasks_in_list",
+    group="tasks",
+    description="List all tasks in a specified task list from Google Tasks.",
+    func=list_tasks_in_list,
+    args_schema=ListTasksInListInput,
+    context_args=_CREDENTIALS,
+)
+registry.register(
+    name="add_task",
+    group="tasks",
+    description="Add a task to a specified task list in Google Tasks.",
+    func=add_task,
+    args_schema=AddTaskInput,
+    context_args=_CREDENTIALS,
+)
+registry.register(
+    name="remove_task_list",
+    group="tasks",
+    description="Remove the entire task list in Google Tasks.",
+    func=remove_task_list,
+    args_schema=RemoveTaskListInput,
+    context_args=_CREDENTIALS,
+)
+registry.register(
+    name="remove_task",
+    group="tasks",
+    description="Remove a task from a specified task list in Google Tasks.",
+    func=remove_task,
+    args_schema=RemoveTaskInput,
+    context_args=_CREDENTIALS,
+)
+registry.register(
+    name="create_document",
+    group="docs",
+    description="Create a new Google Docs document.",
+    func=create_document,
+    args_schema=CreateDocumnetInput,
+    context_args=_CREDENTIALS,
+)
+registry.register(
+    name="insert_text",
+    group="docs",
+    description="Insert text into a Google Docs document.",
+    func=insert_text,
+    args_schema=InsertTextInput,
+    context_args=_CREDENTIALS,
+)
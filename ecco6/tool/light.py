@@ -1,7 +1,13 @@
+import functools
 import json
+from typing import Callable, Tuple
+
 import requests
+import streamlit as st
 from langchain.pydantic_v1 import BaseModel, Field
 
+from ecco6.tool import registry
+
 class SetLightInput(BaseModel):
     pass
 
@@ -60,4 +66,54 @@ def set_brightness_high(url: str, token: str):
     except requests.exceptions.HTTPError as e:
         return str(e)
 
-    return "Brightness of the light has been set as high."
\ No newline at end of file
+    return "Brightness of the light has been set as high."
+
+
+@functools.lru_cache(maxsize=1)
+def light_settings() -> Tuple[str, str]:
+    """Returns the (url, api key) of the Home Assistant light, read once."""
+    light = st.secrets["LIGHT"]
+    return light["URL"], light["API_KEY"]
+
+def _script_tool(func: Callable, script: str) -> Callable[[], str]:
+    """Binds a light function to the url of a Home Assistant script."""
+    def run_script():
+        url, token = light_settings()
+        return func(url=f"{url}/api/services/script/{script}", token=token)
+    return run_script
+
+registry.register(
+    name="turn_on_light",
+    group="light",
+    description="Turn on the light.",
+    func=_script_tool(turn_on_light, "turn_on_bulb"),
+    args_schema=SetLightInput,
+)
+registry.register(
+    name="turn_off_light",
+    group="light",
+    description="Turn off the light.",
+    func=_script_tool(turn_off_light, "turn_off_bulb"),
+    args_schema=SetLightInput,
+)
+registry.register(
+    name="set_brightness_low",
+    group="light",
+    description="Set the brightness of the light as low.",
+    func=_script_tool(set_brightness_low, "set_brightness_low"),
+    args_schema=SetLightInput,
+)
+registry.register(
+    name="set_brightness_medium",
+    group="light",
+    description="Set the brightness of the light as medium.",
+    func=_script_tool(set_brightness_medium, "set_brightness_medium"),
+    args_schema=SetLightInput,
+)
+registry.register(
+    name="set_brightness_high",
+    group="light",
+    description="Set the brightness of the light as high.",
+    func=_script_tool(set_brightness_high, "set_brightness_high"),
+    args_schema=SetLightInput,
+)
@@ -1,11 +1,31 @@
 import googlemaps
 import streamlit as st
+from langchain.pydantic_v1 import BaseModel
+
+from ecco6.tool import registry
+
+GOOGLE_MAPS_URL = st.secrets.get("GOOGLE_MAPS_URL", "https://maps.googleapis.com")
+
+
+class GetCurrentLocationInput(BaseModel):
+  pass
 
 
 def get_current_location(latitude: float, longitude: float) -> str:
-  gmaps = googlemaps.Client(key=st.secrets["GOOGLE_API_KEY"])
+  gmaps = googlemaps.Client(key=st.secrets["GOOGLE_API_KEY"], base_url=GOOGLE_MAPS_URL)
   reverse_geocode_result = gmaps.reverse_geocode((latitude, longitude))
   if reverse_geocode_result:
     return reverse_geocode_result[0]["formatted_address"]
   return "Cannot find the current location"
 
+
+
+registry.register(
+    name="get_current_location",
+    group="location",
+    description="Get my current location.",
+    func=get_current_location,
+    args_schema=GetCurrentLocationInput,
+    context_args={"latitude": "latitude", "longitude": "longitude"},
+    available=lambda context: context.has_location,
+)
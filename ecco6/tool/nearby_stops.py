@@ -0,0 +1,109 @@
+"""Offline nearest-stop search over the coordinates in the stop database.
+
+Stops are bucketed into a grid of `CELL_DEGREES` cells and sorted by cell,
+so the cells around a query are a few contiguous slices of the sorted rows.
+Only the stops in those slices get a haversine distance.
+"""
+import functools
+import math
+from typing import Dict, List, Sequence, Union
+
+import numpy as np
+
+from ecco6.tool import stop_db
+
+EARTH_RADIUS_METERS = 6_371_000.0
+CELL_DEGREES = 0.01
+# Cell keys are lat_cell * _LON_CELLS + lon_cell, with lon_cell >= 0.
+_LON_CELLS = int(math.ceil(360 / CELL_DEGREES)) + 1
+_METERS_PER_DEGREE = math.pi * EARTH_RADIUS_METERS / 180
+
+
+def _lat_cell(lat):
+    return np.floor(np.asarray(lat) / CELL_DEGREES).astype(np.int64)
+
+
+def _lon_cell(lon):
+    return np.floor((np.asarray(lon) + 180) / CELL_DEGREES).astype(np.int64)
+
+
+class NearbyStopIndex:
+    """Grid index answering "which stops are within `radius` meters"."""
+
+    def __init__(
+            self, ids: Sequence[int], names: Sequence[str],
+            lats: Sequence[float], lons: Sequence[float]):
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        keys = _lat_cell(lats) * _LON_CELLS + _lon_cell(lons)
+        self._order = np.argsort(keys, kind="stable")
+        self._keys = keys[self._order]
+        self._lats = np.radians(lats[self._order])
+        self._lons = np.radians(lons[self._order])
+        self._cos_lats = np.cos(self._lats)
+        self._ids = ids
+        self._names = names
+
+    @classmethod
+    def from_stop_database(cls, database: stop_db.StopDatabase) -> "NearbyStopIndex":
+        lats = np.asarray(database.micro_lats, dtype=np.float64) / 1_000_000
+        lons = np.asarray(database.micro_lons, dtype=np.float64) / 1_000_000
+        return cls(database.ids, database.names, lats, lons)
+
+    def _candidates(self, latitude: float, longitude: float, radius: float) -> np.ndarray:
+        lat_span = radius / _METERS_PER_DEGREE
+        cos_lat = math.cos(math.radians(min(abs(latitude) + lat_span, 90.0)))
+        lon_span = 360.0 if cos_lat < 1e-9 else lat_span / cos_lat
+        if lon_span >= 180.0:
+            lon_first, lon_last = 0, _LON_CELLS - 1
+        else:
+            # Near the antimeridian the wrapped cells are not searched.
+            lon_first = int(_lon_cell(max(longitude - lon_span, -180.0)))
+            lon_last = int(_lon_cell(min(longitude + lon_span, 180.0)))
+        lat_cells = np.arange(
+            int(_lat_cell(latitude - lat_span)), int(_lat_cell(latitude + lat_span)) + 1)
+        starts = np.searchsorted(self._keys, lat_cells * _LON_CELLS + lon_first, side="left")
+        ends = np.searchsorted(self._keys, lat_cells * _LON_CELLS + lon_last, side="right")
+        return np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+
+    def query(
+            self, latitude: float, longitude: float, max_results: int = 3,
+            radius: int = 1000) -> List[Dict[str, Union[str, int]]]:
+        """Returns the closest stops within `radius` meters, closest first.
+
+        Args:
+          latitude: The latitude of the location.
+          longitude: The longitude of the location.
+          max_results: Maximum number of stops to return.
+          radius: Radius in meters around the location.
+        Returns:
+          A list of {'name', 'distance', 'location'} dicts, like the SL
+          nearbystopsv2 API: distance in whole meters, location the stop id.
+        """
+        if max_results <= 0 or radius < 0:
+            return []
+        candidates = self._candidates(latitude, longitude, radius)
+        lat, lon = math.radians(latitude), math.radians(longitude)
+        # Haversine distance to every candidate.
+        a = (np.sin((self._lats[candidates] - lat) / 2) ** 2
+             + math.cos(lat) * self._cos_lats[candidates]
+             * np.sin((self._lons[candidates] - lon) / 2) ** 2)
+        distances = 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+        within = np.flatnonzero(distances <= radius)
+        closest = within[np.argsort(distances[within], kind="stable")[:max_results]]
+
+        nearby_stops = []
+        for i in closest:
+            row = int(self._order[candidates[i]])
+            nearby_stops.append({
+                'name': self._names[row],
+                'distance': int(round(distances[i])),
+                'location': str(self._ids[row]),
+            })
+        return nearby_stops
+
+
+@functools.lru_cache(maxsize=1)
+def get_nearby_stop_index() -> NearbyStopIndex:
+    """Returns the process-wide index over the stop database."""
+    return NearbyStopIndex.from_stop_database(stop_db.get_stop_database())
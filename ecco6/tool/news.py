@@ -1,8 +1,12 @@
 import requests
 import streamlit as st
 
+from ecco6.tool import registry
+
+GOOGLE_NEWS_URL = st.secrets.get("GOOGLE_NEWS_URL", "https://google-news13.p.rapidapi.com")
+
 def get_top_headlines():
-    url = "https://google-news13.p.rapidapi.com/world"
+    url = f"{GOOGLE_NEWS_URL}/world"
     querystring = {"lr": "en-US"}
     headers = {
         "X-RapidAPI-Key": st.secrets["WEATHER_API_KEY"],
@@ -27,4 +31,12 @@ def get_top_headlines():
             }
             headlines_info.append(headline_info)
 
-    return headlines_info
\ No newline at end of file
+    return headlines_info
+
+
+registry.register(
+    name="get_top_headlines",
+    group="news",
+    description="Get the top headlines news from various sources.",
+    func=get_top_headlines,
+)
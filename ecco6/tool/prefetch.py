@@ -0,0 +1,173 @@
+"""Speculative prefetching of tool results from the transcript.
+
+Many questions say plainly which tool will answer them: "What's the weather
+in Stockholm?" needs get_weather for Stockholm, "What's on my calendar
+today?" needs today's events. `prefetch` matches the transcript against
+`RULES` as soon as it is transcribed and starts those calls in the
+background, so that they run during the model's first round trip instead of
+after it. The model's own call then takes the speculative result, see
+`ecco6.tool.speculation`.
+
+Only tools without side effects may be prefetched.
+"""
+import contextvars
+import datetime
+import functools
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import (Any, Callable, Dict, List, Optional, Pattern, Sequence,
+                    Tuple)
+
+from langchain.tools import BaseTool
+
+from ecco6.tool import registry, speculation
+
+# Maximum number of speculative calls running at once, over every session.
+MAX_PREFETCH_THREADS = 4
+
+_DAY_WORDS = re.compile(r"\b(tomorrow|yesterday|monday|tuesday|wednesday|thursday|friday|saturday|sunday|weekend|next week)\b", re.I)
+
+
+@dataclass(frozen=True)
+class PrefetchRule:
+    """Predicts a tool call from a transcript.
+
+    Args:
+      tool: The name of the tool to call.
+      pattern: Searched for in the transcript.
+      args: Returns the arguments of the call, given the match and the
+        request's context, or None if the call cannot be predicted.
+    """
+    tool: str
+    pattern: Pattern
+    args: Callable[["re.Match", registry.ToolContext], Optional[Dict[str, Any]]]
+
+
+def _current_weather_args(match: "re.Match", context: registry.ToolContext) -> Optional[Dict[str, Any]]:
+    # A forecast for another day needs a date the model works out.
+    if _DAY_WORDS.search(match.string):
+        return None
+    return {"city_name": match.group("city")}
+
+
+def _events_args(match: "re.Match", context: registry.ToolContext) -> Optional[Dict[str, Any]]:
+    date = datetime.date.today()
+    if re.search(r"\btomorrow\b", match.string, re.I):
+        date += datetime.timedelta(days=1)
+    elif _DAY_WORDS.search(match.string):
+        return None
+    return {"date": date.strftime("%Y-%m-%d")}
+
+
+def _nearby_stops_args(match: "re.Match", context: registry.ToolContext) -> Optional[Dict[str, Any]]:
+    if not context.has_location:
+        return None
+    return {"latitude": context.latitude, "longitude": context.longitude}
+
+
+RULES = (
+    PrefetchRule(
+        "get_weather",
+        re.compile(r"(?i:weather|temperature|forecast|rain|raining|snow|snowing|sunny|cold|warm)\b.*?"
+                   r"\b(?i:in) (?P<city>[A-ZÅÄÖ][\w-]+(?: [A-ZÅÄÖ][\w-]+)?)"),
+        _current_weather_args),
+    PrefetchRule(
+        "get_events_by_date",
+        re.compile(r"\b(calendar|schedule|agenda|events?|meetings?|appointments?)\b", re.I),
+        _events_args),
+    PrefetchRule(
+        "get_unread_messages",
+        re.compile(r"\b(unread|new) (e-?mails?|mails?|messages)\b|\binbox\b", re.I),
+        lambda match, context: {}),
+    PrefetchRule(
+        "get_top_headlines",
+        re.compile(r"\b(news|headlines?)\b", re.I),
+        lambda match, context: {}),
+    PrefetchRule(
+        "get_nearby_stops",
+        re.compile(r"\b(nearby|nearest|closest|near me|close to me|around me)\b", re.I),
+        _nearby_stops_args),
+    PrefetchRule(
+        "get_alarms",
+        re.compile(r"\b(my|which|what|any) alarms?\b|\balarms? (do|have) i\b", re.I),
+        lambda match, context: {}),
+)
+
+
+class Prefetcher:
+    """Starts the tool calls a transcript likely needs.
+
+    Args:
+      rules: The rules predicting the calls.
+      results: Where the results are put for the model's calls to take.
+      get_tools: Returns the tools available in a context.
+      max_threads: Maximum number of speculative calls running at once.
+    """
+
+    def __init__(
+            self, rules: Sequence[PrefetchRule] = RULES,
+            results: speculation.SpeculativeResults = speculation.SPECULATIVE_RESULTS,
+            get_tools: Callable[[registry.ToolContext], List[BaseTool]] = registry.get_tools,
+            max_threads: int = MAX_PREFETCH_THREADS):
+        self.rules = rules
+        self.results = results
+        self.get_tools = get_tools
+        self._pool = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="ecco6-prefetch")
+
+    def predict(self, text: str, context: registry.ToolContext) -> List[Tuple[str, Dict[str, Any]]]:
+        """Returns the (tool name, arguments) of the calls `text` likely needs."""
+        calls = []
+        for rule in self.rules:
+            match = rule.pattern.search(text)
+            if match is None:
+                continue
+            args = rule.args(match, context)
+            if args is not None:
+                calls.append((rule.tool, args))
+        return calls
+
+    @staticmethod
+    def _run(tool: BaseTool, args: Dict[str, Any], context: registry.ToolContext) -> Any:
+        with registry.tool_context(context), speculation.speculating():
+            return tool.invoke(args)
+
+    def prefetch(self, text: str, context: registry.ToolContext) -> List[str]:
+        """Starts the calls `text` likely needs in the background.
+
+        Args:
+          text: The transcript of the user's request.
+          context: The context the model's tool calls will run in.
+        Returns:
+          The names of the tools started.
+        """
+        calls = self.predict(text, context)
+        if not calls:
+            return []
+        tools = {tool.name: tool for tool in self.get_tools(context)}
+        started = []
+        for name, args in calls:
+            tool = tools.get(name)
+            key = speculation.call_key(name, args, context)
+            if tool is None or self.results.pending(key):
+                continue
+            # Each call gets its own copy of the context, so its spans are
+            # recorded in the current turn.
+            future = self._pool.submit(contextvars.copy_context().run, self._run, tool, args, context)
+            if self.results.put(key, future):
+                started.append(name)
+        if started:
+            logging.info(f"Prefetching {', '.join(started)}.")
+        return started
+
+
+@functools.lru_cache(maxsize=1)
+def get_prefetcher() -> Prefetcher:
+    """Returns the process-wide prefetcher with the default rules."""
+    return Prefetcher()
+
+
+def prefetch(text: str, context: registry.ToolContext) -> List[str]:
+    """Starts the calls `text` likely needs, see `Prefetcher.prefetch`."""
+    return get_prefetcher().prefetch(text, context)
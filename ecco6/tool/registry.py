@@ -0,0 +1,242 @@
+"""Process-wide registry of the agent's tools.
+
+Each tool module registers its tools at import time with `register`, so the
+`StructuredTool`s and their args schemas are built once per process instead
+of once per agent. Per-session values, such as the Google credentials or the
+location, are not bound into the tools. A tool reads them from the
+`ToolContext` of the running request, which `Ecco6Agent` sets with
+`tool_context`.
+
+A call the prefetcher already started for the same context and arguments
+takes that speculative result, see `ecco6.tool.speculation`.
+"""
+import asyncio
+import contextlib
+import contextvars
+import dataclasses
+import functools
+import importlib
+import inspect
+from typing import (Any, Callable, Collection, Dict, Iterator, List, Mapping,
+                    Optional, Set, Type)
+
+from langchain.pydantic_v1 import BaseModel
+from langchain.tools import StructuredTool
+
+from ecco6 import tracing
+from ecco6.tool import speculation
+
+# Modules under ecco6.tool that register tools when imported.
+TOOL_MODULES = (
+    "google", "time", "location", "news", "weather", "alarm", "rpi_timer", "light", "sl",
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class ToolContext:
+    """The per-session values tools may need while handling a request."""
+    google_credentials: Any = None
+    email: Optional[str] = None
+    rpi_url: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+    @property
+    def has_location(self) -> bool:
+        return self.latitude is not None and self.longitude is not None
+
+
+_current_context: "contextvars.ContextVar[ToolContext]" = contextvars.ContextVar(
+    "ecco6_tool_context", default=ToolContext())
+
+
+def current_context() -> ToolContext:
+    """Returns the context of the request being handled."""
+    return _current_context.get()
+
+
+@contextlib.contextmanager
+def tool_context(context: ToolContext) -> Iterator[ToolContext]:
+    """Makes `context` the current context inside the with block.
+
+    The context is a context variable, so it follows the request into the
+    threads and tasks LangChain runs the tools in.
+    """
+    token = _current_context.set(context)
+    try:
+        yield context
+    finally:
+        _current_context.reset(token)
+
+
+def _bind_context(func: Callable, context_args: Mapping[str, str]) -> Callable:
+    """Wraps `func` to pass the `context_args` attributes of the current context."""
+
+    def context_kwargs() -> Dict[str, Any]:
+        context = current_context()
+        return {arg: getattr(context, attr) for arg, attr in context_args.items()}
+
+    if inspect.iscoroutinefunction(func):
+        async def bound(*args, **kwargs):
+            return await func(*args, **kwargs, **context_kwargs())
+    else:
+        def bound(*args, **kwargs):
+            return func(*args, **kwargs, **context_kwargs())
+    bound.__name__ = getattr(func, "__name__", "tool")
+    bound.__doc__ = func.__doc__
+    return bound
+
+
+def _speculative(
+        name: str, func: Callable, results: speculation.SpeculativeResults) -> Callable:
+    """Wraps `func` to take the speculative result of the call, if pending.
+
+    A speculative call that failed is retried for real.
+    """
+
+    def pending_result(kwargs: Mapping[str, Any]):
+        if speculation.is_speculating():
+            return None
+        return results.take(speculation.call_key(name, kwargs, current_context()))
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def speculative(*args, **kwargs):
+            future = pending_result(kwargs)
+            if future is not None:
+                try:
+                    return await asyncio.wrap_future(future)
+                except Exception:
+                    pass
+            return await func(*args, **kwargs)
+    else:
+        @functools.wraps(func)
+        def speculative(*args, **kwargs):
+            future = pending_result(kwargs)
+            if future is not None:
+                try:
+                    return future.result()
+                except Exception:
+                    pass
+            return func(*args, **kwargs)
+    return speculative
+
+
+@dataclasses.dataclass(frozen=True)
+class _Entry:
+    tool: StructuredTool
+    group: str
+    available: Optional[Callable[[ToolContext], bool]]
+
+
+class ToolRegistry:
+    """An ordered collection of tools, built once and shared by every agent.
+
+    Args:
+      speculative_results: Where the tools look for the results of calls
+        the prefetcher started.
+    """
+
+    def __init__(
+            self,
+            speculative_results: speculation.SpeculativeResults = speculation.SPECULATIVE_RESULTS):
+        self.speculative_results = speculative_results
+        self._entries: Dict[str, _Entry] = {}
+
+    def register(
+            self, name: str, description: str, func: Callable, group: str,
+            args_schema: Optional[Type[BaseModel]] = None,
+            coroutine: Optional[Callable] = None,
+            context_args: Optional[Mapping[str, str]] = None,
+            available: Optional[Callable[[ToolContext], bool]] = None) -> StructuredTool:
+        """Builds a tool and adds it to the registry.
+
+        Args:
+          name: The name the model calls the tool by.
+          description: What the tool does, for the model.
+          func: The function the tool runs.
+          group: The group of related tools this one belongs to, e.g.
+            "calendar" or "travel", which the agent's tool router picks
+            from.
+          args_schema: The model of the arguments the model fills in.
+          coroutine: Optional async variant of `func`.
+          context_args: Maps keyword arguments of `func` and `coroutine` to
+            the `ToolContext` attributes passed for them on each call.
+          available: Optional predicate telling whether the tool can be
+            offered in a context, e.g. only when a location is known.
+        Returns:
+          The registered tool.
+        Raises:
+          ValueError: If a tool with this name is already registered.
+        """
+        if name in self._entries:
+            raise ValueError(f"Tool '{name}' is already registered.")
+        if context_args:
+            func = _bind_context(func, context_args)
+            if coroutine is not None:
+                coroutine = _bind_context(coroutine, context_args)
+        func = _speculative(name, func, self.speculative_results)
+        if coroutine is not None:
+            coroutine = _speculative(name, coroutine, self.speculative_results)
+        func = tracing.traced(f"tool.{name}")(func)
+        if coroutine is not None:
+            coroutine = tracing.traced(f"tool.{name}")(coroutine)
+        tool = StructuredTool.from_function(
+            func=func,
+            coroutine=coroutine,
+            name=name,
+            description=description,
+            args_schema=args_schema,
+        )
+        self._entries[name] = _Entry(tool=tool, group=group, available=available)
+        return tool
+
+    def get_tools(
+            self, context: ToolContext,
+            groups: Optional[Collection[str]] = None) -> List[StructuredTool]:
+        """Returns the tools available in `context`, in registration order.
+
+        Args:
+          context: The context the tools will run in.
+          groups: If given, only the tools of these groups are returned.
+        """
+        return [
+            entry.tool for entry in self._entries.values()
+            if (groups is None or entry.group in groups)
+            and (entry.available is None or entry.available(context))
+        ]
+
+    def groups(self) -> Set[str]:
+        """Returns the groups of the registered tools."""
+        return {entry.group for entry in self._entries.values()}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_registry = ToolRegistry()
+register = _registry.register
+
+
+@functools.lru_cache(maxsize=1)
+def _load_tool_modules():
+    for module in TOOL_MODULES:
+        importlib.import_module(f"ecco6.tool.{module}")
+
+
+def get_tools(
+        context: ToolContext, groups: Optional[Collection[str]] = None) -> List[StructuredTool]:
+    """Returns the tools of every tool module available in `context`.
+
+    Args:
+      context: The context the tools will run in.
+      groups: If given, only the tools of these groups are returned.
+    """
+    _load_tool_modules()
+    return _registry.get_tools(context, groups)
+
+
+def groups() -> Set[str]:
+    """Returns the groups of the tools of every tool module."""
+    _load_tool_modules()
+    return _registry.groups()
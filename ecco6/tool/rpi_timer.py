@@ -1,6 +1,8 @@
 import requests
 from langchain.pydantic_v1 import BaseModel, Field
 
+from ecco6.tool import registry
+
 
 class SetRpiTimerInput(BaseModel):
     time: str = Field(description="The time set for the timer in HH:MM:SS format.")
@@ -18,4 +20,15 @@ def set_rpi_timer(time: str, url: str):
     except requests.exceptions.HTTPError as e:
         return str(e)
 
-    return "The timer has been successfully set."
\ No newline at end of file
+    return "The timer has been successfully set."
+
+
+registry.register(
+    name="set_rpi_timer",
+    group="timer",
+    description="Set an timer/countdown by given time.",
+    func=set_rpi_timer,
+    args_schema=SetRpiTimerInput,
+    context_args={"url": "rpi_url"},
+    available=lambda context: context.rpi_url is not None,
+)
@@ -1,41 +1,59 @@
+import asyncio
+import logging
 import os
-import difflib
-import csv
+from typing import List, Optional, Sequence, Tuple
+
+import httpx
 import requests
 from langchain.pydantic_v1 import BaseModel, Field
 from langchain.tools import StructuredTool
 import streamlit as st
 import requests
 from .location import get_current_location
-from ecco6.tool import stops
+from ecco6.tool import registry, station_index, station_matcher, stop_db, trip_planner
+from ecco6.tool.nearby_stops import get_nearby_stop_index
+from ecco6.tool.sl_client import get_async_sl_client, get_sl_client
+from ecco6.tool.sl_trip import Trip, parse_trips, render_suggestions
+from ecco6.tool.trip_planner import TRIP_CACHE, trip_cache_key
 
 #================ TRAVEL PLANER ===================
 current_dir = os.path.dirname(__file__)
 #current_dir = os.path.dirname(os.path.abspath(__file__))
 stops_file = os.path.join(current_dir, "stops.txt")
 
+def get_stations_coordinates(station_names: Sequence[str]) -> List[Tuple[Optional[float], Optional[float]]]:
+    """Resolve several station names to coordinates in one pass.
+
+    Exact names are a single lookup each; the rest share one fuzzy matching
+    pass, so resolving a whole itinerary costs about as much as one name.
+    """
+    index = stop_db.get_stop_database()
+    rows = {name: index.find(name) for name in station_names}
+    unresolved = [name for name, row in rows.items() if row is None]
+    if unresolved:
+        closest_station_names = station_matcher.get_station_matcher().best_matches(
+            [station_index.normalize_name(name) for name in unresolved], cutoff=0.6)
+        for name, closest_station_name in zip(unresolved, closest_station_names):
+            if closest_station_name is not None:
+                rows[name] = index.find(closest_station_name)
+    return [
+        index.coordinates(rows[name]) if rows[name] is not None else (None, None)
+        for name in station_names
+    ]
+
 def get_station_coordinates(station_name):
-    reader = csv.DictReader(stops.STOP_CSV_STR.splitlines())
-    station_names = [row['stop_name'].lower() for row in reader]
-
-    closest_matches = difflib.get_close_matches(station_name.lower(), station_names, n=1, cutoff=0.6)
-    if closest_matches:
-        closest_station_name = closest_matches[0]
-        reader = csv.DictReader(stops.STOP_CSV_STR.splitlines())
-        for row in reader:
-            if row['stop_name'].lower() == closest_station_name:
-                return float(row['stop_lat']), float(row['stop_lon'])
-    return None, None
+    return get_stations_coordinates([station_name])[0]
 
 SL_RESEPLANERARE_API_KEY = st.secrets["SL_RESEPLANERARE_API_KEY"]
+SL_API_URL = st.secrets.get("SL_API_URL", "https://journeyplanner.integration.sl.se/v1")
 
 class GetTravelSuggestionsInput(BaseModel):
     origin_station_name: str = Field(description="The name of the origin station.")
     destination_station_name: str = Field(description="The name of the destination station.")
 
 def get_travel_suggestions(origin_station_name: str, destination_station_name: str) -> str:
-    origin_lat, origin_lon = get_station_coordinates(origin_station_name)
-    destination_lat, destination_lon = get_station_coordinates(destination_station_name)
+    (origin_lat, origin_lon), (destination_lat, destination_lon) = get_stations_coordinates(
+        [origin_station_name, destination_station_name])
 
     if origin_lat is None or origin_lon is None:
         return f"Error: Station '{origin_station_name}' not found in the database."
@@ -43,40 +61,52 @@ def get_travel_suggestions(origin_station_name: str, destination_station_name: s
     if destination_lat is None or destination_lon is None:
         return f"Error: Station '{destination_station_name}' not found in the database."
 
-    url = f"https://journeyplanner.integration.sl.se/v1/TravelplannerV3_1/trip.json?key={SL_RESEPLANERARE_API_KEY}&originCoordLat={origin_lat}&originCoordLong={origin_lon}&destCoordLat={destination_lat}&destCoordLong={destination_lon}"
-    response = requests.get(url)
+    return get_trip_suggestions(origin_lat, origin_lon, destination_lat, destination_lon)
 
-    if response.status_code == 200:
-        data = response.json()
-
-        found_lines = 0
-        travel_suggestions = ""
-
-        for trip in data.get("Trip", []):
-            for leg in trip["LegList"]["Leg"]:
-                if "Product" in leg:
-                    product = leg["Product"]
-                    if product["catOut"] == "TRAIN" and "PENDELTÅG" in product["name"]:
-                        travel_suggestions += f"Pendeltåg Line: {product['name']}\n"
-                        travel_suggestions += f"Departure: {leg['Origin']['name']}\n"
-                        travel_suggestions += f"Destination: {leg['Destination']['name']}\n"
-                        travel_suggestions += f"Departure Time: {leg['Origin']['time']}\n"
-                        travel_suggestions += f"Arrival Time: {leg['Destination']['time']}\n\n"
-                        found_lines += 1
-                    elif product["catOut"] == "BUS":
-                        travel_suggestions += f"Bus Line: {product['name']}\n"
-                        travel_suggestions += f"Departure: {leg['Origin']['name']}\n"
-                        travel_suggestions += f"Destination: {leg['Destination']['name']}\n"
-                        travel_suggestions += f"Departure Time: {leg['Origin']['time']}\n"
-                        travel_suggestions += f"Arrival Time: {leg['Destination']['time']}\n\n"
-                        found_lines += 1
-                    if found_lines == 2:
-                        break
-            if found_lines == 2:
-                break
-        return travel_suggestions or "No travel suggestions found."
-    else:
-        return f"Error: {response.status_code}"
+class GetItinerarySuggestionsInput(BaseModel):
+    station_names: List[str] = Field(
+        description="The stations of the journey in order, starting with the origin, e.g. home, work and gym.")
+
+def get_itinerary_suggestions(station_names: List[str]) -> str:
+    if len(station_names) < 2:
+        return "Error: An itinerary needs at least an origin and a destination station."
+
+    coordinates = get_stations_coordinates(station_names)
+    for station_name, (lat, lon) in zip(station_names, coordinates):
+        if lat is None or lon is None:
+            return f"Error: Station '{station_name}' not found in the database."
+
+    itinerary_suggestions = []
+    for i in range(len(station_names) - 1):
+        (origin_lat, origin_lon), (destination_lat, destination_lon) = coordinates[i], coordinates[i + 1]
+        itinerary_suggestions.append(
+            f"From {station_names[i]} to {station_names[i + 1]}:\n"
+            + get_trip_suggestions(origin_lat, origin_lon, destination_lat, destination_lon))
+    return "\n".join(itinerary_suggestions)
+
+# Parse trip responses incrementally and stop once the suggestions are found.
+# Only faster for responses far longer than SL's usual few trips, see
+# benchmark/bench_trip_parsing.py.
+SL_STREAM_TRIPS = st.secrets.get("SL_STREAM_TRIPS", False)
+
+def _trip_url(origin_lat: float, origin_lon: float, destination_lat: float, destination_lon: float) -> str:
+    return f"{SL_API_URL}/TravelplannerV3_1/trip.json?key={SL_RESEPLANERARE_API_KEY}&originCoordLat={origin_lat}&originCoordLong={origin_lon}&destCoordLat={destination_lat}&destCoordLong={destination_lon}"
+
+def get_trips(
+        origin_lat: float, origin_lon: float, destination_lat: float, destination_lon: float,
+        use_cache: bool = True) -> List[Trip]:
+    """Get the parsed trips between two coordinates, see trip_planner.get_trips."""
+    return trip_planner.get_trips(
+        _trip_url(origin_lat, origin_lon, destination_lat, destination_lon),
+        trip_cache_key(origin_lat, origin_lon, destination_lat, destination_lon), use_cache)
+
+def get_trip_suggestions(
+        origin_lat: float, origin_lon: float, destination_lat: float, destination_lon: float,
+        use_cache: bool = True) -> str:
+    return trip_planner.get_trip_suggestions(
+        _trip_url(origin_lat, origin_lon, destination_lat, destination_lon),
+        trip_cache_key(origin_lat, origin_lon, destination_lat, destination_lon),
+        stream=SL_STREAM_TRIPS, use_cache=use_cache)
 
 #================= NEARBY STOPS ======================
 
@@ -87,21 +117,181 @@ class GetNearbyStopsInput(BaseModel):
     radius: int = Field(default=1000, description="Radius in meters around the location to search for stops.")
 
 SL_NEARBYSTOPS_API_KEY = st.secrets["SL_NEARBYSTOPS_API_KEY"]
+# "local" answers from the bundled stop database, "remote" asks the SL API.
+SL_NEARBY_STOPS_SOURCE = st.secrets.get("SL_NEARBY_STOPS_SOURCE", "local")
 
 def get_nearby_stops(latitude: float, longitude: float, max_results: int = 3, radius: int = 1000) -> list:
-    url = f"https://journeyplanner.integration.sl.se/v1/nearbystopsv2.json?key={SL_NEARBYSTOPS_API_KEY}&originCoordLat={latitude}&originCoordLong={longitude}&maxNo={max_results}&r={radius}"
-    response = requests.get(url)
+    if SL_NEARBY_STOPS_SOURCE == "remote":
+        return get_nearby_stops_remote(latitude, longitude, max_results, radius)
+    try:
+        return get_nearby_stop_index().query(latitude, longitude, max_results, radius)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Local nearby stops lookup failed, asking the SL API instead: {e}")
+        return get_nearby_stops_remote(latitude, longitude, max_results, radius)
+
+def _nearby_stops_url(latitude: float, longitude: float, max_results: int, radius: int) -> str:
+    return f"{SL_API_URL}/nearbystopsv2.json?key={SL_NEARBYSTOPS_API_KEY}&originCoordLat={latitude}&originCoordLong={longitude}&maxNo={max_results}&r={radius}"
+
+def _format_nearby_stops(data: dict) -> list:
+    nearby_stops = data.get('stopLocationOrCoordLocation', [])
+    formatted_stops = []
+    for stop in nearby_stops:
+        formatted_stop = {
+            'name': stop['StopLocation']['name'],
+            'distance': stop['StopLocation']['dist'],
+            'location': stop['StopLocation']['id']
+        }
+        formatted_stops.append(formatted_stop)
+    return formatted_stops
+
+def get_nearby_stops_remote(latitude: float, longitude: float, max_results: int = 3, radius: int = 1000) -> list:
+    try:
+        response = get_sl_client().get(_nearby_stops_url(latitude, longitude, max_results, radius))
+    except requests.exceptions.RequestException as e:
+        logging.warning(f"SL nearby stops request failed: {e}")
+        return []
     if response.status_code == 200:
-        data = response.json()
-        nearby_stops = data.get('stopLocationOrCoordLocation', [])
-        formatted_stops = []
-        for stop in nearby_stops:
-            formatted_stop = {
-                'name': stop['StopLocation']['name'],
-                'distance': stop['StopLocation']['dist'],
-                'location': stop['StopLocation']['id']
-            }
-            formatted_stops.append(formatted_stop)
-        return formatted_stops
+        return _format_nearby_stops(response.json())
     else:
         return []
+
+#============ TRAVEL FROM CURRENT LOCATION ============
+
+class GetTravelSuggestionsFromLocationInput(BaseModel):
+    destination_station_name: str = Field(description="The name of the destination station.")
+
+def _describe_nearest_stop(nearby_stops: list) -> str:
+    if not nearby_stops:
+        return ""
+    return f"Nearest stop: {nearby_stops[0]['name']} ({nearby_stops[0]['distance']} m away)\n\n"
+
+def get_travel_suggestions_from_location(latitude: float, longitude: float, destination_station_name: str) -> str:
+    (destination_lat, destination_lon), = get_stations_coordinates([destination_station_name])
+    if destination_lat is None or destination_lon is None:
+        return f"Error: Station '{destination_station_name}' not found in the database."
+
+    nearby_stops = get_nearby_stops(latitude, longitude, max_results=1)
+    travel_suggestions = get_trip_suggestions(latitude, longitude, destination_lat, destination_lon)
+    return _describe_nearest_stop(nearby_stops) + travel_suggestions
+
+#================= ASYNC ======================
+# asyncio variants of the tools above, used through StructuredTool's
+# `coroutine` when the agent runs asynchronously.
+
+async def aget_trip_suggestions(
+        origin_lat: float, origin_lon: float, destination_lat: float, destination_lon: float,
+        use_cache: bool = True) -> str:
+    key = trip_cache_key(origin_lat, origin_lon, destination_lat, destination_lon)
+    trips, _ = TRIP_CACHE.get(key, (None, False)) if use_cache else (None, False)
+    if trips is None:
+        url = _trip_url(origin_lat, origin_lon, destination_lat, destination_lon)
+        try:
+            response = await get_async_sl_client().get(url)
+        except httpx.HTTPError as e:
+            return f"Error: {e}"
+        if response.status_code != 200:
+            return f"Error: {response.status_code}"
+        try:
+            trips = list(parse_trips(response.json().get("Trip", [])))
+        except ValueError as e:
+            return f"Error: {e}"
+        TRIP_CACHE.put(key, (trips, True))
+    return render_suggestions(trips)
+
+async def aget_travel_suggestions(origin_station_name: str, destination_station_name: str) -> str:
+    (origin_lat, origin_lon), (destination_lat, destination_lon) = await asyncio.to_thread(
+        get_stations_coordinates, [origin_station_name, destination_station_name])
+
+    if origin_lat is None or origin_lon is None:
+        return f"Error: Station '{origin_station_name}' not found in the database."
+
+    if destination_lat is None or destination_lon is None:
+        return f"Error: Station '{destination_station_name}' not found in the database."
+
+    # The trip is planned between the stations' coordinates, so it has to
+    # wait for them; nothing else is left to overlap.
+    return await aget_trip_suggestions(origin_lat, origin_lon, destination_lat, destination_lon)
+
+async def aget_itinerary_suggestions(station_names: List[str]) -> str:
+    if len(station_names) < 2:
+        return "Error: An itinerary needs at least an origin and a destination station."
+
+    coordinates = await asyncio.to_thread(get_stations_coordinates, station_names)
+    for station_name, (lat, lon) in zip(station_names, coordinates):
+        if lat is None or lon is None:
+            return f"Error: Station '{station_name}' not found in the database."
+
+    # The legs do not depend on each other, so their trips are requested
+    # together.
+    leg_suggestions = await asyncio.gather(*(
+        aget_trip_suggestions(*coordinates[i], *coordinates[i + 1])
+        for i in range(len(station_names) - 1)))
+    return "\n".join(
+        f"From {station_names[i]} to {station_names[i + 1]}:\n" + suggestions
+        for i, suggestions in enumerate(leg_suggestions))
+
+async def aget_nearby_stops(latitude: float, longitude: float, max_results: int = 3, radius: int = 1000) -> list:
+    if SL_NEARBY_STOPS_SOURCE != "remote":
+        try:
+            return get_nearby_stop_index().query(latitude, longitude, max_results, radius)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Local nearby stops lookup failed, asking the SL API instead: {e}")
+    try:
+        response = await get_async_sl_client().get(_nearby_stops_url(latitude, longitude, max_results, radius))
+    except httpx.HTTPError as e:
+        logging.warning(f"SL nearby stops request failed: {e}")
+        return []
+    if response.status_code == 200:
+        return _format_nearby_stops(response.json())
+    return []
+
+async def aget_travel_suggestions_from_location(
+        latitude: float, longitude: float, destination_station_name: str) -> str:
+    (destination_lat, destination_lon), = await asyncio.to_thread(
+        get_stations_coordinates, [destination_station_name])
+    if destination_lat is None or destination_lon is None:
+        return f"Error: Station '{destination_station_name}' not found in the database."
+
+    # The trip is planned from the coordinates themselves, so it does not
+    # have to wait for the nearby stops.
+    nearby_stops, travel_suggestions = await asyncio.gather(
+        aget_nearby_stops(latitude, longitude, max_results=1),
+        aget_trip_suggestions(latitude, longitude, destination_lat, destination_lon))
+    return _describe_nearest_stop(nearby_stops) + travel_suggestions
+
+#================= TOOLS ======================
+
+registry.register(
+    name="get_travel_suggestions",
+    group="travel",
+    description="Get travel suggestions for a specific journey.",
+    func=get_travel_suggestions,
+    coroutine=aget_travel_suggestions,
+    args_schema=GetTravelSuggestionsInput,
+)
+registry.register(
+    name="get_itinerary_suggestions",
+    group="travel",
+    description="Get travel suggestions for a journey through several stations in order.",
+    func=get_itinerary_suggestions,
+    coroutine=aget_itinerary_suggestions,
+    args_schema=GetItinerarySuggestionsInput,
+)
+registry.register(
+    name="get_nearby_stops",
+    group="travel",
+    description="Get nearby stops based on current location.",
+    func=get_nearby_stops,
+    coroutine=aget_nearby_stops,
+    args_schema=GetNearbyStopsInput,
+)
+registry.register(
+    name="get_travel_suggestions_from_location",
+    group="travel",
+    description="Get travel suggestions from my current location to a destination station.",
+    func=get_travel_suggestions_from_location,
+    coroutine=aget_travel_suggestions_from_location,
+    args_schema=GetTravelSuggestionsFromLocationInput,
+    context_args={"latitude": "latitude", "longitude": "longitude"},
+    available=lambda context: context.has_location,
+)
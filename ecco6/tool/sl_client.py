@@ -0,0 +1,148 @@
+"""Shared HTTP clients for the SL Journey Planner API.
+
+All SL calls go through one `requests.Session`, so they reuse pooled
+keep-alive connections to journeyplanner.integration.sl.se instead of paying
+a new TCP and TLS handshake per request. The session has connect and read
+timeouts and retries GET requests with backoff on 5xx responses.
+`AsyncSLClient` does the same on top of `httpx.AsyncClient` for the async
+tools, which run on the shared event loop of ecco6.event_loop.
+"""
+import asyncio
+import functools
+from typing import Optional, Tuple
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ecco6 import event_loop
+
+
+class SLClient:
+    """Connection-pooling HTTP client for the SL APIs.
+
+    The underlying urllib3 pool is thread-safe, so one client is shared by
+    every Streamlit session of the process.
+
+    Args:
+      pool_maxsize: Maximum number of pooled connections per host. Requests
+        beyond that wait for a free connection.
+      timeout: The (connect, read) timeouts in seconds.
+      retries: How many times to retry a GET that failed to connect or got
+        a 5xx response.
+      backoff_factor: Retries sleep backoff_factor * 2 ** (retry - 1) seconds.
+    """
+
+    def __init__(
+            self, pool_maxsize: int = 4, timeout: Tuple[float, float] = (3.05, 10),
+            retries: int = 2, backoff_factor: float = 0.3):
+        self.timeout = timeout
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=("GET",),
+            # Hand the last 5xx response back so callers can report its status.
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_maxsize, pool_block=True, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url: str, params: Optional[dict] = None, stream: bool = False) -> requests.Response:
+        """Send a GET request over a pooled connection.
+
+        Args:
+          url: The full request url.
+          params: Optional query parameters.
+          stream: Whether to leave the body unread, to be consumed from
+            `response.raw`. The response must then be closed by the caller.
+        Returns:
+          The response, whatever its status code.
+        Raises:
+          requests.exceptions.RequestException: If no response arrived, e.g.
+            on timeouts or connection errors after all retries.
+        """
+        return self.session.get(url, params=params, timeout=self.timeout, stream=stream)
+
+    def close(self):
+        self.session.close()
+
+
+@functools.lru_cache(maxsize=1)
+def get_sl_client() -> SLClient:
+    """Returns the process-wide SL client."""
+    return SLClient()
+
+
+class AsyncSLClient:
+    """asyncio counterpart of `SLClient`, built on `httpx.AsyncClient`.
+
+    An httpx client is bound to the event loop it first runs on, so the
+    tools use the one of `get_async_sl_client`, on the shared event loop.
+
+    Args:
+      pool_maxsize: Maximum number of pooled connections.
+      timeout: The (connect, read) timeouts in seconds.
+      retries: How many times to retry a GET that failed to connect or got
+        a 5xx response.
+      backoff_factor: Retries sleep backoff_factor * 2 ** (retry - 1) seconds.
+    """
+
+    def __init__(
+            self, pool_maxsize: int = 4, timeout: Tuple[float, float] = (3.05, 10),
+            retries: int = 2, backoff_factor: float = 0.3):
+        connect_timeout, read_timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+        )
+
+    async def get(self, url: str, params: Optional[dict] = None) -> httpx.Response:
+        """Send a GET request over a pooled connection.
+
+        Args:
+          url: The full request url.
+          params: Optional query parameters.
+        Returns:
+          The response, whatever its status code.
+        Raises:
+          httpx.TransportError: If no response arrived, e.g. on timeouts or
+            connection errors after all retries.
+        """
+        for retry in range(self.retries + 1):
+            if retry:
+                await asyncio.sleep(self.backoff_factor * 2 ** (retry - 1))
+            try:
+                response = await self.client.get(url, params=params)
+            except httpx.TransportError:
+                if retry == self.retries:
+                    raise
+                continue
+            if response.status_code < 500 or retry == self.retries:
+                return response
+        return response
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+@functools.lru_cache(maxsize=1)
+def _async_sl_client() -> AsyncSLClient:
+    return AsyncSLClient()
+
+
+def get_async_sl_client() -> AsyncSLClient:
+    """Returns the process-wide async SL client.
+
+    Raises:
+      RuntimeError: If not called on the shared event loop, which the
+        client's connections belong to.
+    """
+    event_loop.require_loop("The async SL client")
+    return _async_sl_client()
@@ -0,0 +1,89 @@
+"""Typed model of SL TravelplannerV3_1 trips.
+
+`parse_trip` turns one entry of a response's "Trip" list into a `Trip` of
+`Leg`s in a single pass, and `render_suggestions` formats trips as the
+travel suggestions the agent reads out.
+"""
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Tuple
+
+# Spoken names of the SL "catOut" product categories.
+PRODUCT_LABELS = {
+    "BUS": "Bus",
+    "METRO": "Metro",
+    "TRAIN": "Train",
+    "TRAM": "Tram",
+    "SHIP": "Ship",
+    "FERRY": "Ferry",
+    "TAXI": "Taxi",
+}
+MAX_SUGGESTED_LEGS = 2
+
+
+@dataclass(frozen=True, slots=True)
+class Leg:
+    """One public transport leg of a trip."""
+    category: str
+    line: str
+    origin: str
+    destination: str
+    departure_time: str
+    arrival_time: str
+
+    @property
+    def label(self) -> str:
+        """The spoken name of the product, e.g. "Bus" or "Pendeltåg"."""
+        if self.category == "TRAIN" and "PENDELTÅG" in self.line:
+            return "Pendeltåg"
+        return PRODUCT_LABELS.get(self.category, self.category.capitalize())
+
+
+@dataclass(frozen=True, slots=True)
+class Trip:
+    """A trip suggestion, as its public transport legs in travel order."""
+    legs: Tuple[Leg, ...]
+
+
+def parse_trip(trip: dict) -> Trip:
+    """Parse one entry of a TravelplannerV3_1 "Trip" list.
+
+    Legs without a "Product", such as walks, are left out.
+    """
+    legs = []
+    for leg in trip["LegList"]["Leg"]:
+        product = leg.get("Product")
+        if product is None:
+            continue
+        legs.append(Leg(
+            category=product["catOut"].strip(),
+            line=product["name"],
+            origin=leg["Origin"]["name"],
+            destination=leg["Destination"]["name"],
+            departure_time=leg["Origin"]["time"],
+            arrival_time=leg["Destination"]["time"],
+        ))
+    return Trip(legs=tuple(legs))
+
+
+def parse_trips(trips: Iterable[dict]) -> Iterator[Trip]:
+    """Lazily parse trips, so that streamed responses stay lazy."""
+    return map(parse_trip, trips)
+
+
+def render_suggestions(trips: Iterable[Trip], max_legs: int = MAX_SUGGESTED_LEGS) -> str:
+    """Format the first `max_legs` legs of `trips` as travel suggestions.
+
+    Stops iterating `trips` as soon as `max_legs` legs are found.
+    """
+    parts = []
+    for trip in trips:
+        for leg in trip.legs:
+            parts.append(
+                f"{leg.label} Line: {leg.line}\n"
+                f"Departure: {leg.origin}\n"
+                f"Destination: {leg.destination}\n"
+                f"Departure Time: {leg.departure_time}\n"
+                f"Arrival Time: {leg.arrival_time}\n\n")
+            if len(parts) == max_legs:
+                return "".join(parts)
+    return "".join(parts) or "No travel suggestions found."
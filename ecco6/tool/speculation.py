@@ -0,0 +1,151 @@
+"""Results of tool calls started before the model asked for them.
+
+`ecco6.tool.prefetch` starts the tool calls a transcript likely needs and
+puts their futures here. When the model then makes one of these calls, the
+registry hands it the speculative result instead of calling the service
+again. Results expire after a short time, so a stale result is never used,
+and the hit and waste counters tell whether the guesses pay off.
+"""
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Iterator, Mapping, Optional
+
+# Seconds a speculative result may be used after it was started.
+PREFETCH_TTL = 20.0
+# Decimals coordinates are rounded to in call keys, about 10 m.
+KEY_COORDINATE_DECIMALS = 4
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.strip().casefold()
+    if isinstance(value, float):
+        return round(value, KEY_COORDINATE_DECIMALS)
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(item) for item in value)
+    return value
+
+
+def call_key(name: str, kwargs: Mapping[str, Any], context: Hashable) -> tuple:
+    """Returns the key of a tool call, equal for calls with the same result.
+
+    Strings are compared case-insensitively, floats rounded, lists as tuples
+    and arguments left out or None are the same.
+    """
+    args = tuple(sorted(
+        (arg, _normalize(value)) for arg, value in kwargs.items() if value is not None))
+    return (name, args, context)
+
+
+class SpeculativeResults:
+    """A thread-safe store of speculative tool results.
+
+    Every result is used at most once. Results not used within `ttl`
+    seconds, or evicted because more than `maxsize` are pending, count as
+    wasted.
+
+    Args:
+      ttl: Seconds a result may be used after it was put.
+      maxsize: Maximum number of pending results.
+      clock: Returns the current time in seconds, for tests.
+    """
+
+    def __init__(
+            self, ttl: float = PREFETCH_TTL, maxsize: int = 64,
+            clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.started = 0
+        self.hits = 0
+        self.wasted = 0
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self):
+        now = self._clock()
+        expired = [key for key, (expires, _) in self._entries.items() if expires <= now]
+        for key in expired:
+            del self._entries[key]
+            logging.info(f"Speculative {key[0]} call expired unused.")
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            expired.append(None)
+        self.wasted += len(expired)
+
+    def put(self, key: Hashable, future: Future) -> bool:
+        """Stores the future of a speculative call.
+
+        Returns:
+          False if a result for `key` is already pending, in which case the
+          new one is not stored.
+        """
+        with self._lock:
+            self._expire()
+            if key in self._entries:
+                return False
+            self._entries[key] = (self._clock() + self.ttl, future)
+            self.started += 1
+            self._expire()
+            return True
+
+    def take(self, key: Hashable) -> Optional[Future]:
+        """Removes and returns the pending result of `key`, if any."""
+        with self._lock:
+            self._expire()
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def pending(self, key: Hashable) -> bool:
+        with self._lock:
+            self._expire()
+            return key in self._entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.started = self.hits = self.wasted = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the counters, and hits and waste as shares of the started calls."""
+        with self._lock:
+            self._expire()
+            started = self.started
+            return {
+                "started": started,
+                "hits": self.hits,
+                "wasted": self.wasted,
+                "pending": len(self._entries),
+                "hit_rate": self.hits / started if started else 0.0,
+                "waste_rate": self.wasted / started if started else 0.0,
+            }
+
+
+SPECULATIVE_RESULTS = SpeculativeResults()
+
+_speculating: "contextvars.ContextVar[bool]" = contextvars.ContextVar(
+    "ecco6_speculating", default=False)
+
+
+def is_speculating() -> bool:
+    """Whether the running tool call is itself a speculative one."""
+    return _speculating.get()
+
+
+@contextlib.contextmanager
+def speculating() -> Iterator[None]:
+    """Marks the tool calls inside the with block as speculative, so they
+    run instead of waiting for their own pending result."""
+    token = _speculating.set(True)
+    try:
+        yield
+    finally:
+        _speculating.reset(token)
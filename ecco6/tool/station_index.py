@@ -0,0 +1,62 @@
+"""In-memory index over the stop table shipped in `ecco6.tool.stops`.
+
+`STOP_CSV_STR` is parsed into parallel column arrays (ids, names, latitudes
+and longitudes) plus a dict from normalized stop name to row, so that exact
+name lookups are a single hash probe instead of a scan over every stop. The
+app reads the same table through `ecco6.tool.stop_db`, which is built from
+this index.
+"""
+import csv
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+
+def normalize_name(name: str) -> str:
+    """Normalize a stop name the same way the name lookups compare them."""
+    return name.lower()
+
+
+class StationIndex:
+    """Column-oriented view of the stop table.
+
+    Row `i` of the table is `ids[i]`, `names[i]`, `lats[i]` and `lons[i]`.
+    """
+    __slots__ = ("ids", "names", "lats", "lons", "_rows_by_name")
+
+    def __init__(self, csv_str: str):
+        self.ids = array("q")
+        self.names: List[str] = []
+        self.lats = array("d")
+        self.lons = array("d")
+        self._rows_by_name: Dict[str, int] = {}
+
+        reader = csv.reader(csv_str.splitlines())
+        header = next(reader)
+        id_col = header.index("stop_id")
+        name_col = header.index("stop_name")
+        lat_col = header.index("stop_lat")
+        lon_col = header.index("stop_lon")
+        for row, fields in enumerate(reader):
+            name = fields[name_col]
+            self.ids.append(int(fields[id_col]))
+            self.names.append(name)
+            self.lats.append(float(fields[lat_col]))
+            self.lons.append(float(fields[lon_col]))
+            # Keep the first row for duplicated names, like a linear scan would.
+            self._rows_by_name.setdefault(normalize_name(name), row)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def normalized_names(self) -> List[str]:
+        """Returns every distinct normalized stop name, in table order."""
+        return list(self._rows_by_name)
+
+    def find(self, station_name: str) -> Optional[int]:
+        """Returns the row of the stop with exactly this name, or None."""
+        return self._rows_by_name.get(normalize_name(station_name))
+
+    def coordinates(self, row: int) -> Tuple[float, float]:
+        """Returns the (latitude, longitude) of a row."""
+        return self.lats[row], self.lons[row]
+
@@ -0,0 +1,112 @@
+"""Fuzzy stop-name matching that agrees with `difflib.get_close_matches`.
+
+`difflib.get_close_matches(word, names, n=1)` scores every name with
+`SequenceMatcher`. Here each name's character counts are kept in a matrix so
+that difflib's `quick_ratio`, which is an upper bound on `ratio`, can be
+computed for all names at once with NumPy. Only names whose bound can still
+beat the best match so far are rescored with `SequenceMatcher.ratio`, in
+order of decreasing bound, so the result is the same as difflib's.
+"""
+import difflib
+import functools
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ecco6.tool import stop_db
+
+
+class StationMatcher:
+    """Finds the closest name to a word, like `get_close_matches(n=1)`."""
+
+    def __init__(self, names: Sequence[str]):
+        self.names: List[str] = list(names)
+        self._char_columns: Dict[str, int] = {}
+        char_rows = []
+        for name in self.names:
+            for char in name:
+                char_rows.append(self._char_columns.setdefault(char, len(self._char_columns)))
+        lengths = np.fromiter(
+            (len(name) for name in self.names), dtype=np.int64, count=len(self.names))
+        # One row per character so that the rows of a query are contiguous.
+        self._char_counts = np.zeros(
+            (len(self._char_columns), len(self.names)), dtype=np.uint8)
+        np.add.at(
+            self._char_counts,
+            (np.array(char_rows, dtype=np.int64), np.repeat(np.arange(len(self.names)), lengths)),
+            1)
+        self._lengths = lengths.astype(np.float64)
+
+    def upper_bounds(self, words: Sequence[str]) -> np.ndarray:
+        """Returns difflib's `quick_ratio` of each word against every name.
+
+        The bounds come back as a (len(words), len(names)) array. The number
+        of characters a word shares with a name is the number of (char, k),
+        k up to the word's count of char, for which the name has at least k
+        of char. Those indicator rows are built once and shared by the words.
+        """
+        pairs: Dict[Tuple[str, int], int] = {}
+        selections = []
+        for word in words:
+            selection = []
+            for char in set(word):
+                if char in self._char_columns:
+                    for k in range(1, word.count(char) + 1):
+                        selection.append(pairs.setdefault((char, k), len(pairs)))
+            selections.append(selection)
+
+        indicators = np.empty((len(pairs), len(self.names)), dtype=np.bool_)
+        for (char, k), i in pairs.items():
+            np.greater_equal(self._char_counts[self._char_columns[char]], k, out=indicators[i])
+        indicators = indicators.view(np.uint8)
+        matches = np.empty((len(words), len(self.names)), dtype=np.float64)
+        for row, selection in enumerate(selections):
+            # A name shares at most len(name) < 256 characters, so uint8 is exact.
+            matches[row] = indicators[selection].sum(axis=0, dtype=np.uint8)
+        word_lengths = np.array([len(word) for word in words], dtype=np.float64)[:, np.newaxis]
+        return 2.0 * matches / (self._lengths + word_lengths)
+
+    def best_match(self, word: str, cutoff: float = 0.6) -> Optional[str]:
+        """Returns the closest name to `word` scoring at least `cutoff`.
+
+        Args:
+          word: The (normalized) name to look for.
+          cutoff: The minimum `SequenceMatcher.ratio` in [0, 1].
+        Returns:
+          The same name `difflib.get_close_matches(word, names, n=1, cutoff)`
+          returns, or None if no name scores at least `cutoff`.
+        """
+        return self.best_matches([word], cutoff)[0]
+
+    def best_matches(self, words: Sequence[str], cutoff: float = 0.6) -> List[Optional[str]]:
+        """Like `best_match` for several words, sharing one candidate pass."""
+        if not words:
+            return []
+        return [
+            self._rescore(word, bounds, cutoff)
+            for word, bounds in zip(words, self.upper_bounds(words))
+        ]
+
+    def _rescore(self, word: str, bounds: np.ndarray, cutoff: float) -> Optional[str]:
+        candidates = np.flatnonzero(bounds >= cutoff)
+        candidates = candidates[np.argsort(-bounds[candidates], kind="stable")]
+
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(word)
+        best = None
+        for i in candidates:
+            # Ties on the score go to the larger name, as in get_close_matches,
+            # so only stop once no remaining name can reach the best score.
+            if best is not None and bounds[i] < best[0]:
+                break
+            matcher.set_seq1(self.names[i])
+            score = matcher.ratio()
+            if score >= cutoff and (best is None or (score, self.names[i]) > best):
+                best = (score, self.names[i])
+        return best[1] if best is not None else None
+
+
+@functools.lru_cache(maxsize=1)
+def get_station_matcher() -> StationMatcher:
+    """Returns the process-wide matcher over the normalized stop names."""
+    return StationMatcher(stop_db.get_stop_database().normalized_names())
@@ -0,0 +1,237 @@
+"""Binary, memory-mapped copy of the stop table in `ecco6.tool.stops`.
+
+`stops.py` holds the whole stop table as one multi-megabyte string literal.
+`build` converts it once into a compact file and `load` maps that file
+read-only, so every Streamlit worker shares the same pages instead of
+importing the literal. Layout, all in native byte order:
+
+    header       magic, version, byte order, stop count, section offsets
+    ids          int64[count]
+    lats, lons   int32[count], micro-degrees (the CSV has six decimals)
+    name_offsets uint32[count + 1], byte offsets into the name blob
+    sorted_rows  uint32[count], rows ordered by (normalized name, row)
+    names        UTF-8 blob
+"""
+import bisect
+import functools
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from typing import List, Optional, Sequence, Tuple
+
+from ecco6.tool.station_index import StationIndex, normalize_name
+
+STOP_DB_FILENAME = "stops.bin"
+STOP_DB_PATH = os.path.join(os.path.dirname(__file__), STOP_DB_FILENAME)
+# Where the database is built when the package directory is read-only. It is
+# private to the user, unlike the shared temporary directory.
+STOP_DB_CACHE_DIR = os.path.expanduser("~/.cache/ecco6")
+STOPS_MODULE_PATH = os.path.join(os.path.dirname(__file__), "stops.py")
+
+_MAGIC = b"ECCOSTOP"
+_VERSION = 1
+# magic, version, little endian flag, count, then the offsets of the ids,
+# lats, lons, name_offsets, sorted_rows and names sections.
+_HEADER = struct.Struct("=8sIII6Q")
+_MICRO = 1_000_000
+
+
+def _stops_index() -> StationIndex:
+    from ecco6.tool import stops
+    return StationIndex(stops.STOP_CSV_STR)
+
+
+def _pack(index: StationIndex) -> bytes:
+    """Returns the binary stop database of `index`."""
+    lats = array("i")
+    lons = array("i")
+    for lat, lon in zip(index.lats, index.lons):
+        micro_lat, micro_lon = round(lat * _MICRO), round(lon * _MICRO)
+        if micro_lat / _MICRO != lat or micro_lon / _MICRO != lon:
+            raise ValueError(f"Coordinates ({lat}, {lon}) have more than six decimals.")
+        lats.append(micro_lat)
+        lons.append(micro_lon)
+
+    name_offsets = array("I", [0])
+    encoded_names = []
+    for name in index.names:
+        encoded = name.encode("utf-8")
+        encoded_names.append(encoded)
+        name_offsets.append(name_offsets[-1] + len(encoded))
+    sorted_rows = array("I", sorted(
+        range(len(index)), key=lambda row: (normalize_name(index.names[row]), row)))
+
+    sections = [index.ids.tobytes(), lats.tobytes(), lons.tobytes(),
+                name_offsets.tobytes(), sorted_rows.tobytes(), b"".join(encoded_names)]
+    offsets = []
+    position = _HEADER.size
+    for section in sections:
+        position += -position % 8
+        offsets.append(position)
+        position += len(section)
+
+    data = bytearray(_HEADER.pack(_MAGIC, _VERSION, sys.byteorder == "little", len(index), *offsets))
+    for offset, section in zip(offsets, sections):
+        data += b"\0" * (offset - len(data))
+        data += section
+    return bytes(data)
+
+
+def build(path: str, index: Optional[StationIndex] = None):
+    """Write the binary stop database.
+
+    Args:
+        path: Where to write the file. It is written next to `path` first and
+            then renamed, so readers never see a partial file.
+        index: The stops to write, defaults to the table in `stops.py`.
+    """
+    if index is None:
+        index = _stops_index()
+    data = _pack(index)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".stops-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # mkstemp creates the file private to this user; workers only read it.
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    logging.info(f"Wrote {len(index)} stops to {path}")
+
+
+class _NameColumn(Sequence[str]):
+    """Lazily decoded view of the name blob."""
+
+    def __init__(self, offsets: memoryview, blob: memoryview):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return str(self._blob[self._offsets[row]:self._offsets[row + 1]], "utf-8")
+
+
+class StopDatabase:
+    """Read-only stop table backed by a memory-mapped `build` output.
+
+    Offers the same lookups as `StationIndex`, but the columns are views into
+    the mapped file rather than Python objects.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._map(memoryview(self._mmap), path)
+
+    @classmethod
+    def from_index(cls, index: StationIndex) -> "StopDatabase":
+        """Builds the database in this process's memory, without a file."""
+        database = cls.__new__(cls)
+        database._map(memoryview(_pack(index)), "The in-memory copy")
+        return database
+
+    def _map(self, buffer: memoryview, name: str):
+        magic, version, little_endian, count, *offsets = _HEADER.unpack_from(buffer)
+        if magic != _MAGIC or version != _VERSION or little_endian != (sys.byteorder == "little"):
+            raise ValueError(f"{name} is not a stop database for this platform.")
+        ids, lats, lons, name_offsets, sorted_rows, names = offsets
+
+        self.ids = buffer[ids:ids + 8 * count].cast("q")
+        self.micro_lats = buffer[lats:lats + 4 * count].cast("i")
+        self.micro_lons = buffer[lons:lons + 4 * count].cast("i")
+        name_offsets = buffer[name_offsets:name_offsets + 4 * (count + 1)].cast("I")
+        self.names = _NameColumn(name_offsets, buffer[names:names + name_offsets[count]])
+        self._sorted_rows = buffer[sorted_rows:sorted_rows + 4 * count].cast("I")
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _sorted_name(self, position: int) -> str:
+        return normalize_name(self.names[self._sorted_rows[position]])
+
+    def normalized_names(self) -> List[str]:
+        """Returns every distinct normalized stop name, in table order."""
+        first_rows = []
+        previous = None
+        for position in range(len(self)):
+            name = self._sorted_name(position)
+            if name != previous:
+                first_rows.append(self._sorted_rows[position])
+                previous = name
+        return [normalize_name(self.names[row]) for row in sorted(first_rows)]
+
+    def find(self, station_name: str) -> Optional[int]:
+        """Returns the row of the stop with exactly this name, or None."""
+        name = normalize_name(station_name)
+        position = bisect.bisect_left(range(len(self)), name, key=self._sorted_name)
+        if position < len(self) and self._sorted_name(position) == name:
+            return self._sorted_rows[position]
+        return None
+
+    def coordinates(self, row: int) -> Tuple[float, float]:
+        """Returns the (latitude, longitude) of a row."""
+        return self.micro_lats[row] / _MICRO, self.micro_lons[row] / _MICRO
+
+
+def load(
+        path: str = STOP_DB_PATH, cache_dir: str = STOP_DB_CACHE_DIR,
+        index: Optional[StationIndex] = None) -> StopDatabase:
+    """Map the stop database, (re)building it first if it is missing or stale.
+
+    Args:
+        path: The database file.
+        cache_dir: If `path` cannot be written, a copy in this directory is
+            used instead. If that cannot be written either, the database is
+            built in memory, unshared.
+        index: The stops to build from, defaults to the table in `stops.py`.
+    Returns:
+        The StopDatabase.
+    """
+    if _is_fresh(path):
+        return StopDatabase(path)
+    try:
+        build(path, index)
+        return StopDatabase(path)
+    except OSError as e:
+        logging.info(f"Cannot write {path}, using a copy in {cache_dir}: {e}")
+
+    cache_path = os.path.join(cache_dir, STOP_DB_FILENAME)
+    try:
+        if not _is_fresh(cache_path):
+            os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+            build(cache_path, index)
+        return StopDatabase(cache_path)
+    except OSError as e:
+        logging.warning(f"Cannot write {cache_path}, building the stop database in memory: {e}")
+    return StopDatabase.from_index(index if index is not None else _stops_index())
+
+
+def _is_fresh(path: str) -> bool:
+    if not os.path.exists(path):
+        return False
+    # Installed copies may ship the database without stops.py next to it.
+    if not os.path.exists(STOPS_MODULE_PATH):
+        return True
+    return os.path.getmtime(path) >= os.path.getmtime(STOPS_MODULE_PATH)
+
+
+@functools.lru_cache(maxsize=1)
+def get_stop_database() -> StopDatabase:
+    """Returns the process-wide memory-mapped stop database."""
+    return load()
+
+
+if __name__ == "__main__":
+    build(sys.argv[1] if len(sys.argv) > 1 else STOP_DB_PATH)
@@ -1,8 +1,18 @@
 import calendar
 import datetime
 
+from ecco6.tool import registry
+
 
 def get_current_time() -> str:
     date = datetime.datetime.today().strftime('%Y-%m-%d %H:%M:%S')
     day_name = calendar.day_name[datetime.date.today().weekday()] 
     return f'{day_name} {date}'
+
+
+registry.register(
+    name="get_current_time",
+    group="time",
+    description="Get the current date, time and the week day name.",
+    func=get_current_time,
+)
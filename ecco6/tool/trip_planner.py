@@ -0,0 +1,124 @@
+"""Requests SL TravelplannerV3_1 trips and caches them.
+
+The requests go through the pooled `sl_client.get_sl_client()`. A response is
+either parsed whole with `json.loads`, which is the faster choice for the few
+trips SL answers with, or, with `stream=True`, parsed a trip at a time with
+ijson until the suggestions are found. The rest of a streamed body is then
+read unparsed, so that its keep-alive connection goes back to the pool.
+
+Unlike ecco6.tool.sl, this module reads no secrets, so the callers pass the
+request url.
+"""
+import time
+from typing import Iterable, Iterator, List
+
+import ijson
+import requests
+import urllib3
+
+from ecco6.cache import TTLCache
+from ecco6.tool.sl_client import get_sl_client
+from ecco6.tool.sl_trip import Trip, parse_trips, render_suggestions
+
+# Trip responses are cached per origin, destination and departure time bucket.
+# Entries are (trips, complete): streamed suggestions only cache the trips
+# they parsed, which is enough to render the same suggestions again.
+TRIP_CACHE = TTLCache(maxsize=256, ttl=120)
+TRIP_CACHE_TIME_BUCKET_SECONDS = 300
+# Rounding to 4 decimals (about 10 m) lets nearby coordinates share entries.
+TRIP_CACHE_COORDINATE_DECIMALS = 4
+
+
+def trip_cache_key(origin_lat: float, origin_lon: float, destination_lat: float, destination_lon: float) -> tuple:
+    key = tuple(round(coordinate, TRIP_CACHE_COORDINATE_DECIMALS) for coordinate in (
+        origin_lat, origin_lon, destination_lat, destination_lon))
+    return key + (int(time.time() // TRIP_CACHE_TIME_BUCKET_SECONDS),)
+
+
+def get_trips(url: str, key: tuple, use_cache: bool = True) -> List[Trip]:
+    """Get the parsed trips of a TravelplannerV3_1 trip request.
+
+    Args:
+      url: The trip request.
+      key: The request's `trip_cache_key`.
+      use_cache: Whether a cached response may be returned. The fresh
+        response is cached either way.
+    Returns:
+      The trips departing now.
+    Raises:
+      requests.exceptions.RequestException: If the request failed or SL
+        answered with an error status.
+    """
+    if use_cache:
+        trips, complete = TRIP_CACHE.get(key, (None, False))
+        if complete:
+            return trips
+
+    response = get_sl_client().get(url)
+    response.raise_for_status()
+    trips = list(parse_trips(response.json().get("Trip", [])))
+    TRIP_CACHE.put(key, (trips, True))
+    return trips
+
+
+def iter_trips(url: str) -> Iterator[Trip]:
+    """Like `get_trips`, but parses the response body lazily.
+
+    Each trip is parsed only when it is asked for, so a caller that stops
+    early does not parse the rest of the body. The rest is still read, and
+    dropped, when the iterator is closed, so that the connection can be
+    reused. The response is not cached.
+
+    Raises:
+      requests.exceptions.RequestException: If the request failed or SL
+        answered with an error status.
+      urllib3.exceptions.HTTPError: If reading the body failed, e.g. timed
+        out. The body is read from the raw response, past requests.
+      ijson.JSONError: If the body is not valid JSON.
+    """
+    with get_sl_client().get(url, stream=True) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        try:
+            yield from parse_trips(ijson.items(response.raw, "Trip.item", use_float=True))
+        finally:
+            # A connection with unread data is closed instead of pooled.
+            response.raw.drain_conn()
+
+
+def _recorded(items: Iterable, recorded: list) -> Iterator:
+    for item in items:
+        recorded.append(item)
+        yield item
+
+
+def get_trip_suggestions(url: str, key: tuple, stream: bool = False, use_cache: bool = True) -> str:
+    """Get the travel suggestions of a trip request, or the error as text.
+
+    Args:
+      url: The trip request.
+      key: The request's `trip_cache_key`.
+      stream: Whether to parse the response with `iter_trips` and stop at
+        the last suggested trip.
+      use_cache: Whether cached trips may be used.
+    """
+    try:
+        trips, _ = TRIP_CACHE.get(key, (None, False)) if use_cache else (None, False)
+        if trips is not None:
+            return render_suggestions(trips)
+        if not stream:
+            return render_suggestions(get_trips(url, key, use_cache=False))
+
+        parsed_trips = []
+        trips = iter_trips(url)
+        try:
+            travel_suggestions = render_suggestions(_recorded(trips, parsed_trips))
+        finally:
+            # Stop parsing the response body as soon as the suggestions are found.
+            trips.close()
+        TRIP_CACHE.put(key, (parsed_trips, False))
+        return travel_suggestions
+    except requests.exceptions.HTTPError as e:
+        return f"Error: {e.response.status_code}"
+    except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError, ijson.JSONError) as e:
+        return f"Error: {e}"
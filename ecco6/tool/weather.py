@@ -3,12 +3,16 @@ import requests
 import streamlit as st
 from typing import Optional
 
+from ecco6.tool import registry
+
+METEOSOURCE_URL = st.secrets.get("METEOSOURCE_URL", "https://ai-weather-by-meteosource.p.rapidapi.com")
+
 class WeatherInput(BaseModel):
     city_name: str
     date: Optional[str]
 
 def get_weather(input_data: WeatherInput) -> str:
-    base_url = "https://ai-weather-by-meteosource.p.rapidapi.com"
+    base_url = METEOSOURCE_URL
     headers = {
         "X-RapidAPI-Key": st.secrets["WEATHER_API_KEY"],
         "X-RapidAPI-Host": "ai-weather-by-meteosource.p.rapidapi.com"
@@ -63,4 +67,13 @@ def get_weather(input_data: WeatherInput) -> str:
         response += f"The visibility is {current_weather['visibility']} km. "
         response += f"The wind chill is {current_weather['wind_chill']}°C."
 
-    return response
\ No newline at end of file
+    return response
+
+
+registry.register(
+    name="get_weather",
+    group="weather",
+    description="Get the current weather for a specified city.",
+    func=lambda **kwargs: get_weather(WeatherInput(**kwargs)),
+    args_schema=WeatherInput,
+)
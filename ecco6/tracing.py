@@ -0,0 +1,175 @@
+"""A lightweight latency recorder for the voice pipeline.
+
+A voice turn is wrapped in `turn()`, and each stage of it in `span(name)` or
+a function decorated with `traced(name)`. Spans are recorded in the turn
+being handled, found through a context variable so that spans in tool
+threads and asyncio tasks land in the right turn, and in process-wide
+per-stage statistics for p50/p95 latencies.
+"""
+import contextlib
+import contextvars
+import functools
+import inspect
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# How many of the latest durations of each stage the percentiles are over.
+STAGE_HISTORY = 500
+
+
+@dataclass(frozen=True)
+class Span:
+  name: str
+  # Seconds since the start of the turn.
+  start: float
+  seconds: float
+
+
+@dataclass
+class Turn:
+  """The spans of one voice turn."""
+  started: float = field(default_factory=time.perf_counter)
+  spans: List[Span] = field(default_factory=list)
+  seconds: Optional[float] = None
+
+  def breakdown(self) -> List[Dict[str, Any]]:
+    """Returns the spans in start order, with start and duration in ms."""
+    return [
+      {"stage": span.name, "start_ms": round(span.start * 1000), "ms": round(span.seconds * 1000)}
+      for span in sorted(self.spans, key=lambda span: span.start)
+    ]
+
+  def format(self) -> str:
+    lines = [f"Turn took {(self.seconds or 0) * 1000:.0f} ms:"]
+    for row in self.breakdown():
+      lines.append(f"  +{row['start_ms']:>6} ms {row['stage']:<32} {row['ms']:>6} ms")
+    return "\n".join(lines)
+
+
+class StageStats:
+  """Thread-safe record of the latest durations of each stage."""
+
+  def __init__(self, history: int = STAGE_HISTORY):
+    self._durations: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=history))
+    self._lock = threading.Lock()
+
+  def add(self, name: str, seconds: float):
+    with self._lock:
+      self._durations[name].append(seconds)
+
+  def percentiles(self, name: str, percents=(50, 95)) -> List[float]:
+    """Returns nearest-rank percentiles of a stage's durations, in seconds."""
+    with self._lock:
+      durations = sorted(self._durations.get(name, ()))
+    if not durations:
+      return [float("nan")] * len(percents)
+    return [durations[max(0, -(-len(durations) * p // 100) - 1)] for p in percents]
+
+  def summary(self) -> List[Dict[str, Any]]:
+    """Returns the count, p50 and p95 in ms of every stage."""
+    with self._lock:
+      names = sorted(self._durations)
+      counts = {name: len(self._durations[name]) for name in names}
+    rows = []
+    for name in names:
+      p50, p95 = self.percentiles(name)
+      rows.append({"stage": name, "count": counts[name], "p50_ms": round(p50 * 1000),
+                   "p95_ms": round(p95 * 1000)})
+    return rows
+
+  def clear(self):
+    with self._lock:
+      self._durations.clear()
+
+
+STAGE_STATS = StageStats()
+_current_turn: "contextvars.ContextVar[Optional[Turn]]" = contextvars.ContextVar(
+    "ecco6_turn", default=None)
+
+
+def current_turn() -> Optional[Turn]:
+  return _current_turn.get()
+
+
+def record(name: str, seconds: float, start: Optional[float] = None):
+  """Records that stage `name` took `seconds`, ending now unless `start` is
+  given as a time.perf_counter() value."""
+  STAGE_STATS.add(name, seconds)
+  turn = current_turn()
+  if turn is not None:
+    if start is None:
+      start = time.perf_counter() - seconds
+    turn.spans.append(Span(name, start - turn.started, seconds))
+
+
+@contextlib.contextmanager
+def span(name: str) -> Iterator[None]:
+  """Records how long the with block takes as stage `name`."""
+  start = time.perf_counter()
+  try:
+    yield
+  finally:
+    record(name, time.perf_counter() - start, start)
+
+
+@contextlib.contextmanager
+def turn() -> Iterator[Turn]:
+  """Collects the spans recorded inside the with block into a new Turn."""
+  current = Turn()
+  token = _current_turn.set(current)
+  try:
+    yield current
+  finally:
+    _current_turn.reset(token)
+    current.seconds = time.perf_counter() - current.started
+    STAGE_STATS.add("turn", current.seconds)
+    logging.info(current.format())
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+  """Decorator recording every call of a function as stage `name`."""
+
+  def decorator(func: Callable) -> Callable:
+    if inspect.iscoroutinefunction(func):
+      @functools.wraps(func)
+      async def async_wrapper(*args, **kwargs):
+        with span(name):
+          return await func(*args, **kwargs)
+      return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+      with span(name):
+        return func(*args, **kwargs)
+    return wrapper
+
+  return decorator
+
+
+class LLMSpans(BaseCallbackHandler):
+  """LangChain callback handler recording each chat model call as "llm"."""
+  run_inline = True
+
+  def __init__(self):
+    self._starts: Dict[UUID, float] = {}
+
+  def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+    self._starts[run_id] = time.perf_counter()
+
+  def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs):
+    self._starts[run_id] = time.perf_counter()
+
+  def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+    start = self._starts.pop(run_id, None)
+    if start is not None:
+      record("llm", time.perf_counter() - start, start)
+
+  def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+    self._starts.pop(run_id, None)
@@ -0,0 +1,226 @@
+"""Content-addressed cache of synthesized speech.
+
+Many answers are the same few sentences, such as the confirmations of the
+alarm, light and timer tools. `TTSCache` keeps their audio keyed by the
+text-to-speech model, the voice and the normalized text, in an in-memory LRU
+tier in front of a size-bounded directory, so a repeated sentence is played
+without a request to OpenAI, also after a restart. `prerender` synthesizes
+`COMMON_PHRASES` ahead of time.
+
+Answers can hold whatever the user's calendar, mail or tasks say, so only
+the common phrases and short sentences, such as the confirmations of tools,
+are written to disk. Other sentences are cached in memory only.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+
+# Sentences answers often consist of, synthesized ahead of time.
+COMMON_PHRASES = (
+  "Alarm set successfully.",
+  "The alarm has been set.",
+  "The light has been successfully turned on.",
+  "The light has been successfully turned off.",
+  "Brightness of the light has been set as low.",
+  "Brightness of the light has been set as medium.",
+  "Brightness of the light has been set as high.",
+  "The timer has been successfully set.",
+  "The email has been sent.",
+  "The event has been added to your calendar.",
+  "You have no unread messages in your primary inbox.",
+  "Sorry, I didn't catch that.",
+)
+# Sentences up to this many characters are cached on disk even if they are
+# not common phrases.
+DEFAULT_DISK_TEXT_LENGTH = 40
+
+_prerender_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ecco6-tts-prerender")
+
+
+def normalize(text: str) -> str:
+  """Returns the text as it is cached: NFC with whitespace collapsed."""
+  return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model: str, voice: str, text: str) -> str:
+  return hashlib.sha256(f"{model}\0{voice}\0{normalize(text)}".encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+  """A thread-safe two-tier cache of synthesized speech.
+
+  Args:
+    directory: Where the disk tier keeps one file per entry, or None for a
+      memory-only cache. Entries already there are reused.
+    memory_bytes: Size of the memory tier. Inserting beyond it drops the
+      least recently used entries from memory, not from disk.
+    disk_bytes: Size of the disk tier. Inserting beyond it deletes the
+      least recently used files.
+    disk_phrases: Phrases always cached on disk.
+    disk_text_length: Other texts are cached on disk only up to this many
+      characters, and in memory only beyond it.
+  """
+
+  def __init__(
+      self, directory: Optional[str] = None, memory_bytes: int = 16 * 2**20,
+      disk_bytes: int = 256 * 2**20, disk_phrases: Iterable[str] = COMMON_PHRASES,
+      disk_text_length: int = DEFAULT_DISK_TEXT_LENGTH):
+    self.directory = directory
+    self.memory_bytes = memory_bytes
+    self.disk_bytes = disk_bytes
+    self.disk_phrases = frozenset(map(normalize, disk_phrases))
+    self.disk_text_length = disk_text_length
+    self.memory_hits = 0
+    self.disk_hits = 0
+    self.misses = 0
+    self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+    self._memory_size = 0
+    self._disk: "OrderedDict[str, int]" = OrderedDict()
+    self._disk_size = 0
+    self._lock = threading.Lock()
+    if directory is not None:
+      os.makedirs(directory, exist_ok=True)
+      self._load_disk_index()
+
+  def _path(self, key: str) -> str:
+    return os.path.join(self.directory, f"{key}.mp3")
+
+  def _load_disk_index(self):
+    entries = []
+    for entry in os.scandir(self.directory):
+      if entry.is_file() and entry.name.endswith(".mp3"):
+        stat = entry.stat()
+        entries.append((stat.st_mtime, entry.name[:-len(".mp3")], stat.st_size))
+    for _, key, size in sorted(entries):
+      self._disk[key] = size
+      self._disk_size += size
+    self._evict_disk()
+
+  def _remember(self, key: str, audio: bytes):
+    if key in self._memory:
+      self._memory_size -= len(self._memory.pop(key))
+    self._memory[key] = audio
+    self._memory_size += len(audio)
+    while self._memory_size > self.memory_bytes and self._memory:
+      _, dropped = self._memory.popitem(last=False)
+      self._memory_size -= len(dropped)
+
+  def _evict_disk(self):
+    while self._disk_size > self.disk_bytes and self._disk:
+      key, size = self._disk.popitem(last=False)
+      self._disk_size -= size
+      try:
+        os.remove(self._path(key))
+      except OSError as e:
+        logging.warning(f"Cannot delete cached speech {key}: {e}")
+
+  def _keeps_on_disk(self, text: str) -> bool:
+    text = normalize(text)
+    return text in self.disk_phrases or len(text) <= self.disk_text_length
+
+  def get(self, model: str, voice: str, text: str) -> Optional[bytes]:
+    """Returns the cached audio of `text`, or None."""
+    key = cache_key(model, voice, text)
+    with self._lock:
+      audio = self._memory.get(key)
+      if audio is not None:
+        self._memory.move_to_end(key)
+        self.memory_hits += 1
+        return audio
+      if key not in self._disk:
+        self.misses += 1
+        return None
+      self._disk.move_to_end(key)
+    try:
+      with open(self._path(key), "rb") as f:
+        audio = f.read()
+      # The modification time orders the files for eviction after a restart.
+      os.utime(self._path(key))
+    except OSError as e:
+      logging.warning(f"Cannot read cached speech {key}: {e}")
+      with self._lock:
+        self._disk_size -= self._disk.pop(key, 0)
+        self.misses += 1
+      return None
+    with self._lock:
+      self._remember(key, audio)
+      self.disk_hits += 1
+    return audio
+
+  def put(self, model: str, voice: str, text: str, audio: bytes):
+    """Caches the audio of `text` in memory, and on disk if it is common or
+    short."""
+    key = cache_key(model, voice, text)
+    with self._lock:
+      self._remember(key, audio)
+      if self.directory is None or key in self._disk or not self._keeps_on_disk(text):
+        return
+    try:
+      # Written under a temporary name and renamed, so that a reader never
+      # sees a partial file.
+      fd, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+      with os.fdopen(fd, "wb") as f:
+        f.write(audio)
+      os.replace(temporary, self._path(key))
+    except OSError as e:
+      logging.warning(f"Cannot cache speech on disk: {e}")
+      return
+    with self._lock:
+      if key not in self._disk:
+        self._disk[key] = len(audio)
+        self._disk_size += len(audio)
+        self._evict_disk()
+
+  def __contains__(self, key: str) -> bool:
+    with self._lock:
+      return key in self._memory or key in self._disk
+
+  def stats(self) -> Dict[str, int]:
+    """Returns the hit and miss counters and the size of each tier."""
+    with self._lock:
+      return {
+        "memory_hits": self.memory_hits, "disk_hits": self.disk_hits, "misses": self.misses,
+        "memory_bytes": self._memory_size, "disk_bytes": self._disk_size,
+      }
+
+
+def prerender(
+    cache: TTSCache, synthesize: Callable[[str], bytes], model: str, voice: str,
+    phrases: Iterable[str] = COMMON_PHRASES) -> int:
+  """Synthesizes the phrases not cached yet.
+
+  Args:
+    cache: The cache `synthesize` puts its audio in.
+    synthesize: Synthesizes a phrase with `model` and `voice`, e.g. a
+      bound OpenAIClient.text_to_speech.
+    model: The text-to-speech model.
+    voice: The voice.
+    phrases: The phrases to synthesize.
+  Returns:
+    How many phrases were synthesized.
+  """
+  rendered = 0
+  for phrase in phrases:
+    if cache_key(model, voice, phrase) in cache:
+      continue
+    try:
+      synthesize(phrase)
+    except Exception as e:
+      logging.warning(f"Cannot prerender {phrase!r}: {e}")
+      return rendered
+    rendered += 1
+  logging.info(f"Prerendered {rendered} phrases with {voice}.")
+  return rendered
+
+
+def prerender_in_background(
+    cache: TTSCache, synthesize: Callable[[str], bytes], model: str, voice: str,
+    phrases: Iterable[str] = COMMON_PHRASES) -> Future:
+  """Runs `prerender` in a background thread, returning its future."""
+  return _prerender_pool.submit(prerender, cache, synthesize, model, voice, tuple(phrases))
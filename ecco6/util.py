@@ -1,11 +1,20 @@
+import audioop
 import base64
+import functools
 import io
 import logging
+import shutil
+import subprocess
+import wave
 from typing import BinaryIO
 
 import streamlit as st
+import streamlit.components.v1 as components
 import extra_streamlit_components as stx
 
+from ecco6 import tracing
+from ecco6.audio_store import AudioRef, AudioStore
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s.%(msecs)03d %(levelname)s: %(message)s',
@@ -49,15 +58,24 @@ def append_message(role: str, content: str, audio: bytes):
     role: The role of the message, can be user or assistant.
     content: The content of the message.
     audio: Bytes of the audio recoriding, which is corresponds to the
-      content.
+      content. It is kept in the session's AudioStore, and the message
+      holds an AudioRef to it, see message_audio.
   """
+  if "audio_store" not in st.session_state:
+    st.session_state.audio_store = AudioStore()
   st.session_state.messages.append({
       "role": role,
       "content": content,
-      "audio": audio,
+      "audio": st.session_state.audio_store.put(audio),
   })
 
 
+def message_audio(message: dict) -> bytes:
+  """Returns the audio of a message, reading it back from disk if needed."""
+  audio = message["audio"]
+  return audio.read() if isinstance(audio, AudioRef) else audio
+
+
 def create_memory_file(content: bytes, filename: str) -> BinaryIO:
   """Create memory file by giving file content and file name.
 
@@ -71,6 +89,90 @@ def create_memory_file(content: bytes, filename: str) -> BinaryIO:
   memory_file.name = filename
   return memory_file
 
+# Sample rate speech is uploaded at. Whisper resamples everything to 16 kHz,
+# so anything above only costs upload time.
+UPLOAD_SAMPLE_RATE = 16000
+# The ffmpeg muxer and codec of each upload format.
+UPLOAD_CODECS = {
+  "ogg": ("ogg", "libopus"),
+  "flac": ("flac", "flac"),
+}
+# libopus effort, 0 to 10. Above 3 it takes several times longer to encode
+# for a barely smaller file.
+OPUS_COMPRESSION_LEVEL = 3
+_PCM_FORMATS = {1: "u8", 2: "s16le", 4: "s32le"}
+
+
+@functools.lru_cache(maxsize=1)
+def _has_ffmpeg() -> bool:
+  if shutil.which("ffmpeg") is None:
+    logging.warning("ffmpeg not found, uploading speech as 16 kHz WAV")
+    return False
+  return True
+
+
+def _pcm(audio) -> memoryview:
+  """Returns the samples of an AudioSegment as mono 16 kHz PCM, without
+  copying them if they already are."""
+  raw = memoryview(audio.raw_data)
+  if audio.channels > 1:
+    raw = memoryview(audioop.tomono(raw, audio.sample_width, 0.5, 0.5))
+  if audio.frame_rate != UPLOAD_SAMPLE_RATE:
+    raw = memoryview(audioop.ratecv(
+        raw, audio.sample_width, 1, audio.frame_rate, UPLOAD_SAMPLE_RATE, None)[0])
+  return raw
+
+
+def _wav(pcm: memoryview, sample_width: int) -> bytes:
+  memory_file = io.BytesIO()
+  with wave.open(memory_file, "wb") as wav:
+    wav.setnchannels(1)
+    wav.setsampwidth(sample_width)
+    wav.setframerate(UPLOAD_SAMPLE_RATE)
+    wav.writeframes(pcm)
+  return memory_file.getvalue()
+
+
+def _ffmpeg_encode(pcm: memoryview, sample_width: int, audio_format: str, bitrate: str) -> bytes:
+  muxer, codec = UPLOAD_CODECS[audio_format]
+  command = [
+    "ffmpeg", "-loglevel", "error",
+    "-f", _PCM_FORMATS[sample_width], "-ar", str(UPLOAD_SAMPLE_RATE), "-ac", "1", "-i", "pipe:0",
+    "-c:a", codec,
+  ]
+  if codec == "libopus":
+    command += ["-b:a", bitrate, "-compression_level", str(OPUS_COMPRESSION_LEVEL)]
+  command += ["-f", muxer, "pipe:1"]
+  # The samples are piped to ffmpeg straight from the memoryview.
+  return subprocess.run(command, input=pcm, capture_output=True, check=True).stdout
+
+
+@tracing.traced("audio_encode")
+def encode_speech(audio, audio_format: str = "ogg", bitrate: str = "24k") -> BinaryIO:
+  """Encodes a recording compactly for speech-to-text.
+
+  The recording is downmixed to mono and resampled to 16 kHz, then encoded
+  by ffmpeg. A 5 s recording is about 15 kB of Opus at 24 kbit/s, against
+  80 kB of the MP3 `AudioSegment.export()` writes by default. Without ffmpeg
+  it is uploaded as 16 kHz mono WAV.
+
+  Args:
+    audio: The recording, a pydub AudioSegment as audiorecorder returns.
+    audio_format: "ogg" for Opus in Ogg, "flac" for lossless FLAC or "wav".
+    bitrate: The Opus bitrate, e.g. "24k".
+  Returns:
+    A named memory file, for OpenAIClient.speech_to_text.
+  """
+  pcm = _pcm(audio)
+  if audio_format in UPLOAD_CODECS and _has_ffmpeg():
+    try:
+      return create_memory_file(
+          _ffmpeg_encode(pcm, audio.sample_width, audio_format, bitrate), f"speech.{audio_format}")
+    except subprocess.CalledProcessError as e:
+      logging.warning(f"Encoding speech as {audio_format} failed, uploading WAV: {e.stderr!r}")
+  return create_memory_file(_wav(pcm, audio.sample_width), "speech.wav")
+
+
 def render_image(filepath: str):
   """
   filepath: path to the image. Must have a valid file extension.
@@ -83,6 +185,7 @@ def render_image(filepath: str):
   st.image(image_string)
 
 
+@tracing.traced("audio_embed")
 def autoplay_hidden_audio(audio: bytes):
   audio_base64 = base64.b64encode(audio).decode()
 
@@ -91,4 +194,56 @@ def autoplay_hidden_audio(audio: bytes):
       <source src="data:audio/mp3;base64,{audio_base64}" type="audio/mp3">
   </audio>
   """
-  st.markdown(html_string, unsafe_allow_html=True)
\ No newline at end of file
+  st.markdown(html_string, unsafe_allow_html=True)
+
+
+def autoplay_streamed_audio(url: str):
+  """Play audio served at `url`, e.g. by ecco6.audio_stream.AudioServer.
+
+  Unlike autoplay_hidden_audio, the page only gets the URL, and the browser
+  starts playing as soon as the first bytes arrive.
+  """
+  st.markdown(f"""
+  <audio autoplay hidden src="{url}"></audio>
+  """, unsafe_allow_html=True)
+
+
+def _queue_audio_source(src: str):
+  components.html(f"""
+  <script>
+    const page = window.parent;
+    page.ecco6AudioQueue = page.ecco6AudioQueue || [];
+    const playNext = () => {{
+      const next = page.ecco6AudioQueue.shift();
+      page.ecco6AudioPlaying = Boolean(next);
+      if (next) {{
+        next.onended = playNext;
+        next.play().catch(playNext);
+      }}
+    }};
+    page.ecco6AudioQueue.push(new page.Audio("{src}"));
+    if (!page.ecco6AudioPlaying) {{
+      playNext();
+    }}
+  </script>
+  """, height=0)
+
+
+@tracing.traced("audio_embed")
+def queue_hidden_audio(audio: bytes):
+  """Play audio after the audio queued before it has finished.
+
+  Unlike autoplay_hidden_audio, clips queued one after another play in
+  order instead of all at once. The queue lives in the parent page, so it
+  outlives the component that added the clip.
+  """
+  _queue_audio_source(f"data:audio/mp3;base64,{base64.b64encode(audio).decode()}")
+
+
+def queue_streamed_audio(url: str):
+  """Like queue_hidden_audio, for audio served at `url`.
+
+  The browser fetches the audio itself, so a clip starts playing on its
+  first bytes, and the page gets the URL instead of the audio.
+  """
+  _queue_audio_source(url)
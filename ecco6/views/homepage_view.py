@@ -1,6 +1,8 @@
 import asyncio
 import logging
-from typing import Tuple
+import os
+import time
+from typing import AsyncIterator, List, Tuple, Union
 
 import streamlit as st
 from google.auth.transport.requests import Request
@@ -9,13 +11,79 @@ from PIL import Image
 from streamlit_js_eval import get_geolocation
 from audiorecorder import audiorecorder
 
-from ecco6 import util
-from ecco6.agent import Ecco6Agent
+from ecco6 import audio_stream, event_loop, speech, stt, tracing, tts_cache, util
+from ecco6.agent import Ecco6Agent, get_agent
+from ecco6.audio_store import AudioStore
+from ecco6.audio_stream import SpeechStream
+from ecco6.history import ChatHistory
 from ecco6.auth import firebase_auth
-from ecco6.client.OpenAIClient import OpenAIClient
+from ecco6.client.OpenAIClient import DEFAULT_TTS_MODEL, DEFAULT_TTS_VOICE, OpenAIClient, PoolConfig
+from ecco6.tool import speculation
+from ecco6.tool.registry import ToolContext
 
 from firebase_admin import db
 
+# Whether answers are streamed and spoken sentence by sentence.
+STREAM_RESPONSES = st.secrets.get("STREAM_RESPONSES", True)
+# Whether each request is offered only the tools its words ask for, see
+# agent.ToolRouter, instead of every tool.
+ROUTE_TOOLS = st.secrets.get("ROUTE_TOOLS", True)
+# Limits of the connection pool shared by every OpenAI call, e.g.
+# [OPENAI_POOL] max_connections = 20, see OpenAIClient.PoolConfig.
+OPENAI_POOL = PoolConfig(**st.secrets.get("OPENAI_POOL", {}))
+# How recordings are encoded for upload to speech-to-text: "ogg" (Opus),
+# "flac" or "wav", and the Opus bitrate.
+STT_UPLOAD_FORMAT = st.secrets.get("STT_UPLOAD_FORMAT", "ogg")
+STT_UPLOAD_BITRATE = st.secrets.get("STT_UPLOAD_BITRATE", "24k")
+# Whether recordings are transcribed a phrase at a time, the phrases
+# concurrently, instead of in one request.
+STREAMING_STT = st.secrets.get("STREAMING_STT", False)
+# Whether likely tool calls are started from the transcript, before the
+# model asks for them.
+PREFETCH_TOOLS = st.secrets.get("PREFETCH_TOOLS", True)
+# Where synthesized speech is cached across restarts, or "" to cache it in
+# memory only, and the size of the memory and the disk tier in MB.
+TTS_CACHE_DIR = st.secrets.get("TTS_CACHE_DIR", os.path.expanduser("~/.cache/ecco6/tts"))
+TTS_CACHE_MEMORY_MB = st.secrets.get("TTS_CACHE_MEMORY_MB", 16)
+TTS_CACHE_DISK_MB = st.secrets.get("TTS_CACHE_DISK_MB", 256)
+# Up to how many characters sentences other than the common phrases are
+# cached on disk. Longer ones, which may quote the user's mail or calendar,
+# are cached in memory only.
+TTS_CACHE_DISK_TEXT_LENGTH = st.secrets.get(
+    "TTS_CACHE_DISK_TEXT_LENGTH", tts_cache.DEFAULT_DISK_TEXT_LENGTH)
+# Whether common tool confirmations are synthesized at startup, so that they
+# are spoken without waiting for text-to-speech.
+PRERENDER_PHRASES = st.secrets.get("PRERENDER_PHRASES", True)
+# Whether speech is streamed to the browser from a local endpoint, playing
+# from the first chunk, instead of embedded in the page once synthesized. The
+# browser must reach the endpoint, e.g. [AUDIO_SERVER] port = 8502 and
+# public_url = "https://example.com/audio" behind a reverse proxy, see
+# audio_stream.AudioServer.
+STREAM_AUDIO = st.secrets.get("STREAM_AUDIO", False)
+AUDIO_SERVER = st.secrets.get("AUDIO_SERVER", {})
+# How much message audio each session keeps in memory, in MB. Older audio is
+# spooled to a temporary file and read back if it is played again.
+MESSAGE_AUDIO_MEMORY_MB = st.secrets.get("MESSAGE_AUDIO_MEMORY_MB", 4)
+# Whether the sidebar shows the latency of the last turn and of all stages.
+SHOW_LATENCY_PANEL = st.secrets.get("SHOW_LATENCY_PANEL", False)
+
+
+@st.cache_resource(show_spinner=False)
+def get_tts_cache() -> tts_cache.TTSCache:
+  """Returns the speech cache shared by every session."""
+  return tts_cache.TTSCache(
+      TTS_CACHE_DIR or None, memory_bytes=TTS_CACHE_MEMORY_MB * 2**20,
+      disk_bytes=TTS_CACHE_DISK_MB * 2**20, disk_text_length=TTS_CACHE_DISK_TEXT_LENGTH)
+
+
+@st.cache_resource(show_spinner=False)
+def prerender_phrases(_openai_client: OpenAIClient, tts_voice: str):
+  """Synthesizes the common phrases in a voice once per server."""
+  tts_cache.prerender_in_background(
+      _openai_client.tts_cache,
+      lambda phrase: _openai_client.text_to_speech(phrase, tts_voice, DEFAULT_TTS_MODEL),
+      DEFAULT_TTS_MODEL, tts_voice)
+
 
 def init_homepage() -> Tuple[st.selectbox, st.selectbox]:
   """Initialize the Chatbox and the Sidebar of streamlit.
@@ -34,6 +102,8 @@ def init_homepage() -> Tuple[st.selectbox, st.selectbox]:
 
   if "messages" not in st.session_state:
      st.session_state.messages = []
+  if "audio_store" not in st.session_state:
+    st.session_state.audio_store = AudioStore(MESSAGE_AUDIO_MEMORY_MB * 2**20)
 
   image = Image.open('./ecco6/ecco6logo.png')
   col1, col2 = st.columns([1, 3])  # Adjust the width ratio as needed
@@ -149,34 +219,194 @@ def init_homepage() -> Tuple[st.selectbox, st.selectbox]:
       return openai_chat_model, openai_tts_voice
 
 
+async def synthesize_answer(
+    ecco6_agent: Ecco6Agent, openai_client: OpenAIClient, messages: List[dict],
+    chat_history: ChatHistory, context: ToolContext, parts: List[str],
+    tts_voice: str = DEFAULT_TTS_VOICE) -> AsyncIterator[Union[bytes, SpeechStream]]:
+  """Streams the agent's answer and synthesizes it a sentence at a time.
+
+  Each sentence is sent to text-to-speech as soon as the agent has written
+  it. This runs on the shared event loop, so it does not touch Streamlit.
+
+  Args:
+    parts: The pieces of the answer are appended to it.
+  Yields:
+    The audio of each sentence, in order: its bytes, or with STREAM_AUDIO a
+    SpeechStream as soon as the sentence is complete.
+  """
+  async def tokens():
+    async for token in ecco6_agent.astream_completion(messages, chat_history, context):
+      parts.append(token)
+      yield token
+
+  async def synthesize(sentence: str) -> bytes:
+    try:
+      return await openai_client.atext_to_speech(sentence, tts_voice)
+    except Exception as e:
+      logging.warning(f"Cannot synthesize {sentence}: {e}")
+      return b""
+
+  if STREAM_AUDIO:
+    async for sentence in speech.split_sentences(tokens()):
+      yield openai_client.stream_speech(sentence, tts_voice)
+    return
+
+  async for _, sentence_audio in speech.synthesize_in_order(
+      speech.split_sentences(tokens()), synthesize):
+    yield sentence_audio
+
+
+def finished_audio(stream: SpeechStream) -> bytes:
+  """Waits for a stream and returns its audio, or none if synthesis failed.
+
+  A sentence that cannot be spoken is left silent, so that the answer is
+  still shown and kept.
+  """
+  try:
+    return stream.audio()
+  except Exception as e:
+    logging.warning(f"Cannot synthesize speech: {e}")
+    return b""
+
+
+def stream_answer(
+    ecco6_agent: Ecco6Agent, openai_client: OpenAIClient,
+    chat_history: ChatHistory, tts_voice: str = DEFAULT_TTS_VOICE) -> Tuple[str, bytes]:
+  """Streams the agent's answer and plays it a sentence at a time.
+
+  The answer is generated and synthesized on the shared event loop, see
+  `synthesize_answer`, and each sentence is queued for playback while the
+  rest of the answer is generated.
+
+  Returns:
+    The answer and its audio.
+  """
+  start = time.perf_counter()
+  parts, audio = [], []
+  sentences = event_loop.iterate(synthesize_answer(
+      ecco6_agent, openai_client, list(st.session_state.messages), chat_history,
+      ecco6_agent.tool_context(), parts, tts_voice))
+
+  if STREAM_AUDIO:
+    # Each sentence is published as soon as it is complete and the browser
+    # plays it from its first chunk, in the order they were queued.
+    server = audio_stream.get_audio_server(**AUDIO_SERVER)
+    streams = []
+    for stream in sentences:
+      util.queue_streamed_audio(server.publish(stream))
+      streams.append(stream)
+    audio = [finished_audio(stream) for stream in streams]
+    # Streams that failed, or had no audio, have no first chunk.
+    first_chunks = [stream.first_chunk_at for stream in streams if stream.first_chunk_at is not None]
+    if first_chunks:
+      tracing.record("first_audio", first_chunks[0] - start, start)
+    return "".join(parts).strip(), b"".join(audio)
+
+  for sentence_audio in sentences:
+    if not sentence_audio:
+      continue
+    if not audio:
+      tracing.record("first_audio", time.perf_counter() - start, start)
+    util.queue_hidden_audio(sentence_audio)
+    audio.append(sentence_audio)
+  # MP3 frames can be concatenated into one playable file.
+  return "".join(parts).strip(), b"".join(audio)
+
+
+def latency_panel():
+  """Shows the stages of the last turn and the p50/p95 of every stage."""
+  with st.sidebar.expander(label="Latency"):
+    if "last_turn" in st.session_state:
+      st.write(f"Last turn: {st.session_state.last_turn.seconds * 1000:.0f} ms")
+      st.dataframe(st.session_state.last_turn.breakdown(), hide_index=True)
+    st.write("All turns of this server:")
+    st.dataframe(tracing.STAGE_STATS.summary(), hide_index=True)
+    if PREFETCH_TOOLS:
+      st.write("Prefetched tool calls:")
+      st.dataframe([speculation.SPECULATIVE_RESULTS.stats()], hide_index=True)
+    st.write("Speech cache:")
+    st.dataframe([get_tts_cache().stats()], hide_index=True)
+    if "audio_store" in st.session_state:
+      st.write("Message audio of this session:")
+      st.dataframe([st.session_state.audio_store.stats()], hide_index=True)
+
+
 def homepage_view():
+  rerun_start = time.perf_counter()
   st.empty()
   openai_chat_model, openai_tts_voice = init_homepage()
 
   openai_client = OpenAIClient(
-      st.secrets["OPENAI_API_KEY"],
-      chat_model=openai_chat_model,
-      tts_voice=openai_tts_voice)
+      st.secrets["OPENAI_API_KEY"], OPENAI_POOL,
+      upload_format=STT_UPLOAD_FORMAT, upload_bitrate=STT_UPLOAD_BITRATE,
+      tts_cache=get_tts_cache())
+  if PRERENDER_PHRASES:
+    prerender_phrases(openai_client, openai_tts_voice)
   
-  ecco6_agent = Ecco6Agent(
+  agent_start = time.perf_counter()
+  ecco6_agent = get_agent(
       st.secrets["OPENAI_API_KEY"], 
       google_credentials=st.session_state.google_credentials if "google_credentials" in st.session_state else None,
       rpi_url=st.session_state.rpi_url if "rpi_url" in st.session_state else None,
-      chat_model=openai_chat_model)
+      chat_model=openai_chat_model,
+      openai_pool=OPENAI_POOL,
+      route_tools=ROUTE_TOOLS)
+  agent_seconds = time.perf_counter() - agent_start
+  logging.info(
+      f"Rerun setup took {(time.perf_counter() - rerun_start) * 1000:.1f} ms, "
+      f"{agent_seconds * 1000:.1f} ms of it getting the agent.")
   
   user_audio = audiorecorder("Click to record", "Click to stop recording")
   if len(user_audio) > 0:
+    with tracing.turn() as turn:
+      handle_turn(user_audio, ecco6_agent, openai_client, openai_tts_voice)
+    st.session_state.last_turn = turn
+  if SHOW_LATENCY_PANEL:
+    latency_panel()
+
+
+def handle_turn(
+    user_audio, ecco6_agent: Ecco6Agent, openai_client: OpenAIClient,
+    tts_voice: str = DEFAULT_TTS_VOICE):
+  """Transcribes a recording, answers it and speaks the answer."""
+  def transcribe(audio) -> str:
+    return openai_client.speech_to_text(util.encode_speech(
+        audio, openai_client.upload_format, openai_client.upload_bitrate))
+
+  if STREAMING_STT:
+    with tracing.span("streaming_stt"):
+      transcription = stt.transcribe_recording(user_audio, transcribe)
+  else:
+    transcription = transcribe(user_audio)
+  logging.info(f"User said: {transcription}.")
+  if PREFETCH_TOOLS:
+    ecco6_agent.prefetch(transcription)
+  # The recording is kept as MP3, pydub's default export format, for replay
+  # in the chat. It is exported after the transcript so that the upload does
+  # not wait for it.
+  with tracing.span("audio_export"):
     user_audio_bytes = user_audio.export().read()
-    buffer = util.create_memory_file(user_audio_bytes, "foo.wav")
-    transcription = openai_client.speech_to_text(buffer)
-    logging.info(f"User said: {transcription}.")
-    util.append_message("user", transcription, user_audio_bytes)
-    answer = ecco6_agent.chat_completion([
-      {"role": m["role"], "content": m["content"]}
-      for m in st.session_state.messages
-    ])
+  util.append_message("user", transcription, user_audio_bytes)
+  if "chat_history" not in st.session_state:
+    st.session_state.chat_history = ecco6_agent.new_history()
+  if STREAM_RESPONSES:
+    # The agent and text-to-speech overlap when streaming.
+    with tracing.span("agent_and_speech"):
+      answer, audio_response = stream_answer(
+        ecco6_agent, openai_client, st.session_state.chat_history, tts_voice)
     if answer:
-      logging.info(f"trying to play {answer}.")
-      audio_response = openai_client.text_to_speech(answer)
       util.append_message("assistant", answer, audio_response)
-      util.autoplay_hidden_audio(audio_response)
+    return
+  with tracing.span("agent"):
+    answer = ecco6_agent.chat_completion(
+      st.session_state.messages, st.session_state.chat_history)
+  if answer:
+    logging.info(f"trying to play {answer}.")
+    if STREAM_AUDIO:
+      stream = openai_client.stream_speech(answer, tts_voice)
+      util.autoplay_streamed_audio(audio_stream.get_audio_server(**AUDIO_SERVER).publish(stream))
+      util.append_message("assistant", answer, finished_audio(stream))
+      return
+    audio_response = openai_client.text_to_speech(answer, tts_voice)
+    util.append_message("assistant", answer, audio_response)
+    util.autoplay_hidden_audio(audio_response)
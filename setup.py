@@ -1,3 +1,18 @@
+import os
+
 from setuptools import find_packages, setup
+from setuptools.command.build_py import build_py
+
+
+class BuildPyWithStopDatabase(build_py):
+  """Generates the binary stop database from ecco6/tool/stops.py."""
+
+  def run(self):
+    super().run()
+    from ecco6.tool import stop_db
+    stop_db.build(os.path.join(self.build_lib, "ecco6", "tool", stop_db.STOP_DB_FILENAME))
+
 
-setup(name="ecco6", version='0.1', packages=find_packages())
+setup(
+    name="ecco6", version='0.1', packages=find_packages(),
+    cmdclass={"build_py": BuildPyWithStopDatabase})
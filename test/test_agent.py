@@ -0,0 +1,38 @@
+from ecco6.agent import ToolRouter
+
+
+def user(content):
+  return {"role": "user", "content": content}
+
+
+def assistant(content):
+  return {"role": "assistant", "content": content}
+
+
+def test_routes_by_keywords():
+  router = ToolRouter()
+  assert router.route_text("What's the weather in Stockholm?") == {"weather", "location", "time"}
+  assert router.route_text("Turn off the lights") == {"light", "time"}
+  assert router.route_text("Any unread emails?") == {"gmail", "time"}
+  assert "travel" in router.route_text("How do I get from Kista to T-Centralen?")
+
+
+def test_routes_emails_to_gmail():
+  router = ToolRouter()
+  assert "gmail" in router.route_text("Send an email to John about the meeting tomorrow")
+  assert "gmail" in router.route_text("Write an email to my boss")
+  assert "gmail" in router.route_text("Reply to Anna's emails")
+
+
+def test_unmatched_utterances_get_every_group():
+  assert ToolRouter().route_text("Yes, please do that.") is None
+
+
+def test_follow_ups_keep_the_previous_turns_groups():
+  messages = [
+      user("When does the next bus to Kista leave?"),
+      assistant("Bus 514 leaves at 12:05."),
+      user("And the one after that?"),
+  ]
+  assert "travel" in ToolRouter().route(messages)
+  assert ToolRouter(history_turns=0).route(messages) is None
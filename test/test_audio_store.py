@@ -0,0 +1,28 @@
+from ecco6.audio_store import AudioStore
+
+
+def test_keeps_recent_audio_in_memory_and_spools_the_rest(tmp_path):
+  store = AudioStore(max_memory_bytes=8, directory=str(tmp_path))
+  refs = [store.put(bytes([i]) * 4) for i in range(4)]
+  assert store.stats() == {"audio": 4, "memory_bytes": 8, "spool_bytes": 8, "reloads": 0}
+  assert [ref.read() for ref in refs] == [bytes([i]) * 4 for i in range(4)]
+  assert store.stats()["memory_bytes"] <= 8
+  assert store.stats()["reloads"] == 4
+
+
+def test_reloaded_audio_is_not_spooled_twice():
+  store = AudioStore(max_memory_bytes=4)
+  first = store.put(b"aaaa")
+  second = store.put(b"bbbb")
+  assert first.read() == b"aaaa"
+  assert second.read() == b"bbbb"
+  assert first.read() == b"aaaa"
+  assert store.stats()["spool_bytes"] == 8
+
+
+def test_audio_larger_than_the_limit_goes_to_disk():
+  store = AudioStore(max_memory_bytes=2)
+  ref = store.put(b"recording")
+  assert ref.size == 9
+  assert store.stats()["memory_bytes"] == 0
+  assert ref.read() == b"recording"
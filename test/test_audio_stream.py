@@ -0,0 +1,96 @@
+import httpx
+import pytest
+from openai import OpenAI
+
+from ecco6.audio_stream import AudioServer, SpeechStream
+from ecco6.client.OpenAIClient import OpenAIClient
+from ecco6.tts_cache import TTSCache
+
+
+@pytest.fixture
+def server():
+  server = AudioServer()
+  yield server
+  server.close()
+
+
+def test_stream_is_readable_while_it_arrives():
+  stream = SpeechStream()
+  stream.write(b"ab")
+  reader = iter(stream)
+  assert next(reader) == b"ab"
+  stream.write(b"cd")
+  stream.close()
+  assert list(reader) == [b"cd"]
+  assert stream.audio() == b"abcd"
+  assert list(stream) == [b"abcd"]
+
+
+def test_failed_stream_raises_on_audio():
+  stream = SpeechStream()
+  stream.close(RuntimeError("tts down"))
+  assert list(stream) == []
+  with pytest.raises(RuntimeError):
+    stream.audio()
+  with pytest.raises(TimeoutError):
+    SpeechStream().audio(timeout=0.01)
+
+
+def test_server_sends_the_first_chunk_before_the_rest_arrives(server):
+  stream = SpeechStream()
+  stream.write(b"first")
+  with httpx.stream("GET", server.publish(stream)) as response:
+    assert response.headers["Content-Type"] == "audio/mpeg"
+    chunks = response.iter_bytes()
+    assert next(chunks) == b"first"
+    stream.write(b"second")
+    stream.close()
+    assert b"".join(chunks) == b"second"
+
+
+def test_server_serves_streams_again_until_they_expire():
+  server = AudioServer(ttl=0)
+  try:
+    url = server.publish(SpeechStream.from_bytes(b"mp3"))
+    assert httpx.get(url).content == b"mp3"
+    assert httpx.get(url).content == b"mp3"
+    server.publish(SpeechStream.from_bytes(b"next"))
+    assert httpx.get(url).status_code == 404
+    assert httpx.get(f"{server.url}/speech/unknown.mp3").status_code == 404
+  finally:
+    server.close()
+
+
+def test_server_answers_range_requests(server):
+  url = server.publish(SpeechStream.from_bytes(b"0123456789"))
+  probe = httpx.get(url, headers={"Range": "bytes=0-1"})
+  assert (probe.status_code, probe.content) == (206, b"01")
+  assert probe.headers["Content-Range"] == "bytes 0-1/10"
+  assert httpx.get(url, headers={"Range": "bytes=8-"}).content == b"89"
+  assert httpx.get(url, headers={"Range": "bytes=-3"}).content == b"789"
+  assert httpx.get(url, headers={"Range": "bytes=10-"}).status_code == 416
+  assert httpx.get(url).content == b"0123456789"
+
+
+def test_client_streams_and_caches_speech():
+  requests = []
+
+  def handler(request):
+    requests.append(request)
+    return httpx.Response(200, content=iter([b"ab", b"cd"]), headers={"Content-Type": "audio/mpeg"})
+
+  client = OpenAIClient("sk-a", tts_cache=TTSCache())
+  client.client = OpenAI(api_key="sk-a", http_client=httpx.Client(transport=httpx.MockTransport(handler)))
+  assert client.stream_speech("Alarm set successfully.").audio(timeout=5) == b"abcd"
+  assert client.stream_speech("Alarm set successfully.").audio(timeout=5) == b"abcd"
+  assert client.text_to_speech("Alarm set successfully.") == b"abcd"
+  assert len(requests) == 1
+
+
+def test_client_stream_fails_with_the_api_error():
+  client = OpenAIClient("sk-a")
+  client.client = OpenAI(
+      api_key="sk-a", max_retries=0,
+      http_client=httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(500))))
+  with pytest.raises(Exception):
+    client.stream_speech("Hi").audio(timeout=5)
@@ -0,0 +1,31 @@
+from ecco6.cache import TTLCache
+
+
+class FakeClock:
+  def __init__(self):
+    self.now = 0.0
+
+  def __call__(self):
+    return self.now
+
+
+def test_entries_expire_after_ttl():
+  clock = FakeClock()
+  cache = TTLCache(maxsize=4, ttl=10, clock=clock)
+  cache.put("kista", ["trip"])
+  clock.now = 9.9
+  assert cache.get("kista") == ["trip"]
+  clock.now = 10
+  assert cache.get("kista") is None
+  assert cache.stats() == {"hits": 1, "misses": 1, "size": 0}
+
+
+def test_evicts_least_recently_used():
+  cache = TTLCache(maxsize=2, ttl=10, clock=FakeClock())
+  cache.put("a", 1)
+  cache.put("b", 2)
+  cache.get("a")
+  cache.put("c", 3)
+  assert cache.get("b") is None
+  assert cache.get("a") == 1
+  assert cache.get("c") == 3
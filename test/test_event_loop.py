@@ -0,0 +1,59 @@
+import asyncio
+import contextvars
+import threading
+
+import pytest
+
+from ecco6 import event_loop
+
+turn = contextvars.ContextVar("turn", default=None)
+
+
+def test_runs_on_one_loop_in_the_callers_context():
+  async def where():
+    event_loop.require_loop("The test")
+    return asyncio.get_running_loop(), threading.current_thread().name, turn.get()
+
+  turn.set("turn 1")
+  first = event_loop.run(where())
+  assert first == (event_loop.get_loop(), "ecco6-event-loop", "turn 1")
+  assert event_loop.run(where())[0] is first[0]
+  with pytest.raises(RuntimeError):
+    asyncio.run(where())
+
+
+def test_iterate_yields_items_as_they_are_produced():
+  produced = []
+
+  async def items():
+    for i in range(3):
+      produced.append(i)
+      yield i
+      await asyncio.sleep(0.01)
+
+  for item in event_loop.iterate(items()):
+    assert produced[-1] == item
+  assert produced == [0, 1, 2]
+
+
+def test_iterate_raises_the_producers_error():
+  async def items():
+    yield 1
+    raise ValueError("tts down")
+
+  iterator = event_loop.iterate(items())
+  assert next(iterator) == 1
+  with pytest.raises(ValueError):
+    next(iterator)
+
+
+def test_run_from_the_loop_itself_is_refused():
+  async def nested():
+    coroutine = asyncio.sleep(0)
+    try:
+      event_loop.run(coroutine)
+    finally:
+      coroutine.close()
+
+  with pytest.raises(RuntimeError):
+    event_loop.run(nested())
@@ -0,0 +1,66 @@
+import time
+
+from langchain.tools import StructuredTool
+
+from benchmark.fake_agent import make_executor
+from ecco6.tool import alarm
+from ecco6.tool.registry import (ToolContext, ToolRegistry, current_context,
+                                 tool_context)
+
+
+def sleepy_tool(name, seconds):
+  def run(city: str) -> str:
+    """Sleeps like a network call."""
+    time.sleep(seconds)
+    return f"{name} {city} {current_context().rpi_url}"
+  return StructuredTool.from_function(func=run, name=name, description=f"The {name}.")
+
+
+def city_calls(*names):
+  return [{"name": name, "args": {"city": "Kista"}} for name in names]
+
+
+def test_tool_calls_of_a_step_run_concurrently_and_in_order():
+  tools = [sleepy_tool("weather", 0.3), sleepy_tool("events", 0.1), sleepy_tool("mail", 0.2)]
+  executor = make_executor(
+      tools, city_calls("weather", "events", "mail"), return_intermediate_steps=True)
+  start = time.perf_counter()
+  with tool_context(ToolContext(rpi_url="rpi")):
+    result = executor.invoke({"input": "Morning briefing"})
+  elapsed = time.perf_counter() - start
+  assert result["output"] == "Done."
+  assert [observation for _, observation in result["intermediate_steps"]] == [
+      "weather Kista rpi", "events Kista rpi", "mail Kista rpi"]
+  assert elapsed < 0.5
+
+
+def test_single_tool_calls_run_inline():
+  executor = make_executor(
+      [sleepy_tool("weather", 0)], city_calls("weather"), return_intermediate_steps=True)
+  result = executor.invoke({"input": "Weather?"})
+  assert [observation for _, observation in result["intermediate_steps"]] == ["weather Kista None"]
+
+
+def test_alarm_tools_read_the_email_from_the_context_in_tool_threads(monkeypatch):
+  paths = []
+
+  class FakeReference:
+    def __init__(self, path):
+      paths.append(path)
+
+    def get(self):
+      return None
+
+  monkeypatch.setattr(alarm.db, "reference", FakeReference)
+  # Registered as alarm.py registers it, on a registry of its own.
+  get_alarms = ToolRegistry().register(
+      name="get_alarms", group="alarm", description="Get the users alarms",
+      func=alarm.list_user_alarms, args_schema=alarm.ListAlarmsInput,
+      context_args={"email": "email"})
+  executor = make_executor(
+      [get_alarms, sleepy_tool("weather", 0)],
+      [{"name": "get_alarms"}, *city_calls("weather")], return_intermediate_steps=True)
+  with tool_context(ToolContext(email="user@example.com", rpi_url="rpi")):
+    result = executor.invoke({"input": "Alarms and weather?"})
+  assert paths == ["/users/user@example_com/alarms"]
+  assert result["intermediate_steps"][1][1] == "weather Kista rpi"
@@ -0,0 +1,103 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from ecco6.history import TOKENS_PER_MESSAGE, ChatHistory
+
+
+def count_words(text):
+  return len(text.split())
+
+
+class FakeSummarizer:
+  def __init__(self):
+    self.calls = []
+
+  def __call__(self, summary, messages):
+    self.calls.append((summary, [message.content for message in messages]))
+    return f"{len(self.calls)} summaries"
+
+
+def conversation(turns):
+  messages = []
+  for turn in range(turns):
+    messages.append({"role": "user", "content": f"question {turn}"})
+    messages.append({"role": "assistant", "content": f"answer {turn}"})
+  return messages
+
+
+def test_short_histories_are_kept_verbatim():
+  summarize = FakeSummarizer()
+  history = ChatHistory(count_words, summarize, keep_turns=2, fold_turns=1)
+  history.update(conversation(3))
+  assert [message.content for message in history.messages()] == [
+      "question 0", "answer 0", "question 1", "answer 1", "question 2", "answer 2"]
+  assert isinstance(history.messages()[0], HumanMessage)
+  assert isinstance(history.messages()[1], AIMessage)
+  assert history.tokens() == 6 * (TOKENS_PER_MESSAGE + 1 + 2)
+  assert summarize.calls == []
+
+
+def test_old_turns_are_folded_in_batches():
+  summarize = FakeSummarizer()
+  history = ChatHistory(count_words, summarize, keep_turns=2, fold_turns=2)
+  messages = conversation(6)
+  for end in range(2, len(messages) + 1, 2):
+    history.update(messages[:end])
+  # Turn 5 exceeds keep_turns + fold_turns and folds the three oldest turns,
+  # turn 6 does not fold again.
+  assert summarize.calls == [("", ["question 0", "answer 0", "question 1", "answer 1", "question 2", "answer 2"])]
+  window = history.messages()
+  assert isinstance(window[0], SystemMessage)
+  assert window[0].content.endswith("1 summaries")
+  assert [message.content for message in window[1:]] == [
+      "question 3", "answer 3", "question 4", "answer 4", "question 5", "answer 5"]
+
+
+def test_token_budget_folds_early_but_keeps_the_last_turn():
+  summarize = FakeSummarizer()
+  history = ChatHistory(count_words, summarize, max_tokens=20, keep_turns=10)
+  history.update(conversation(3))
+  assert [message.content for message in history.messages()[1:]] == ["question 2", "answer 2"]
+  assert len(summarize.calls) == 1
+
+
+def test_messages_are_converted_once():
+  history = ChatHistory(count_words, FakeSummarizer())
+  messages = conversation(2)
+  history.update(messages[:2])
+  first = history.messages()[0]
+  history.update(messages)
+  assert history.messages()[0] is first
+
+
+def test_restarted_sessions_are_cleared():
+  history = ChatHistory(count_words, FakeSummarizer())
+  history.update(conversation(3))
+  history.update(conversation(1))
+  assert [message.content for message in history.messages()] == ["question 0", "answer 0"]
+
+
+def test_failed_summaries_keep_the_turns():
+  def fail(summary, messages):
+    raise RuntimeError("OpenAI is down")
+
+  history = ChatHistory(count_words, fail, keep_turns=1, fold_turns=0)
+  history.update(conversation(3))
+  assert history.summary == ""
+  assert len(history.messages()) == 6
+  asyncio.run(history.aupdate(conversation(4)))
+  assert len(history.messages()) == 8
+
+
+def test_async_updates_await_the_async_summarizer():
+  summarize = FakeSummarizer()
+
+  async def asummarize(summary, messages):
+    return f"async {summarize(summary, messages)}"
+
+  history = ChatHistory(
+      count_words, lambda *args: "blocking", keep_turns=1, fold_turns=0, asummarize=asummarize)
+  asyncio.run(history.aupdate(conversation(2)))
+  assert history.summary == "async 1 summaries"
+  assert [message.content for message in history.messages()[1:]] == ["question 1", "answer 1"]
@@ -0,0 +1,21 @@
+from ecco6.tool import nearby_stops
+
+IDS = [740000001, 740000002, 740000003, 740000004]
+NAMES = ["T-Centralen", "Hötorget", "Slussen", "Kista"]
+LATS = [59.331, 59.3355, 59.3195, 59.4032]
+LONS = [18.0598, 18.0635, 18.0721, 17.9424]
+
+
+def test_query_returns_closest_stops_first():
+  index = nearby_stops.NearbyStopIndex(IDS, NAMES, LATS, LONS)
+  stops = index.query(59.3312, 18.0601, max_results=2, radius=1000)
+  assert [stop['name'] for stop in stops] == ["T-Centralen", "Hötorget"]
+  assert stops[0] == {'name': "T-Centralen", 'distance': 28, 'location': "740000001"}
+
+
+def test_query_respects_radius():
+  index = nearby_stops.NearbyStopIndex(IDS, NAMES, LATS, LONS)
+  assert [stop['name'] for stop in index.query(59.3312, 18.0601, max_results=10, radius=600)] == [
+      "T-Centralen", "Hötorget"]
+  assert index.query(59.3312, 18.0601, max_results=10, radius=1) == []
+  assert len(index.query(59.3312, 18.0601, max_results=10, radius=20000)) == 4
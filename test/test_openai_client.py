@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from openai import AsyncOpenAI, OpenAI
+
+from ecco6 import event_loop
+from ecco6.client.OpenAIClient import (AsyncChatCompletions, OpenAIClient,
+                                       PoolConfig, get_async_openai,
+                                       get_openai)
+from ecco6.tts_cache import TTSCache
+
+
+def test_clients_are_shared_per_key_and_pool():
+  assert get_openai("sk-a") is get_openai("sk-a")
+  assert get_openai("sk-a") is not get_openai("sk-b")
+  assert get_openai("sk-a") is not get_openai("sk-a", PoolConfig(max_connections=2))
+  assert OpenAIClient("sk-a").client is OpenAIClient("sk-a").client
+
+
+def test_async_clients_live_on_the_shared_event_loop():
+  async def client():
+    return get_async_openai("sk-a")
+
+  assert event_loop.run(client()) is event_loop.run(client())
+  with pytest.raises(RuntimeError):
+    asyncio.run(client())
+
+
+def test_model_and_voice_are_per_call():
+  requests = []
+
+  def handler(request):
+    requests.append(json.loads(request.content))
+    return httpx.Response(200, content=b"mp3", headers={"Content-Type": "audio/mpeg"})
+
+  client = OpenAIClient("sk-a")
+  client.client = OpenAI(api_key="sk-a", http_client=httpx.Client(transport=httpx.MockTransport(handler)))
+  assert client.text_to_speech("Hi", voice="onyx") == b"mp3"
+  client.text_to_speech("Hi", model="tts-1-hd")
+  assert [(r["voice"], r["model"]) for r in requests] == [("onyx", "tts-1"), ("nova", "tts-1-hd")]
+
+
+def test_async_chat_completions_get_the_client_when_called(monkeypatch):
+  from ecco6.client import OpenAIClient as module
+  calls = []
+
+  class FakeCompletions:
+    async def create(self, **kwargs):
+      calls.append(kwargs)
+      return kwargs
+
+  class FakeClient:
+    def __init__(self):
+      self.chat = type("Chat", (), {"completions": FakeCompletions()})()
+
+  monkeypatch.setattr(module, "get_async_openai", lambda api_key, pool: FakeClient())
+  completions = AsyncChatCompletions("sk-a")
+  assert event_loop.run(completions.create(model="gpt-4-turbo")) == {"model": "gpt-4-turbo"}
+  assert calls == [{"model": "gpt-4-turbo"}]
+
+
+def test_async_text_to_speech_uses_the_cache_and_the_async_client(monkeypatch):
+  from ecco6.client import OpenAIClient as module
+  requests = []
+
+  async def handler(request):
+    requests.append(request)
+    return httpx.Response(200, content=b"mp3", headers={"Content-Type": "audio/mpeg"})
+
+  monkeypatch.setitem(module._async_clients, ("sk-async", PoolConfig()), AsyncOpenAI(
+      api_key="sk-async", http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler))))
+  client = OpenAIClient("sk-async", tts_cache=TTSCache())
+
+  async def speak_twice():
+    return [await client.atext_to_speech("Hi"), await client.atext_to_speech("Hi")]
+
+  assert event_loop.run(speak_twice()) == [b"mp3", b"mp3"]
+  assert len(requests) == 1
@@ -0,0 +1,132 @@
+import asyncio
+import datetime
+import threading
+from concurrent.futures import Future
+
+from langchain.pydantic_v1 import BaseModel
+
+from ecco6.tool.prefetch import RULES, Prefetcher
+from ecco6.tool.registry import ToolContext, ToolRegistry, tool_context
+from ecco6.tool.speculation import SpeculativeResults, call_key
+
+STOCKHOLM = ToolContext(email="user@ecco6.test", latitude=59.3308, longitude=18.0592)
+
+
+class FakeClock:
+  def __init__(self):
+    self.now = 0.0
+
+  def __call__(self):
+    return self.now
+
+
+def done(value):
+  future = Future()
+  future.set_result(value)
+  return future
+
+
+def test_call_keys_ignore_case_and_missing_arguments():
+  assert call_key("get_weather", {"city_name": "Stockholm "}, STOCKHOLM) == call_key(
+      "get_weather", {"city_name": "stockholm", "date": None}, STOCKHOLM)
+  assert call_key("get_weather", {"city_name": "Stockholm"}, STOCKHOLM) != call_key(
+      "get_weather", {"city_name": "Stockholm"}, ToolContext(email="other@ecco6.test"))
+
+
+def test_call_keys_of_list_arguments_are_hashable():
+  key = call_key("get_itinerary_suggestions", {"station_names": ["Kista", "Slussen "]}, STOCKHOLM)
+  assert key == call_key("get_itinerary_suggestions", {"station_names": ["kista", "Slussen"]}, STOCKHOLM)
+  assert SpeculativeResults().take(key) is None
+
+
+def test_results_are_taken_once_and_expire():
+  clock = FakeClock()
+  results = SpeculativeResults(ttl=10, clock=clock)
+  assert results.put("weather", done("sunny"))
+  assert not results.put("weather", done("rainy"))
+  assert results.put("news", done("headlines"))
+  assert results.take("weather").result() == "sunny"
+  assert results.take("weather") is None
+  clock.now = 10
+  assert results.take("news") is None
+  assert results.stats() == {
+      "started": 2, "hits": 1, "wasted": 1, "pending": 0, "hit_rate": 0.5, "waste_rate": 0.5}
+
+
+def test_evicted_results_are_wasted():
+  results = SpeculativeResults(maxsize=1, clock=FakeClock())
+  results.put("a", done(1))
+  results.put("b", done(2))
+  assert results.take("a") is None
+  assert results.stats()["wasted"] == 1
+
+
+class WeatherInput(BaseModel):
+  city_name: str
+
+
+def make_registry(results, calls):
+  registry = ToolRegistry(speculative_results=results)
+  release = threading.Event()
+
+  def get_weather(city_name):
+    calls.append(city_name)
+    release.wait(5)
+    return f"Sunny in {city_name}"
+
+  async def aget_weather(city_name):
+    calls.append(city_name)
+    return f"Async sun in {city_name}"
+
+  registry.register(
+      name="get_weather", description="Weather.", func=get_weather, coroutine=aget_weather,
+      group="weather", args_schema=WeatherInput)
+  return registry, release
+
+
+def test_model_call_takes_the_prefetched_result():
+  results = SpeculativeResults()
+  calls = []
+  registry, release = make_registry(results, calls)
+  prefetcher = Prefetcher(results=results, get_tools=registry.get_tools)
+  assert prefetcher.prefetch("What's the weather like in Stockholm?", STOCKHOLM) == ["get_weather"]
+  # A second transcript does not start the same call again.
+  assert prefetcher.prefetch("Weather in stockholm", STOCKHOLM) == []
+  release.set()
+  tool, = registry.get_tools(STOCKHOLM)
+  with tool_context(STOCKHOLM):
+    assert tool.invoke({"city_name": "stockholm"}) == "Sunny in Stockholm"
+    assert tool.invoke({"city_name": "Stockholm"}) == "Sunny in Stockholm"
+    assert asyncio.run(tool.ainvoke({"city_name": "Uppsala"})) == "Async sun in Uppsala"
+  assert calls == ["Stockholm", "Stockholm", "Uppsala"]
+  assert results.stats()["hits"] == 1
+
+
+def test_other_sessions_do_not_take_the_result():
+  results = SpeculativeResults()
+  registry, release = make_registry(results, [])
+  release.set()
+  Prefetcher(results=results, get_tools=registry.get_tools).prefetch(
+      "Weather in Stockholm", STOCKHOLM)
+  tool, = registry.get_tools(STOCKHOLM)
+  with tool_context(ToolContext(email="other@ecco6.test")):
+    tool.invoke({"city_name": "Stockholm"})
+  assert results.stats()["hits"] == 0
+
+
+def test_rules_predict_calls():
+  prefetcher = Prefetcher(rules=RULES, results=SpeculativeResults(), get_tools=lambda context: [])
+  today = datetime.date.today()
+  tomorrow = today + datetime.timedelta(days=1)
+  assert prefetcher.predict("Is it raining in New York?", STOCKHOLM) == [
+      ("get_weather", {"city_name": "New York"})]
+  assert prefetcher.predict("What's the weather in Stockholm on Friday?", STOCKHOLM) == []
+  assert prefetcher.predict("What's on my calendar tomorrow?", STOCKHOLM) == [
+      ("get_events_by_date", {"date": tomorrow.strftime("%Y-%m-%d")})]
+  assert prefetcher.predict("Any meetings today?", STOCKHOLM) == [
+      ("get_events_by_date", {"date": today.strftime("%Y-%m-%d")})]
+  assert prefetcher.predict("Do I have unread emails?", STOCKHOLM) == [("get_unread_messages", {})]
+  assert prefetcher.predict("Where is the nearest bus stop?", STOCKHOLM) == [
+      ("get_nearby_stops", {"latitude": 59.3308, "longitude": 18.0592})]
+  assert prefetcher.predict("Where is the nearest bus stop?", ToolContext()) == []
+  assert prefetcher.predict("Turn on the light", STOCKHOLM) == []
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+from langchain.pydantic_v1 import BaseModel
+
+from ecco6.tool.registry import (ToolContext, ToolRegistry, current_context,
+                                 tool_context)
+
+
+class WhereInput(BaseModel):
+  label: str
+
+
+def where(label, latitude, longitude):
+  return f"{label} {latitude} {longitude}"
+
+
+async def awhere(label, latitude, longitude):
+  return f"async {label} {latitude} {longitude}"
+
+
+def make_registry():
+  registry = ToolRegistry()
+  registry.register(
+      name="where",
+      description="Where am I?",
+      func=where,
+      group="location",
+      coroutine=awhere,
+      args_schema=WhereInput,
+      context_args={"latitude": "latitude", "longitude": "longitude"},
+      available=lambda context: context.has_location,
+  )
+  registry.register(name="always", description="Always there.", func=lambda: "here", group="time")
+  return registry
+
+
+def test_tools_are_filtered_by_context():
+  registry = make_registry()
+  assert [tool.name for tool in registry.get_tools(ToolContext())] == ["always"]
+  located = ToolContext(latitude=59.33, longitude=18.06)
+  assert [tool.name for tool in registry.get_tools(located)] == ["where", "always"]
+
+
+def test_tools_are_filtered_by_group():
+  registry = make_registry()
+  located = ToolContext(latitude=59.33, longitude=18.06)
+  assert [tool.name for tool in registry.get_tools(located, groups={"time"})] == ["always"]
+  assert registry.groups() == {"location", "time"}
+
+
+def test_tools_are_built_once():
+  registry = make_registry()
+  first = registry.get_tools(ToolContext(latitude=1.0, longitude=2.0))
+  second = registry.get_tools(ToolContext(latitude=3.0, longitude=4.0))
+  assert first[0] is second[0]
+
+
+def test_context_args_come_from_the_current_context():
+  tool = make_registry().get_tools(ToolContext(latitude=0.0, longitude=0.0))[0]
+  assert tool.args == {"label": {"title": "Label", "type": "string"}}
+  with tool_context(ToolContext(latitude=59.33, longitude=18.06)):
+    assert tool.invoke({"label": "kista"}) == "kista 59.33 18.06"
+    assert asyncio.run(tool.ainvoke({"label": "kista"})) == "async kista 59.33 18.06"
+  assert current_context() == ToolContext()
+
+
+def test_duplicate_names_are_rejected():
+  registry = make_registry()
+  with pytest.raises(ValueError):
+    registry.register(name="always", description="Again.", func=lambda: "again", group="time")
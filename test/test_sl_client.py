@@ -0,0 +1,111 @@
+import asyncio
+import http.server
+import threading
+import time
+
+import pytest
+
+from ecco6 import event_loop
+from ecco6.tool import sl_client
+
+# Stands in for the TCP and TLS handshake a new connection to SL costs.
+HANDSHAKE_SECONDS = 0.05
+
+
+class StubSLHandler(http.server.BaseHTTPRequestHandler):
+  protocol_version = "HTTP/1.1"
+  disable_nagle_algorithm = True
+
+  def setup(self):
+    super().setup()
+    self.server.connections += 1
+    time.sleep(HANDSHAKE_SECONDS)
+
+  def do_GET(self):
+    self.server.requests += 1
+    status = self.server.statuses.pop(0) if self.server.statuses else 200
+    body = b'{"Trip": []}'
+    self.send_response(status)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, format, *args):
+    pass
+
+
+@pytest.fixture
+def stub_server():
+  server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubSLHandler)
+  server.connections = 0
+  server.requests = 0
+  server.statuses = []
+  thread = threading.Thread(target=server.serve_forever, daemon=True)
+  thread.start()
+  yield server
+  server.shutdown()
+  server.server_close()
+
+
+def test_warm_calls_reuse_the_connection(stub_server):
+  client = sl_client.SLClient(backoff_factor=0)
+  url = f"http://127.0.0.1:{stub_server.server_port}/v1/TravelplannerV3_1/trip.json"
+
+  start = time.perf_counter()
+  assert client.get(url).status_code == 200
+  cold = time.perf_counter() - start
+
+  warm = []
+  for _ in range(5):
+    start = time.perf_counter()
+    assert client.get(url).json() == {"Trip": []}
+    warm.append(time.perf_counter() - start)
+  client.close()
+
+  assert stub_server.connections == 1
+  assert max(warm) < cold
+
+
+def test_retries_server_errors(stub_server):
+  stub_server.statuses = [503, 502]
+  client = sl_client.SLClient(retries=2, backoff_factor=0)
+  url = f"http://127.0.0.1:{stub_server.server_port}/v1/nearbystopsv2.json"
+  assert client.get(url).status_code == 200
+  assert stub_server.requests == 3
+
+
+def test_returns_last_server_error_after_retries(stub_server):
+  stub_server.statuses = [500, 500, 500]
+  client = sl_client.SLClient(retries=1, backoff_factor=0)
+  url = f"http://127.0.0.1:{stub_server.server_port}/v1/nearbystopsv2.json"
+  assert client.get(url).status_code == 500
+  assert stub_server.requests == 2
+
+
+def test_async_client_retries_and_reuses_the_connection(stub_server):
+  stub_server.statuses = [503]
+  url = f"http://127.0.0.1:{stub_server.server_port}/v1/TravelplannerV3_1/trip.json"
+
+  async def get_twice():
+    client = sl_client.AsyncSLClient(backoff_factor=0)
+    responses = [await client.get(url), await client.get(url)]
+    await client.aclose()
+    return responses
+
+  responses = asyncio.run(get_twice())
+  assert [response.status_code for response in responses] == [200, 200]
+  assert stub_server.requests == 3
+  assert stub_server.connections == 1
+
+
+def test_shared_async_client_keeps_its_connection_across_turns(stub_server):
+  url = f"http://127.0.0.1:{stub_server.server_port}/v1/TravelplannerV3_1/trip.json"
+
+  async def turn():
+    return (await sl_client.get_async_sl_client().get(url)).status_code
+
+  assert [event_loop.run(turn()) for _ in range(3)] == [200, 200, 200]
+  assert stub_server.connections == 1
+  with pytest.raises(RuntimeError):
+    asyncio.run(turn())
@@ -0,0 +1,44 @@
+from ecco6.tool import sl_trip
+
+
+def make_leg(cat_out, name, origin, destination):
+  return {
+      "Product": {"catOut": cat_out, "name": name},
+      "Origin": {"name": origin, "time": "10:00:00"},
+      "Destination": {"name": destination, "time": "10:15:00"},
+  }
+
+
+TRIP = {"LegList": {"Leg": [
+    {"Origin": {"name": "Home", "time": "09:50:00"},
+     "Destination": {"name": "Kista", "time": "10:00:00"}, "type": "WALK"},
+    make_leg("METRO", "Tunnelbana 11", "Kista", "T-Centralen"),
+    make_leg("TRAIN", "PENDELTÅG 40", "Stockholm City", "Uppsala C"),
+    make_leg("SHIP", "Waxholmsbolaget 80", "Strömkajen", "Vaxholm"),
+]}}
+
+
+def test_parse_trip_skips_walks():
+  trip = sl_trip.parse_trip(TRIP)
+  assert [leg.category for leg in trip.legs] == ["METRO", "TRAIN", "SHIP"]
+  assert trip.legs[0] == sl_trip.Leg(
+      "METRO", "Tunnelbana 11", "Kista", "T-Centralen", "10:00:00", "10:15:00")
+
+
+def test_leg_labels():
+  assert [leg.label for leg in sl_trip.parse_trip(TRIP).legs] == ["Metro", "Pendeltåg", "Ship"]
+
+
+def test_render_suggestions_stops_after_max_legs():
+  trips = iter([sl_trip.parse_trip(TRIP), sl_trip.parse_trip(TRIP)])
+  suggestions = sl_trip.render_suggestions(trips, max_legs=2)
+  assert suggestions == (
+      "Metro Line: Tunnelbana 11\nDeparture: Kista\nDestination: T-Centralen\n"
+      "Departure Time: 10:00:00\nArrival Time: 10:15:00\n\n"
+      "Pendeltåg Line: PENDELTÅG 40\nDeparture: Stockholm City\nDestination: Uppsala C\n"
+      "Departure Time: 10:00:00\nArrival Time: 10:15:00\n\n")
+  assert next(trips, None) is not None
+
+
+def test_render_suggestions_without_legs():
+  assert sl_trip.render_suggestions([]) == "No travel suggestions found."
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from ecco6.speech import split_sentences, synthesize_in_order
+
+
+async def stream(items, delay=0.0):
+  for item in items:
+    await asyncio.sleep(delay)
+    yield item
+
+
+async def collect(iterator):
+  return [item async for item in iterator]
+
+
+def test_splits_tokens_into_sentences():
+  tokens = ["Sure", ". It is ", "sunny in Stockholm", " today. It is 20.5", " degrees Celsius.\nBye"]
+  assert asyncio.run(collect(split_sentences(stream(tokens)))) == [
+      "Sure. It is sunny in Stockholm today.", "It is 20.5 degrees Celsius.", "Bye"]
+
+
+def test_sentences_are_yielded_before_the_stream_ends():
+  async def main():
+    tokens = asyncio.Queue()
+    async def queued():
+      while (token := await tokens.get()) is not None:
+        yield token
+    sentences = split_sentences(queued(), min_chars=0)
+    await tokens.put("The first sentence. The sec")
+    assert await anext(sentences) == "The first sentence."
+    await tokens.put("ond one.")
+    await tokens.put(None)
+    assert await collect(sentences) == ["The second one."]
+  asyncio.run(main())
+
+
+def test_audio_comes_in_order_while_synthesis_overlaps():
+  running = []
+  most_running = 0
+
+  async def synthesize(sentence):
+    nonlocal most_running
+    running.append(sentence)
+    most_running = max(most_running, len(running))
+    # Later sentences finish first.
+    await asyncio.sleep(0.05 / len(sentence))
+    running.remove(sentence)
+    return sentence.upper().encode()
+
+  sentences = ["a", "bb", "ccc", "dddd"]
+  result = asyncio.run(collect(synthesize_in_order(stream(sentences), synthesize, max_pending=2)))
+  assert result == [(sentence, sentence.upper().encode()) for sentence in sentences]
+  assert most_running > 1
+
+
+def test_synthesis_errors_propagate():
+  async def synthesize(sentence):
+    raise RuntimeError("tts failed")
+
+  with pytest.raises(RuntimeError):
+    asyncio.run(collect(synthesize_in_order(stream(["a", "b"]), synthesize)))
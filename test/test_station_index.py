@@ -0,0 +1,26 @@
+from ecco6.tool import station_index
+
+STOP_CSV_STR = """\
+stop_id,stop_name,stop_lat,stop_lon,location_type
+740000001,Stockholm Central,59.330140,18.058155,
+740000005,Uppsala Central,59.858534,17.646086,
+740000099,Stockholm Central,1.000000,2.000000,
+"""
+
+
+def test_find_exact_name_ignores_case():
+  index = station_index.StationIndex(STOP_CSV_STR)
+  row = index.find("stockholm central")
+  assert index.ids[row] == 740000001
+  assert index.coordinates(row) == (59.330140, 18.058155)
+
+
+def test_find_unknown_name():
+  index = station_index.StationIndex(STOP_CSV_STR)
+  assert index.find("Kista") is None
+
+
+def test_normalized_names_are_distinct():
+  index = station_index.StationIndex(STOP_CSV_STR)
+  assert len(index) == 3
+  assert index.normalized_names() == ["stockholm central", "uppsala central"]
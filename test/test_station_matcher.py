@@ -0,0 +1,56 @@
+import difflib
+
+import pytest
+
+from ecco6.tool import station_matcher, stop_db
+
+SPOKEN_STATION_NAMES = [
+    "stockholm central",
+    "stockholm centralen",
+    "uppsala c",
+    "uppsala central",
+    "t-centralen",
+    "t centralen",
+    "kista",
+    "kista centrum",
+    "slussen",
+    "odenplan",
+    "arlanda airport",
+    "gothenburg central",
+    "malmo central",
+    "sodertalje",
+    "liljeholmen",
+    "tekniska hogskolan",
+    "karolinska sjukhuset",
+    "xyz",
+    "",
+]
+
+
+@pytest.fixture(scope="module")
+def stop_names():
+  return stop_db.get_stop_database().normalized_names()
+
+
+@pytest.mark.parametrize("word", SPOKEN_STATION_NAMES)
+def test_best_match_agrees_with_difflib(stop_names, word):
+  expected = difflib.get_close_matches(word, stop_names, n=1, cutoff=0.6)
+  actual = station_matcher.get_station_matcher().best_match(word, cutoff=0.6)
+  assert actual == (expected[0] if expected else None)
+
+
+def test_best_match_breaks_ties_like_difflib():
+  names = ["abcx", "abcy", "abcz"]
+  matcher = station_matcher.StationMatcher(names)
+  assert matcher.best_match("abc", cutoff=0.6) == difflib.get_close_matches("abc", names, n=1)[0]
+
+
+def test_best_match_respects_cutoff():
+  matcher = station_matcher.StationMatcher(["kista", "slussen"])
+  assert matcher.best_match("kistan", cutoff=0.99) is None
+
+
+def test_best_matches_agrees_with_best_match():
+  matcher = station_matcher.get_station_matcher()
+  expected = [matcher.best_match(word) for word in SPOKEN_STATION_NAMES]
+  assert matcher.best_matches(SPOKEN_STATION_NAMES) == expected
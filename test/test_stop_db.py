@@ -0,0 +1,57 @@
+import os
+import stat
+
+from ecco6.tool import station_index, stop_db
+
+STOP_CSV_STR = """\
+stop_id,stop_name,stop_lat,stop_lon,location_type
+740000001,Stockholm Central,59.330140,18.058155,
+740000005,Uppsala Central,59.858534,17.646086,
+740000099,Stockholm Central,-1.000001,2.000000,
+100000351,Tornio På Gränsen Rajala,65.843294,24.145138,
+"""
+
+
+def build_stop_database(tmp_path):
+  path = str(tmp_path / stop_db.STOP_DB_FILENAME)
+  stop_db.build(path, station_index.StationIndex(STOP_CSV_STR))
+  return stop_db.StopDatabase(path)
+
+
+def test_columns_round_trip(tmp_path):
+  index = station_index.StationIndex(STOP_CSV_STR)
+  database = build_stop_database(tmp_path)
+  assert len(database) == len(index)
+  assert list(database.ids) == list(index.ids)
+  assert list(database.names) == index.names
+  assert [database.coordinates(row) for row in range(len(database))] == [
+      index.coordinates(row) for row in range(len(index))]
+
+
+def test_lookups_match_station_index(tmp_path):
+  index = station_index.StationIndex(STOP_CSV_STR)
+  database = build_stop_database(tmp_path)
+  for name in ("stockholm central", "TORNIO PÅ GRÄNSEN RAJALA", "Uppsala Central", "Kista"):
+    assert database.find(name) == index.find(name)
+  assert database.normalized_names() == index.normalized_names()
+
+
+def test_unwritable_package_dir_builds_in_the_cache_dir(tmp_path):
+  # A file where the package dir should be: not writable, even as root.
+  (tmp_path / "package").write_text("")
+  cache_dir = tmp_path / "cache"
+  database = stop_db.load(
+      str(tmp_path / "package" / stop_db.STOP_DB_FILENAME), str(cache_dir),
+      station_index.StationIndex(STOP_CSV_STR))
+  assert database.find("Uppsala Central") == 1
+  assert os.listdir(cache_dir) == [stop_db.STOP_DB_FILENAME]
+  assert stat.S_IMODE(os.stat(cache_dir).st_mode) == 0o700
+
+
+def test_unwritable_cache_dir_builds_in_memory(tmp_path):
+  (tmp_path / "package").write_text("")
+  index = station_index.StationIndex(STOP_CSV_STR)
+  database = stop_db.load(
+      str(tmp_path / "package" / stop_db.STOP_DB_FILENAME), str(tmp_path / "package" / "cache"), index)
+  assert list(database.names) == index.names
+  assert database.find("stockholm central") == index.find("stockholm central")
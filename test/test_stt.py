@@ -0,0 +1,63 @@
+import time
+
+from pydub import AudioSegment
+from pydub.generators import Sine
+
+from ecco6.stt import StreamingTranscriber, transcribe_recording, wav_file
+
+
+def tone(ms):
+  return Sine(440).to_audio_segment(duration=ms, volume=-10)
+
+
+def pause(ms):
+  return AudioSegment.silent(duration=ms)
+
+
+def lengths(chunk):
+  # Later chunks finish first, the transcript must still be in order.
+  time.sleep(max(0, 0.05 - len(chunk) / 100000))
+  return f"<{len(chunk)}>"
+
+
+def test_cuts_as_soon_as_a_pause_is_long_enough():
+  # Cut 150 ms into each pause, the middle of its first 300 ms.
+  audio = tone(2500) + pause(400) + tone(2500) + pause(400) + tone(1000)
+  assert transcribe_recording(audio, lengths) == "<2650> <2900> <1250>"
+
+
+def test_short_pauses_and_short_chunks_are_not_cut():
+  audio = tone(1000) + pause(400) + tone(1500) + pause(100) + tone(1000)
+  assert transcribe_recording(audio, lengths, min_chunk_ms=2000) == "<4000>"
+
+
+def test_long_speech_is_cut_at_max_chunk_length():
+  assert transcribe_recording(tone(7000), lengths, max_chunk_ms=3000) == "<3000> <3000> <1000>"
+
+
+def test_silent_chunks_are_not_transcribed():
+  transcribed = []
+
+  def transcribe(chunk):
+    transcribed.append(chunk)
+    return "hello"
+
+  transcriber = StreamingTranscriber(transcribe, min_chunk_ms=500)
+  transcriber.feed(pause(3000))
+  transcriber.feed(tone(1000))
+  assert transcriber.finish() == "hello"
+  assert len(transcribed) == 1
+
+
+def test_chunks_are_sent_while_audio_arrives():
+  transcriber = StreamingTranscriber(lengths)
+  for piece in (tone(2500), pause(400), tone(500)):
+    transcriber.feed(piece)
+  assert transcriber.chunks() == 1
+  assert transcriber.finish() == "<2650> <750>"
+
+
+def test_wav_file_is_named():
+  file = wav_file(tone(100))
+  assert file.name == "chunk.wav"
+  assert file.read(4) == b"RIFF"
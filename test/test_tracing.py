@@ -0,0 +1,39 @@
+import asyncio
+import threading
+
+from ecco6 import tracing
+
+
+def test_spans_are_recorded_in_the_current_turn():
+  @tracing.traced("tool.weather")
+  def weather():
+    return "sunny"
+
+  @tracing.traced("tool.events")
+  async def events():
+    return []
+
+  with tracing.turn() as turn:
+    with tracing.span("speech_to_text"):
+      pass
+    assert weather() == "sunny"
+    assert asyncio.run(events()) == []
+    # Plain threads do not inherit the context, so this call is not part
+    # of the turn.
+    thread = threading.Thread(target=weather)
+    thread.start()
+    thread.join()
+  assert [row["stage"] for row in turn.breakdown()] == [
+      "speech_to_text", "tool.weather", "tool.events"]
+  assert turn.seconds >= sum(span.seconds for span in turn.spans)
+  assert tracing.current_turn() is None
+
+
+def test_percentiles():
+  stats = tracing.StageStats(history=100)
+  for ms in range(1, 101):
+    stats.add("llm", ms / 1000)
+  assert stats.percentiles("llm") == [0.05, 0.095]
+  assert stats.summary() == [{"stage": "llm", "count": 100, "p50_ms": 50, "p95_ms": 95}]
+  stats.add("llm", 1.0)
+  assert stats.summary()[0]["count"] == 100
@@ -0,0 +1,91 @@
+import http.server
+import json
+import pathlib
+import threading
+
+import pytest
+
+from ecco6.tool import trip_planner
+from ecco6.tool.sl_trip import render_suggestions
+
+# A recorded response, its trips repeated so that the suggestions are found
+# long before the end of the body.
+RECORDED_TRIPS = json.loads((
+    pathlib.Path(__file__).parents[1] / "benchmark" / "offline" / "fixtures" / "sl_trip.json"
+).read_text(encoding="utf-8"))["Trip"]
+BODY = json.dumps({"Trip": RECORDED_TRIPS * 50}).encode("utf-8")
+
+
+class StubTripHandler(http.server.BaseHTTPRequestHandler):
+  protocol_version = "HTTP/1.1"
+
+  def setup(self):
+    super().setup()
+    self.server.connections += 1
+
+  def do_GET(self):
+    body = self.server.body
+    self.send_response(200)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(body) + self.server.missing_bytes))
+    self.end_headers()
+    self.wfile.write(body)
+    if self.server.missing_bytes:
+      self.close_connection = True
+
+  def log_message(self, format, *args):
+    pass
+
+
+@pytest.fixture
+def stub_server():
+  server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubTripHandler)
+  server.connections = 0
+  server.body = BODY
+  server.missing_bytes = 0
+  thread = threading.Thread(target=server.serve_forever, daemon=True)
+  thread.start()
+  yield server
+  server.shutdown()
+  server.server_close()
+
+
+@pytest.fixture
+def url(stub_server):
+  trip_planner.TRIP_CACHE.clear()
+  return f"http://127.0.0.1:{stub_server.server_port}/v1/TravelplannerV3_1/trip.json"
+
+
+def test_streamed_and_whole_responses_give_the_same_suggestions(url):
+  key = trip_planner.trip_cache_key(59.40, 17.94, 59.33, 18.06)
+  streamed = trip_planner.get_trip_suggestions(url, key, stream=True, use_cache=False)
+  assert streamed == trip_planner.get_trip_suggestions(url, key, use_cache=False)
+  assert streamed == render_suggestions(trip_planner.get_trips(url, key, use_cache=False))
+
+
+def test_streaming_drains_the_body_to_reuse_the_connection(stub_server, url):
+  key = trip_planner.trip_cache_key(59.40, 17.94, 59.33, 18.06)
+  for _ in range(3):
+    assert not trip_planner.get_trip_suggestions(url, key, stream=True, use_cache=False).startswith("Error")
+  assert stub_server.connections == 1
+
+
+def test_streamed_suggestions_cache_only_the_parsed_trips(url):
+  key = trip_planner.trip_cache_key(59.40, 17.94, 59.33, 18.06)
+  suggestions = trip_planner.get_trip_suggestions(url, key, stream=True)
+  trips, complete = trip_planner.TRIP_CACHE.get(key)
+  assert not complete
+  assert len(trips) < len(RECORDED_TRIPS) * 50
+  assert trip_planner.get_trip_suggestions(url, key, stream=True) == suggestions
+  # Partial entries do not stand in for the whole response.
+  assert len(trip_planner.get_trips(url, key)) == len(RECORDED_TRIPS) * 50
+  assert trip_planner.TRIP_CACHE.get(key)[1]
+
+
+def test_broken_streamed_bodies_are_reported(stub_server, url):
+  # The connection drops in the middle of the first trip.
+  stub_server.body = b'{"Trip": [' + json.dumps(RECORDED_TRIPS[0]).encode("utf-8")[:100]
+  stub_server.missing_bytes = 1000
+  key = trip_planner.trip_cache_key(59.40, 17.94, 59.33, 18.06)
+  assert trip_planner.get_trip_suggestions(url, key, stream=True).startswith(
+      "Error: ('Connection broken")
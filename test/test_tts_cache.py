@@ -0,0 +1,87 @@
+import os
+
+import httpx
+from openai import OpenAI
+
+from ecco6.client.OpenAIClient import OpenAIClient
+from ecco6.tts_cache import TTSCache, cache_key, prerender
+
+
+def test_key_normalizes_whitespace_but_not_model_or_voice():
+  assert cache_key("tts-1", "nova", " Alarm set\n successfully. ") == cache_key(
+      "tts-1", "nova", "Alarm set successfully.")
+  assert cache_key("tts-1", "nova", "Hi") != cache_key("tts-1", "onyx", "Hi")
+  assert cache_key("tts-1", "nova", "Hi") != cache_key("tts-1-hd", "nova", "Hi")
+
+
+def test_memory_tier_evicts_least_recently_used():
+  cache = TTSCache(memory_bytes=8)
+  cache.put("tts-1", "nova", "a", b"1234")
+  cache.put("tts-1", "nova", "b", b"1234")
+  cache.get("tts-1", "nova", "a")
+  cache.put("tts-1", "nova", "c", b"1234")
+  assert cache.get("tts-1", "nova", "b") is None
+  assert cache.get("tts-1", "nova", "a") == b"1234"
+  assert cache.stats() == {
+    "memory_hits": 2, "disk_hits": 0, "misses": 1, "memory_bytes": 8, "disk_bytes": 0}
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+  TTSCache(str(tmp_path)).put("tts-1", "nova", "Alarm set successfully.", b"mp3")
+  cache = TTSCache(str(tmp_path))
+  assert cache.get("tts-1", "nova", "Alarm set successfully.") == b"mp3"
+  assert cache.get("tts-1", "nova", "Alarm set successfully.") == b"mp3"
+  assert (cache.disk_hits, cache.memory_hits) == (1, 1)
+
+
+def test_only_common_or_short_texts_are_kept_on_disk(tmp_path):
+  cache = TTSCache(str(tmp_path), disk_text_length=10)
+  cache.put("tts-1", "nova", "Brightness of the light has been set as high.", b"common")
+  cache.put("tts-1", "nova", "Okay.", b"short")
+  cache.put("tts-1", "nova", "Your meeting with Alex is at noon.", b"answer")
+  assert len(os.listdir(tmp_path)) == 2
+  assert cache.get("tts-1", "nova", "Your meeting with Alex is at noon.") == b"answer"
+  restarted = TTSCache(str(tmp_path), disk_text_length=10)
+  assert restarted.get("tts-1", "nova", "Okay.") == b"short"
+  assert restarted.get("tts-1", "nova", "Your meeting with Alex is at noon.") is None
+
+
+def test_disk_tier_is_bounded(tmp_path):
+  cache = TTSCache(str(tmp_path), memory_bytes=0, disk_bytes=10)
+  for text in ("a", "b", "c"):
+    cache.put("tts-1", "nova", text, b"12345")
+  assert len(os.listdir(tmp_path)) == 2
+  assert cache.get("tts-1", "nova", "a") is None
+  assert cache.get("tts-1", "nova", "c") == b"12345"
+  assert TTSCache(str(tmp_path), disk_bytes=5).stats()["disk_bytes"] == 5
+
+
+def test_client_skips_the_network_for_cached_text():
+  requests = []
+
+  def handler(request):
+    requests.append(request)
+    return httpx.Response(200, content=b"mp3", headers={"Content-Type": "audio/mpeg"})
+
+  client = OpenAIClient("sk-a", tts_cache=TTSCache())
+  client.client = OpenAI(api_key="sk-a", http_client=httpx.Client(transport=httpx.MockTransport(handler)))
+  assert client.text_to_speech("The light has been successfully turned on.") == b"mp3"
+  assert client.text_to_speech("The light has been  successfully turned on.") == b"mp3"
+  assert len(requests) == 1
+  client.text_to_speech("The light has been successfully turned on.", voice="onyx")
+  assert len(requests) == 2
+
+
+def test_prerender_skips_cached_phrases():
+  cache = TTSCache()
+  cache.put("tts-1", "nova", "Hi", b"hi")
+  rendered = []
+
+  def synthesize(phrase):
+    rendered.append(phrase)
+    cache.put("tts-1", "nova", phrase, phrase.encode())
+    return phrase.encode()
+
+  assert prerender(cache, synthesize, "tts-1", "nova", ["Hi", "Bye"]) == 1
+  assert rendered == ["Bye"]
+  assert prerender(cache, synthesize, "tts-1", "nova", ["Hi", "Bye"]) == 0
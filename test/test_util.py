@@ -1,3 +1,7 @@
+import shutil
+
+import pytest
+
 from ecco6 import util
 
 
@@ -5,4 +9,35 @@ def test_create_memory_file():
   content = b'hello world'
   filename = "foo"
   memory_file = util.create_memory_file(content, filename)
-  assert memory_file.getbuffer() == content
\ No newline at end of file
+  assert memory_file.getbuffer() == content
+
+
+def recording(seconds, frame_rate=48000, channels=2):
+  from pydub.generators import Sine
+  return Sine(300, sample_rate=frame_rate).to_audio_segment(
+      duration=seconds * 1000, volume=-12).set_channels(channels)
+
+
+def test_encode_speech_as_wav_downmixes_and_resamples():
+  import wave
+  memory_file = util.encode_speech(recording(2), "wav")
+  assert memory_file.name == "speech.wav"
+  with wave.open(memory_file) as wav:
+    assert (wav.getnchannels(), wav.getframerate()) == (1, 16000)
+    assert abs(wav.getnframes() - 32000) < 100
+
+
+def test_speech_already_at_16_khz_mono_is_not_copied():
+  audio = recording(1, frame_rate=16000, channels=1)
+  assert util._pcm(audio).obj is audio.raw_data
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+@pytest.mark.parametrize("audio_format,magic", [("ogg", b"OggS"), ("flac", b"fLaC")])
+def test_encode_speech_compressed(audio_format, magic):
+  audio = recording(5)
+  memory_file = util.encode_speech(audio, audio_format)
+  assert memory_file.name == f"speech.{audio_format}"
+  content = memory_file.read()
+  assert content.startswith(magic)
+  assert len(content) < len(audio.raw_data) / 6